@@ -0,0 +1,189 @@
+"""Vergelijk de batchvolgordes "invoer" en "locatie" van de MonumentenClient.
+
+Per volgorde worden de p50/p99 latentie per batch en de ontvangen bytes per batch per endpoint
+gemeten. Standaard draait de vergelijking tegen de stand-in uit `tests/sparql_standin.py`, met
+synthetische ID's uit meerdere gemeenten in willekeurige volgorde. Met `--echt` worden de echte
+endpoints bevraagd, met de ID's uit `--ids` (één ID per regel). De volgordes worden om en om
+gedraaid, na een warm-up, zodat caches aan de kant van de endpoints beide volgordes even veel
+helpen.
+
+Voorbeelden::
+
+    python benchmarks/bench_batch_volgorde.py --aantal 20000
+    python benchmarks/bench_batch_volgorde.py --echt --ids verblijfsobjecten.txt --herhalingen 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from bench_client import _TESTS_MAP, _percentiel, _start_standin
+
+VOLGORDES = ("invoer", "locatie")
+ENDPOINTS = ("bag_lv", "kkg", "rce")
+GEMEENTECODES = ("0363", "0518", "0599", "0344", "0772", "0014", "0080", "0193")
+
+
+def _gemengde_ids(aantal: int) -> List[str]:
+    sys.path.insert(0, _TESTS_MAP)
+    from sparql_standin import synthetische_ids
+
+    per_gemeente = -(-aantal // len(GEMEENTECODES))
+    ids = [
+        identificatie
+        for gemeentecode in GEMEENTECODES
+        for identificatie in synthetische_ids(per_gemeente, gemeentecode)
+    ][:aantal]
+    random.Random(0).shuffle(ids)
+    return ids
+
+
+async def _meet(ids: List[str], volgordes: Sequence[str]) -> List[Dict[str, Any]]:
+    """Verwerk de ID's eenmaal per volgorde en geef de metingen terug.
+
+    Args:
+        ids (List[str]): Verblijfsobject ID's
+        volgordes (Sequence[str]): De te meten batchvolgordes, in deze volgorde
+
+    Returns:
+        List[Dict[str, Any]]: Een meting per volgorde
+    """
+    import monumenten._processing as processing
+    from monumenten import MonumentenClient
+
+    batch_latenties: List[float] = []
+    process_batch = processing._process_batch
+
+    async def _gemeten_process_batch(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await process_batch(*args, **kwargs)
+        finally:
+            batch_latenties.append((time.perf_counter() - start) * 1000)
+
+    processing._process_batch = _gemeten_process_batch
+    metingen = []
+    try:
+        for volgorde in volgordes:
+            async with MonumentenClient(
+                batch_volgorde=volgorde, batch_wachttijd=None
+            ) as client:
+                await client.warmup()
+                bytes_voor = {
+                    endpoint: client.metrics.counter(
+                        "monumenten_ontvangen_bytes_totaal", endpoint=endpoint
+                    )
+                    for endpoint in ENDPOINTS
+                }
+                batch_latenties.clear()
+                start = time.perf_counter()
+                await client.process_from_list(ids)
+                duur = time.perf_counter() - start
+                aantal_batches = len(batch_latenties)
+                meting: Dict[str, Any] = {
+                    "volgorde": volgorde,
+                    "duur_seconden": duur,
+                    "batches": aantal_batches,
+                    "batch_latentie_p50_ms": _percentiel(batch_latenties, 50),
+                    "batch_latentie_p99_ms": _percentiel(batch_latenties, 99),
+                }
+                for endpoint in ENDPOINTS:
+                    ontvangen = (
+                        client.metrics.counter(
+                            "monumenten_ontvangen_bytes_totaal", endpoint=endpoint
+                        )
+                        - bytes_voor[endpoint]
+                    )
+                    meting[f"{endpoint}_kb_per_batch"] = (
+                        ontvangen / 1024 / max(aantal_batches, 1)
+                    )
+                metingen.append(meting)
+    finally:
+        processing._process_batch = process_batch
+    return metingen
+
+
+@contextlib.contextmanager
+def _endpoints(args: argparse.Namespace) -> Iterator[None]:
+    if args.echt:
+        yield
+        return
+    sys.path.insert(0, _TESTS_MAP)
+    from sparql_standin import richt_endpoints_op
+
+    standin, standin_url = _start_standin(args)
+    try:
+        with richt_endpoints_op(standin_url):
+            yield
+    finally:
+        standin.terminate()
+        standin.wait()
+
+
+def _mediaan(metingen: List[Dict[str, Any]], metric: str) -> Optional[float]:
+    waarden = [m[metric] for m in metingen if m[metric] is not None]
+    return statistics.median(waarden) if waarden else None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Draai de vergelijking vanaf de command line.
+
+    Args:
+        argv (Optional[Sequence[str]]): Command line argumenten. Standaard worden die van sys.argv gebruikt.
+
+    Returns:
+        int: Exitcode
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--aantal", type=int, default=20_000, help="Synthetische ID's")
+    parser.add_argument("--ids", help="Bestand met één verblijfsobject ID per regel")
+    parser.add_argument(
+        "--echt", action="store_true", help="Bevraag de echte endpoints"
+    )
+    parser.add_argument("--herhalingen", type=int, default=1)
+    parser.add_argument("--latentie", type=float, default=0.02, help="Seconden")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Seconden")
+    parser.add_argument("--foutpercentage", type=float, default=0.0)
+    parser.add_argument("--opvulling", type=int, default=0, help="Bytes per rij")
+    args = parser.parse_args(argv)
+    if args.echt and not args.ids:
+        parser.error("--echt vereist --ids")
+
+    if args.ids:
+        with open(args.ids, encoding="utf-8") as f:
+            ids = [regel.strip() for regel in f if regel.strip()]
+    else:
+        ids = _gemengde_ids(args.aantal)
+
+    metingen: List[Dict[str, Any]] = []
+    with _endpoints(args):
+        for herhaling in range(args.herhalingen):
+            # om en om beginnen, zodat geen van beide volgordes steeds de koude caches treft
+            volgordes = VOLGORDES if herhaling % 2 == 0 else VOLGORDES[::-1]
+            metingen.extend(asyncio.run(_meet(ids, volgordes)))
+
+    print(f"{len(ids)} ID's, {args.herhalingen} herhaling(en), mediaan per volgorde:")
+    for volgorde in VOLGORDES:
+        per_volgorde = [m for m in metingen if m["volgorde"] == volgorde]
+        kb = ", ".join(
+            f"{endpoint} {_mediaan(per_volgorde, f'{endpoint}_kb_per_batch'):.1f} KiB"
+            for endpoint in ENDPOINTS
+        )
+        print(
+            f"{volgorde:>8}: {_mediaan(per_volgorde, 'duur_seconden'):6.2f} s, "
+            f"batch p50 {_mediaan(per_volgorde, 'batch_latentie_p50_ms'):.0f} ms, "
+            f"p99 {_mediaan(per_volgorde, 'batch_latentie_p99_ms'):.0f} ms, "
+            f"per batch: {kb}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
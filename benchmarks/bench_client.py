@@ -0,0 +1,286 @@
+"""Offline benchmarks van de MonumentenClient tegen de SPARQL stand-in uit `tests/sparql_standin.py`.
+
+Gemeten worden per scenario (pad x aantal ID's): ID's per seconde, p50/p99 latentie per batch,
+piekgeheugen (RSS) en CPU-tijd per ID. Elk scenario draait in een eigen proces, zodat het
+piekgeheugen niet door eerdere scenario's vertekend wordt; de stand-in draait ook in een
+eigen proces en telt dus niet mee in de CPU-tijd.
+
+Voorbeelden::
+
+    python benchmarks/bench_client.py --aantallen 1000 100000
+    python benchmarks/bench_client.py --uitvoer benchmarks/resultaten/main.json
+    python benchmarks/bench_client.py --vergelijk benchmarks/resultaten/main.json
+
+Met `--vergelijk` wordt elk scenario vergeleken met een eerder resultaat, en eindigt het script
+met exitcode 1 als een metric meer dan `--drempel` verslechterd is.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_TESTS_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+_STANDIN = os.path.join(_TESTS_MAP, "sparql_standin.py")
+
+PADEN = ("list", "df", "vera")
+STANDAARD_AANTALLEN = (1_000, 100_000, 1_000_000)
+
+# metric -> True als hoger beter is
+METRICS = {
+    "ids_per_seconde": True,
+    "batch_latentie_p50_ms": False,
+    "batch_latentie_p99_ms": False,
+    "piek_rss_mb": False,
+    "cpu_us_per_id": False,
+}
+
+
+def _percentiel(waarden: List[float], p: float) -> Optional[float]:
+    if not waarden:
+        return None
+    if len(waarden) == 1:
+        return waarden[0]
+    return statistics.quantiles(waarden, n=100, method="inclusive")[int(p) - 1]
+
+
+def _piek_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    piek = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux rapporteert in KiB, macOS in bytes
+    return piek / 1024**2 if sys.platform == "darwin" else piek / 1024
+
+
+async def _draai_scenario(pad: str, aantal: int, standin_url: str) -> Dict[str, Any]:
+    """Draai één scenario in dit proces en geef de metingen terug.
+
+    Args:
+        pad (str): "list", "df" of "vera"
+        aantal (int): Aantal verblijfsobject ID's
+        standin_url (str): Basis-URL van de draaiende stand-in
+
+    Returns:
+        Dict[str, Any]: De metingen van het scenario
+    """
+    sys.path.insert(0, _TESTS_MAP)
+    import pandas as pd
+    from sparql_standin import richt_endpoints_op, synthetische_ids
+
+    import monumenten._processing as processing
+    from monumenten import MonumentenClient
+
+    batch_latenties: List[float] = []
+    process_batch = processing._process_batch
+
+    async def _gemeten_process_batch(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return await process_batch(*args, **kwargs)
+        finally:
+            batch_latenties.append((time.perf_counter() - start) * 1000)
+
+    processing._process_batch = _gemeten_process_batch
+
+    ids = synthetische_ids(aantal)
+    with richt_endpoints_op(standin_url):
+        async with MonumentenClient() as client:
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            if pad == "df":
+                await client.process_from_df(
+                    pd.DataFrame({"bag_verblijfsobject_id": ids}),
+                    "bag_verblijfsobject_id",
+                )
+            else:
+                await client.process_from_list(ids, to_vera=pad == "vera")
+            duur = time.perf_counter() - start
+            cpu = time.process_time() - cpu_start
+
+    return {
+        "pad": pad,
+        "aantal": aantal,
+        "duur_seconden": duur,
+        "ids_per_seconde": aantal / duur,
+        "batch_latentie_p50_ms": _percentiel(batch_latenties, 50),
+        "batch_latentie_p99_ms": _percentiel(batch_latenties, 99),
+        "piek_rss_mb": _piek_rss_mb(),
+        "cpu_us_per_id": cpu / aantal * 1e6,
+    }
+
+
+def _start_standin(args: argparse.Namespace) -> Tuple[subprocess.Popen[str], str]:
+    proces = subprocess.Popen(
+        [
+            sys.executable,
+            _STANDIN,
+            "--latentie",
+            str(args.latentie),
+            "--jitter",
+            str(args.jitter),
+            "--foutpercentage",
+            str(args.foutpercentage),
+            "--opvulling",
+            str(args.opvulling),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proces.stdout is not None
+    return proces, proces.stdout.readline().strip()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def vergelijk(oud: Dict[str, Any], nieuw: Dict[str, Any], drempel: float) -> List[str]:
+    """Vergelijk twee resultaatbestanden en geef de regressies terug.
+
+    Args:
+        oud (Dict[str, Any]): Eerder resultaat (de baseline)
+        nieuw (Dict[str, Any]): Nieuw resultaat
+        drempel (float): Toegestane relatieve verslechtering, bijvoorbeeld 0.1 voor 10%
+
+    Returns:
+        List[str]: Een regel per metric die meer dan `drempel` verslechterd is
+    """
+    baseline = {(r["pad"], r["aantal"]): r for r in oud["resultaten"]}
+    regressies = []
+    for resultaat in nieuw["resultaten"]:
+        sleutel = (resultaat["pad"], resultaat["aantal"])
+        if sleutel not in baseline:
+            continue
+        for metric, hoger_is_beter in METRICS.items():
+            was, is_ = baseline[sleutel].get(metric), resultaat.get(metric)
+            if not was or is_ is None:
+                continue
+            verandering = (is_ - was) / was
+            verslechtering = -verandering if hoger_is_beter else verandering
+            regel = f"{sleutel[0]:>4} {sleutel[1]:>9} {metric:<22} {was:12.2f} -> {is_:12.2f} ({verandering:+.1%})"
+            print(regel)
+            if verslechtering > drempel:
+                regressies.append(regel)
+    return regressies
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Draai de benchmarks vanaf de command line.
+
+    Args:
+        argv (Optional[Sequence[str]]): Command line argumenten. Standaard worden die van sys.argv gebruikt.
+
+    Returns:
+        int: Exitcode, 1 bij regressies ten opzichte van `--vergelijk`
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--aantallen", type=int, nargs="+", default=list(STANDAARD_AANTALLEN)
+    )
+    parser.add_argument("--paden", nargs="+", choices=PADEN, default=list(PADEN))
+    parser.add_argument("--latentie", type=float, default=0.02, help="Seconden")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Seconden")
+    parser.add_argument("--foutpercentage", type=float, default=0.0)
+    parser.add_argument("--opvulling", type=int, default=0, help="Bytes per rij")
+    parser.add_argument("--uitvoer", help="JSON-bestand voor de resultaten")
+    parser.add_argument("--vergelijk", help="Eerder resultaat om mee te vergelijken")
+    parser.add_argument("--drempel", type=float, default=0.10)
+    # intern: één scenario in een subproces
+    parser.add_argument("--scenario", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--standin", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        pad, aantal = args.scenario
+        resultaat = asyncio.run(_draai_scenario(pad, int(aantal), args.standin))
+        print(json.dumps(resultaat))
+        return 0
+
+    standin, standin_url = _start_standin(args)
+    resultaten = []
+    try:
+        for aantal in args.aantallen:
+            for pad in args.paden:
+                proces = subprocess.run(
+                    [
+                        sys.executable,
+                        os.path.abspath(__file__),
+                        "--scenario",
+                        pad,
+                        str(aantal),
+                        "--standin",
+                        standin_url,
+                    ],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                resultaat = json.loads(proces.stdout.strip().splitlines()[-1])
+                print(
+                    f"{pad:>4} {aantal:>9}: {resultaat['ids_per_seconde']:10.0f} ID's/s, "
+                    f"batch p50 {resultaat['batch_latentie_p50_ms']:.0f} ms, "
+                    f"p99 {resultaat['batch_latentie_p99_ms']:.0f} ms, "
+                    f"piek RSS {resultaat['piek_rss_mb'] or 0:.0f} MB, "
+                    f"CPU {resultaat['cpu_us_per_id']:.1f} µs/ID"
+                )
+                resultaten.append(resultaat)
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    from importlib.metadata import version
+
+    uitvoer = {
+        "formaat": 1,
+        "meta": {
+            "tijdstip": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "monumenten": version("monumenten"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "standin": {
+                "latentie": args.latentie,
+                "jitter": args.jitter,
+                "foutpercentage": args.foutpercentage,
+                "opvulling": args.opvulling,
+            },
+        },
+        "resultaten": resultaten,
+    }
+    if args.uitvoer:
+        os.makedirs(os.path.dirname(os.path.abspath(args.uitvoer)), exist_ok=True)
+        with open(args.uitvoer, "w", encoding="utf-8") as f:
+            json.dump(uitvoer, f, indent=2)
+            f.write("\n")
+
+    if args.vergelijk:
+        with open(args.vergelijk, encoding="utf-8") as f:
+            regressies = vergelijk(json.load(f), uitvoer, args.drempel)
+        if regressies:
+            print(f"\n{len(regressies)} regressie(s) groter dan {args.drempel:.0%}:")
+            print("\n".join(regressies))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,23 @@
 """Package for retrieving monument data from various Dutch government APIs."""
 
-from .client import MonumentenClient
+from __future__ import annotations
 
-__all__ = ["MonumentenClient"]
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ._processing import VerwerkingsRapport
+    from .client import MonumentenClient, MonumentenSyncClient
+
+__all__ = ["MonumentenClient", "MonumentenSyncClient", "VerwerkingsRapport"]
+
+
+def __getattr__(name: str) -> Any:
+    # De client wordt pas bij het eerste gebruik geïmporteerd, zodat `import monumenten`
+    # geen pandas en aiohttp laadt.
+    if name in ("MonumentenClient", "MonumentenSyncClient", "VerwerkingsRapport"):
+        from . import client
+
+        value = getattr(client, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
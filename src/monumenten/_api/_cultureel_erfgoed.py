@@ -1,9 +1,17 @@
+from __future__ import annotations
+
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+import weakref
+from typing import Any, Dict, List
 
 import aiohttp
 
+from monumenten._api._planner import _Planner
+from monumenten._api._sparql import _endpoint_slot, _post_sparql
+from monumenten.cache import _actieve_cache, _haal_op_per_id, _zet_per_id
+from monumenten.metrics import _meet_stap, _verhoog
+
 # Create a module-level logger
 logger = logging.getLogger("monumenten.api.cultureel_erfgoed")
 
@@ -27,6 +35,21 @@ WHERE {{
 GROUP BY ?identificatie
 """
 
+# Omgekeerd: rijksmonumentnummer -> verblijfsobjecten, via dezelfde BAG-relatie
+_VERBLIJFSOBJECTEN_PER_MONUMENT_QUERY_TEMPLATE = """
+PREFIX ceo:<https://linkeddata.cultureelerfgoed.nl/def/ceo#>
+PREFIX rn2:<https://data.cultureelerfgoed.nl/term/id/rn/2/>
+SELECT DISTINCT ?rijksmonument_nummer ?identificatie
+WHERE {{
+    ?monument ceo:heeftJuridischeStatus rn2:b2d9a59a-fe1e-4552-9a05-3c2acddff864 ;
+              ceo:rijksmonumentnummer ?rijksmonument_nummer ;
+              ceo:heeftBasisregistratieRelatie ?basisregistratieRelatie .
+    ?basisregistratieRelatie ceo:heeftBAGRelatie ?bagRelatie .
+    ?bagRelatie ceo:verblijfsobjectIdentificatie ?identificatie .
+    VALUES ?rijksmonument_nummer {{ {nummers} }}
+}}
+"""
+
 _BESCHERMDE_GEZICHTEN_QUERY = """
 PREFIX ceo:<https://linkeddata.cultureelerfgoed.nl/def/ceo#>
 PREFIX rn2:<https://data.cultureelerfgoed.nl/term/id/rn/2/>
@@ -41,23 +64,39 @@ WHERE {{
 }}
 """
 
-_cultureel_erfgoed_semaphore: Optional[asyncio.Semaphore] = None
+# Maximaal aantal gelijktijdige aanvragen per event loop; workers krijgen elk een deel hiervan
+_MAX_GELIJKTIJDIGE_AANVRAGEN = 4
 
+# De verblijfsobjecten van een monument veranderen zelden; een onbekend nummer korter onthouden
+_MONUMENT_CACHE_TTL = 60 * 60 * 24 * 30  # 30 dagen
+_MONUMENT_NIET_GEVONDEN_TTL = 60 * 60 * 24  # 1 dag
 
-def _get_semaphore(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
-    """
-    Verkrijgt een semaphore voor het beperken van gelijktijdige aanvragen naar de Cultureel Erfgoed API.
+# Een ID kan een rijksmonument worden; een verversing ziet dat na hooguit een dag
+_RIJKSMONUMENTEN_CACHE_TTL = 60 * 60 * 24  # 1 dag
+
+_cultureel_erfgoed_planners: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, _Planner
+] = weakref.WeakKeyDictionary()
+
+
+def _get_planner(loop: asyncio.AbstractEventLoop) -> _Planner:
+    """Geef de planner die de gelijktijdige aanvragen naar de Cultureel Erfgoed API verdeelt.
+
+    Eén planner per event loop, zodat de client ook vanuit meerdere loops (bijvoorbeeld de
+    achtergrond-loop van MonumentenSyncClient) bruikbaar is.
 
     Args:
         loop (asyncio.AbstractEventLoop): De asyncio event loop
 
     Returns:
-        asyncio.Semaphore: Een asyncio.Semaphore object dat het aantal gelijktijdige aanvragen beperkt tot 4
+        _Planner: De planner van deze loop, met `_MAX_GELIJKTIJDIGE_AANVRAGEN` plekken
     """
-    global _cultureel_erfgoed_semaphore
-    if _cultureel_erfgoed_semaphore is None:
-        _cultureel_erfgoed_semaphore = asyncio.Semaphore(4)
-    return _cultureel_erfgoed_semaphore
+    planner = _cultureel_erfgoed_planners.get(loop)
+    if planner is None:
+        planner = _cultureel_erfgoed_planners[loop] = _Planner(
+            "rce", _MAX_GELIJKTIJDIGE_AANVRAGEN
+        )
+    return planner
 
 
 async def _query_rijksmonumenten(
@@ -66,6 +105,8 @@ async def _query_rijksmonumenten(
     """
     Voert een SPARQL-query uit om rijksmonumenten op te halen voor gegeven BAG-identificaties.
 
+    Met een gedeelde cache worden alleen de nog onbekende ID's opgevraagd.
+
     Args:
         session (aiohttp.ClientSession): De aiohttp ClientSession voor het uitvoeren van de HTTP-aanvraag
         identificaties (List[str]): Lijst van BAG-identificaties waarvoor rijksmonumenten worden opgezocht
@@ -76,30 +117,66 @@ async def _query_rijksmonumenten(
     Raises:
         aiohttp.ClientResponseError: Bij fouten in de HTTP-aanvraag na 3 pogingen
     """
-    async with _get_semaphore(asyncio.get_running_loop()):
-        identificaties_str = " ".join(
-            f'"{identificatie}"' for identificatie in identificaties
-        )
-        query = _RIJKSMONUMENTEN_QUERY_TEMPLATE.format(
-            identificaties=identificaties_str
+    async with _endpoint_slot(_get_planner(asyncio.get_running_loop())):
+        cache = _actieve_cache.get()
+        gecachet: Dict[str, List[str]] = {}
+        if cache is not None:
+            gecachet = await _haal_op_per_id(cache, "rce", identificaties)
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(gecachet),
+                cache="rce",
+                resultaat="hit",
+            )
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(identificaties) - len(gecachet),
+                cache="rce",
+                resultaat="miss",
+            )
+        op_te_vragen = [i for i in identificaties if i not in gecachet]
+
+        resultaat: List[Dict[str, Any]] = []
+        if op_te_vragen:
+            resultaat = await _haal_rijksmonumenten_op(session, op_te_vragen)
+            if cache is not None:
+                # ook onthouden dat een ID geen rijksmonument is, als lege lijst
+                nieuw: Dict[str, List[str]] = {i: [] for i in op_te_vragen}
+                for rij in resultaat:
+                    if rij.get("identificatie") in nieuw:
+                        nieuw[rij["identificatie"]].append(rij["rijksmonument_nummer"])
+                await _zet_per_id(cache, "rce", nieuw, ttl=_RIJKSMONUMENTEN_CACHE_TTL)
+        resultaat.extend(
+            {"identificatie": identificatie, "rijksmonument_nummer": nummer}
+            for identificatie, nummers in gecachet.items()
+            for nummer in nummers
         )
-        data = {"query": query, "format": "json"}
-        retries = 3
+        return resultaat
+
+
+async def _haal_rijksmonumenten_op(
+    session: aiohttp.ClientSession, identificaties: List[str]
+) -> List[Dict[str, Any]]:
+    """Vraag de rijksmonumenten op bij de RCE, zie `_query_rijksmonumenten`."""
+    identificaties_str = " ".join(
+        f'"{identificatie}"' for identificatie in identificaties
+    )
+    query = _RIJKSMONUMENTEN_QUERY_TEMPLATE.format(identificaties=identificaties_str)
+    retries = 3
+    with _meet_stap("rce_rijksmonumenten"):
         for poging in range(retries):
             try:
-                async with session.post(
-                    _CULTUREEL_ERFGOED_SPARQL_ENDPOINT, data=data
-                ) as response:
-                    response.raise_for_status()
-                    resultaat = await response.json()
-                    if isinstance(resultaat, list):
-                        return resultaat
-                    else:
-                        logger.warning(
-                            "Unexpected response format on attempt %d: %s",
-                            poging + 1,
-                            resultaat,
-                        )
+                resultaat = await _post_sparql(
+                    session, "rce", _CULTUREEL_ERFGOED_SPARQL_ENDPOINT, query
+                )
+                if isinstance(resultaat, list):
+                    return resultaat
+                else:
+                    logger.warning(
+                        "Unexpected response format on attempt %d: %s",
+                        poging + 1,
+                        resultaat,
+                    )
             except aiohttp.ClientResponseError as e:
                 if poging != retries - 1:
                     logger.warning(
@@ -108,10 +185,102 @@ async def _query_rijksmonumenten(
                         retries,
                         str(e),
                     )
+                    _verhoog("monumenten_retries_totaal", endpoint="rce")
                     await asyncio.sleep(1)
                 else:
                     raise
-        return []
+    return []
+
+
+async def _query_verblijfsobjecten_per_monument(
+    session: aiohttp.ClientSession, nummers: List[str]
+) -> Dict[str, List[str]]:
+    """Zoek de BAG verblijfsobjecten bij rijksmonumentnummers.
+
+    Met een gedeelde cache worden alleen de nog onbekende nummers opgevraagd.
+
+    Args:
+        session (aiohttp.ClientSession): De aiohttp ClientSession voor het uitvoeren van de HTTP-aanvraag
+        nummers (List[str]): Rijksmonumentnummers
+
+    Returns:
+        Dict[str, List[str]]: Per gevonden nummer de verblijfsobject ID's
+
+    Raises:
+        aiohttp.ClientResponseError: Bij fouten in de HTTP-aanvraag na 3 pogingen
+    """
+    if not nummers:
+        return {}
+
+    async with _endpoint_slot(_get_planner(asyncio.get_running_loop())):
+        cache = _actieve_cache.get()
+        gevonden: Dict[str, List[str]] = {}
+        if cache is not None:
+            gevonden = await _haal_op_per_id(cache, "rce_monument", nummers)
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(gevonden),
+                cache="rce_monument",
+                resultaat="hit",
+            )
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(nummers) - len(gevonden),
+                cache="rce_monument",
+                resultaat="miss",
+            )
+        op_te_vragen = [nummer for nummer in nummers if nummer not in gevonden]
+        if not op_te_vragen:
+            return {nummer: ids for nummer, ids in gevonden.items() if ids}
+
+        query = _VERBLIJFSOBJECTEN_PER_MONUMENT_QUERY_TEMPLATE.format(
+            nummers=" ".join(f'"{nummer}"' for nummer in op_te_vragen)
+        )
+        resultaat: Any = []
+        retries = 3
+        with _meet_stap("rce_monumenten"):
+            for poging in range(retries):
+                try:
+                    resultaat = await _post_sparql(
+                        session, "rce", _CULTUREEL_ERFGOED_SPARQL_ENDPOINT, query
+                    )
+                    if isinstance(resultaat, list):
+                        break
+                    logger.warning(
+                        "Onverwacht response formaat bij poging %d: %s",
+                        poging + 1,
+                        resultaat,
+                    )
+                    resultaat = []
+                except aiohttp.ClientResponseError as e:
+                    if poging != retries - 1:
+                        logger.warning(
+                            "Poging %d/%d voor verblijfsobjecten per monument mislukt: %s. Opnieuw proberen over 1 seconde...",
+                            poging + 1,
+                            retries,
+                            str(e),
+                        )
+                        _verhoog("monumenten_retries_totaal", endpoint="rce")
+                        await asyncio.sleep(1)
+                    else:
+                        raise
+
+        nieuw: Dict[str, List[str]] = {}
+        for rij in resultaat:
+            if rij.get("rijksmonument_nummer") and rij.get("identificatie"):
+                nieuw.setdefault(str(rij["rijksmonument_nummer"]), []).append(
+                    str(rij["identificatie"])
+                )
+        if cache is not None:
+            await _zet_per_id(cache, "rce_monument", nieuw, ttl=_MONUMENT_CACHE_TTL)
+            await _zet_per_id(
+                cache,
+                "rce_monument",
+                {nummer: [] for nummer in op_te_vragen if nummer not in nieuw},
+                ttl=_MONUMENT_NIET_GEVONDEN_TTL,
+            )
+        gevonden.update(nieuw)
+        return {nummer: ids for nummer, ids in gevonden.items() if ids}
 
 
 async def _query_beschermde_gezichten(
@@ -130,15 +299,15 @@ async def _query_beschermde_gezichten(
         aiohttp.ClientResponseError: Bij fouten in de HTTP-aanvraag na 3 pogingen
     """
     retries = 3
-    for poging in range(retries):
-        try:
-            data = {"query": _BESCHERMDE_GEZICHTEN_QUERY, "format": "json"}
-
-            async with session.post(
-                _CULTUREEL_ERFGOED_SPARQL_ENDPOINT, data=data
-            ) as response:
-                response.raise_for_status()
-                resultaat = await response.json()
+    with _meet_stap("rce_gezichten"):
+        for poging in range(retries):
+            try:
+                resultaat = await _post_sparql(
+                    session,
+                    "rce",
+                    _CULTUREEL_ERFGOED_SPARQL_ENDPOINT,
+                    _BESCHERMDE_GEZICHTEN_QUERY,
+                )
                 if isinstance(resultaat, list):
                     return resultaat
                 else:
@@ -147,15 +316,16 @@ async def _query_beschermde_gezichten(
                         poging + 1,
                         resultaat,
                     )
-        except aiohttp.ClientResponseError as e:
-            if poging != retries - 1:
-                logger.warning(
-                    "Poging %d/%d voor beschermde gezichten query mislukt: %s. Opnieuw proberen over 1 seconde...",
-                    poging + 1,
-                    retries,
-                    str(e),
-                )
-                await asyncio.sleep(1)
-            else:
-                raise
+            except aiohttp.ClientResponseError as e:
+                if poging != retries - 1:
+                    logger.warning(
+                        "Poging %d/%d voor beschermde gezichten query mislukt: %s. Opnieuw proberen over 1 seconde...",
+                        poging + 1,
+                        retries,
+                        str(e),
+                    )
+                    _verhoog("monumenten_retries_totaal", endpoint="rce")
+                    await asyncio.sleep(1)
+                else:
+                    raise
     return []
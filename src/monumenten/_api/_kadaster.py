@@ -1,9 +1,18 @@
+from __future__ import annotations
+
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional
+import weakref
+from typing import Any, Collection, Dict, List, Optional
+from urllib.parse import unquote
 
 import aiohttp
 
+from monumenten._api._planner import _Planner
+from monumenten._api._sparql import _endpoint_slot, _post_sparql
+from monumenten.cache import _actieve_cache, _haal_op_per_id, _zet_per_id
+from monumenten.metrics import _meet_stap, _verhoog
+
 # New endpoints following the BAG LV + KKG two-stage approach
 _BAG_LV_ENDPOINT = "https://api.labs.kadaster.nl/datasets/bag/lv/services/baglv/sparql"
 _KKG_ENDPOINT = "https://data.kkg.kadaster.nl/service/sparql"
@@ -24,19 +33,25 @@ WHERE {{
 """
 
 # Stage 2 – KKG: Nummeraanduiding URI -> geometrie + beperkingen
+# Eén rij per adres: een gebouw op meerdere percelen gaf anders een rij per perceel en beperking,
+# elk met de volledige WKT van het adres. Per beperking worden grondslagcode en grondslag als
+# "code=grondslag" samengevoegd, zodat elke grondslag zijn eigen code houdt. ENCODE_FOR_URI laat
+# geen "=" of spatie over, dus de scheidingstekens kunnen niet in een grondslag voorkomen.
 _KKG_VERBLIJFSOBJECTEN_QUERY_TEMPLATE = """
 PREFIX imx: <http://modellen.geostandaarden.nl/def/imx-geo#>
 PREFIX prov: <http://www.w3.org/ns/prov#>
 PREFIX geo: <http://www.opengis.net/ont/geosparql#>
 
-SELECT DISTINCT ?nummeraanduiding ?verblijfsobjectWKT ?grondslagcode ?grondslag_gemeentelijk_monument
+SELECT ?nummeraanduiding
+       (SAMPLE(?adresWKT) AS ?verblijfsobjectWKT)
+       (GROUP_CONCAT(DISTINCT ?beperking_paar; separator=" ") AS ?beperkingen)
 WHERE {{
   VALUES ?nummeraanduiding {{ {nummeraanduiding_values} }}
 
   # Adres gekoppeld aan BAG Nummeraanduiding via prov:wasDerivedFrom
   ?adres a imx:Adres ;
-         prov:wasDerivedFrom ?nummeraanduiding ;
-         geo:hasGeometry/geo:asWKT ?verblijfsobjectWKT .
+         prov:wasDerivedFrom ?nummeraanduiding .
+  {geometrie_patroon}
 
   # Eventuele beperkingen via Gebouw -> Perceel -> Beperking
   OPTIONAL {{
@@ -47,42 +62,74 @@ WHERE {{
     OPTIONAL {{
       ?beperking imx:isBeperkingOpPerceel ?perceel .
       ?beperking imx:grondslagcode ?grondslagcode .
-      ?beperking imx:grondslag ?grondslag_gemeentelijk_monument .
+      ?beperking imx:grondslag ?grondslag .
       VALUES ?grondslagcode {{
         "GG"  # Besluit monument, Gemeentewet
         "GWA" # Gemeentewet: Aanwijzing gemeentelijk monument (voorbescherming, aanwijzing, afschrift)
         "EWE" # Erfgoedwet: Afschrift inschrijving monument of archeologisch monument in rijksmonumentenregister door minister OCW
         "EWD" # Erfgoedwet: Toezending ontwerpbesluit aanwijzing rijksmonument door minister OCW (voorbescherming)
       }}
+      # alleen de grondslag van een gemeentelijk monument komt in het resultaat
+      BIND(CONCAT(?grondslagcode, "=", IF(?grondslagcode IN ("GG", "GWA"), ENCODE_FOR_URI(?grondslag), "")) AS ?beperking_paar)
     }}
   }}
 }}
+GROUP BY ?nummeraanduiding
 """
 
-_kadaster_semaphore: Optional[asyncio.Semaphore] = None
+# Een verblijfsobject houdt in de praktijk zijn hoofdadres
+_BAG_LV_CACHE_TTL = 60 * 60 * 24 * 30  # 30 dagen
+_BAG_LV_NIET_GEVONDEN_TTL = 60 * 60 * 24  # 1 dag
+
+# Beperkingen kunnen wijzigen (een nieuw monument); een verversing ziet ze na hooguit een dag
+_KKG_CACHE_TTL = 60 * 60 * 24  # 1 dag
+
+# Alleen opgenomen als de geometrie van het adres nodig is (beschermd gezicht test)
+_KKG_GEOMETRIE_PATROON = "?adres geo:hasGeometry/geo:asWKT ?adresWKT ."
+
+# Maximaal aantal gelijktijdige aanvragen per event loop; workers krijgen elk een deel hiervan
+_MAX_GELIJKTIJDIGE_AANVRAGEN = 4
+
+_kadaster_planners: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Planner] = (
+    weakref.WeakKeyDictionary()
+)
 
 # Create a module-level logger
 logger = logging.getLogger("monumenten.api.kadaster")
 
 
-def _get_semaphore(loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
-    global _kadaster_semaphore
-    if _kadaster_semaphore is None:
-        _kadaster_semaphore = asyncio.Semaphore(4)
-    return _kadaster_semaphore
+def _get_planner(loop: asyncio.AbstractEventLoop) -> _Planner:
+    """Geef de planner die de gelijktijdige aanvragen naar het Kadaster verdeelt.
+
+    Eén planner per event loop, zodat de client ook vanuit meerdere loops (bijvoorbeeld de
+    achtergrond-loop van MonumentenSyncClient) bruikbaar is.
+
+    Args:
+        loop (asyncio.AbstractEventLoop): De asyncio event loop
+
+    Returns:
+        _Planner: De planner van deze loop, met `_MAX_GELIJKTIJDIGE_AANVRAGEN` plekken
+    """
+    planner = _kadaster_planners.get(loop)
+    if planner is None:
+        planner = _kadaster_planners[loop] = _Planner(
+            "kadaster", _MAX_GELIJKTIJDIGE_AANVRAGEN
+        )
+    return planner
 
 
 async def _post_sparql_json(
-    session: aiohttp.ClientSession, endpoint: str, query: str, context: str
+    session: aiohttp.ClientSession,
+    endpoint_naam: str,
+    endpoint: str,
+    query: str,
+    context: str,
 ) -> Any:
     """Generic helper to POST a SPARQL query and return JSON with retries."""
-    data = {"query": query, "format": "json"}
     retries = 3
     for poging in range(retries):
         try:
-            async with session.post(endpoint, data=data) as response:
-                response.raise_for_status()
-                return await response.json()
+            return await _post_sparql(session, endpoint_naam, endpoint, query)
         except aiohttp.ClientResponseError as e:
             if poging != retries - 1:
                 logger.warning(
@@ -92,6 +139,7 @@ async def _post_sparql_json(
                     context,
                     str(e),
                 )
+                _verhoog("monumenten_retries_totaal", endpoint=endpoint_naam)
                 await asyncio.sleep(1)
             else:
                 logger.error(
@@ -103,113 +151,279 @@ async def _post_sparql_json(
                 raise
 
 
-async def _query_verblijfsobjecten(
+def _rijen_per_beperking(adres: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Zet de geaggregeerde KKG-rij van een adres om naar een rij per beperking.
+
+    De verwerking kijkt per rij naar de grondslagcode: EWE/EWD voor een rijksmonument en GG/GWA,
+    met de grondslag, voor een gemeentelijk monument. Een adres zonder beperkingen krijgt één rij
+    zonder grondslagcode.
+
+    Args:
+        adres (Dict[str, Any]): Rij met verblijfsobjectWKT en beperkingen: "code=grondslag" paren
+            gescheiden door een spatie, met de grondslag URI-gecodeerd
+
+    Returns:
+        List[Dict[str, Any]]: Rijen met verblijfsobjectWKT, grondslagcode en
+            grondslag_gemeentelijk_monument
+    """
+    wkt = adres.get("verblijfsobjectWKT") or None
+    rijen: List[Dict[str, Any]] = []
+    for paar in (adres.get("beperkingen") or "").split():
+        code, _, grondslag = paar.partition("=")
+        rijen.append(
+            {
+                "verblijfsobjectWKT": wkt,
+                "grondslagcode": code,
+                "grondslag_gemeentelijk_monument": unquote(grondslag) or None,
+            }
+        )
+    if not rijen:
+        rijen.append(
+            {
+                "verblijfsobjectWKT": wkt,
+                "grondslagcode": None,
+                "grondslag_gemeentelijk_monument": None,
+            }
+        )
+    return rijen
+
+
+async def _query_nummeraanduidingen(
     session: aiohttp.ClientSession, identificaties: List[str]
 ) -> List[Dict[str, Any]]:
-    """Query BAG LV + KKG to obtain geometrie en beperkingen per verblijfsobject."""
-    async with _get_semaphore(asyncio.get_running_loop()):
-        if not identificaties:
-            return []
+    """Query BAG LV voor de nummeraanduiding(en) per verblijfsobject.
 
-        # -------------------------
-        # Stage 1 – BAG LV
-        # -------------------------
-        id_values = " ".join(f'"{identificatie}"' for identificatie in identificaties)
-        bag_query = _BAG_NUMMERAANDUIDING_QUERY_TEMPLATE.format(id_values=id_values)
+    Args:
+        session (aiohttp.ClientSession): De aiohttp ClientSession voor het uitvoeren van de HTTP-aanvraag
+        identificaties (List[str]): Lijst van BAG-identificaties
 
+    Returns:
+        List[Dict[str, Any]]: Lijst van dictionaries met voId en nummeraanduiding
+    """
+    id_values = " ".join(f'"{identificatie}"' for identificatie in identificaties)
+    bag_query = _BAG_NUMMERAANDUIDING_QUERY_TEMPLATE.format(id_values=id_values)
+
+    with _meet_stap("bag_lv"):
         bag_data = await _post_sparql_json(
-            session, _BAG_LV_ENDPOINT, bag_query, "BAG nummeraanduiding query"
+            session,
+            "bag_lv",
+            _BAG_LV_ENDPOINT,
+            bag_query,
+            "BAG nummeraanduiding query",
         )
 
-        bag_results: List[Dict[str, Any]] = []
-        if isinstance(bag_data, list):
-            bag_results = bag_data
-        elif isinstance(bag_data, dict):
-            bindings = bag_data.get("results", {}).get("bindings", [])
-            for b in bindings:
-                bag_results.append(
-                    {
-                        "voId": b.get("voId", {}).get("value", ""),
-                        "nummeraanduiding": b.get("nummeraanduiding", {}).get(
-                            "value", ""
-                        ),
-                    }
-                )
+    bag_results: List[Dict[str, Any]] = []
+    if isinstance(bag_data, list):
+        bag_results = bag_data
+    elif isinstance(bag_data, dict):
+        bindings = bag_data.get("results", {}).get("bindings", [])
+        for b in bindings:
+            bag_results.append(
+                {
+                    "voId": b.get("voId", {}).get("value", ""),
+                    "nummeraanduiding": b.get("nummeraanduiding", {}).get("value", ""),
+                }
+            )
+    return bag_results
 
-        if not bag_results:
-            # Geen geldige BAG koppelingen gevonden
-            return []
-
-        # Map Nummeraanduiding URI -> set van verblijfsobject IDs
-        na_to_vo_ids: Dict[str, List[str]] = {}
-        for row in bag_results:
-            vo_id = row.get("voId")
-            na_uri = row.get("nummeraanduiding")
-            if not vo_id or not na_uri:
-                continue
-            na_to_vo_ids.setdefault(na_uri, []).append(vo_id)
-
-        if not na_to_vo_ids:
-            return []
-
-        nummeraanduiding_values = " ".join(f"<{uri}>" for uri in na_to_vo_ids.keys())
-
-        # -------------------------
-        # Stage 2 – KKG
-        # -------------------------
-        kkg_query = _KKG_VERBLIJFSOBJECTEN_QUERY_TEMPLATE.format(
-            nummeraanduiding_values=nummeraanduiding_values
-        )
 
-        kkg_data = await _post_sparql_json(
-            session, _KKG_ENDPOINT, kkg_query, "KKG verblijfsobjecten query"
-        )
+async def _query_verblijfsobjecten(
+    session: aiohttp.ClientSession,
+    identificaties: List[str],
+    met_geometrie: bool = True,
+    geometrie_voor: Optional[Collection[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Query BAG LV + KKG to obtain geometrie en beperkingen per verblijfsobject.
+
+    Met een gedeelde cache worden alleen de ID's opgevraagd waarvan de beperkingen nog niet
+    bekend zijn of waarvan de geometrie nodig is.
+
+    Args:
+        session (aiohttp.ClientSession): De aiohttp ClientSession voor het uitvoeren van de HTTP-aanvraag
+        identificaties (List[str]): Lijst van BAG-identificaties
+        met_geometrie (bool): Of de WKT-geometrie van het adres opgehaald moet worden. Zonder geometrie
+            is verblijfsobjectWKT leeg en is de response een stuk kleiner. Standaard is True.
+        geometrie_voor (Optional[Collection[str]]): Indien opgegeven is de geometrie alleen voor
+            deze ID's nodig; de andere ID's kunnen uit de gedeelde cache komen
+
+    Returns:
+        List[Dict[str, Any]]: Lijst van dictionaries met geometrie en beperkingen per verblijfsobject
+    """
+    if not identificaties:
+        return []
+
+    async with _endpoint_slot(_get_planner(asyncio.get_running_loop())):
+        # met een gedeelde cache worden de beperkingen van bekende ID's niet opnieuw opgevraagd;
+        # als de geometrie nodig is moet het adres toch bevraagd worden, behalve als het ID
+        # niet gevonden werd
+        cache = _actieve_cache.get()
+        gecachet: Dict[str, List[List[Optional[str]]]] = {}
+        if cache is not None:
+            gecachet = {
+                identificatie: rijen
+                for identificatie, rijen in (
+                    await _haal_op_per_id(cache, "kkg", identificaties)
+                ).items()
+                if not rijen
+                or not met_geometrie
+                or (geometrie_voor is not None and identificatie not in geometrie_voor)
+            }
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(gecachet),
+                cache="kkg",
+                resultaat="hit",
+            )
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(identificaties) - len(gecachet),
+                cache="kkg",
+                resultaat="miss",
+            )
+        op_te_vragen = [i for i in identificaties if i not in gecachet]
 
-        kkg_results: List[Dict[str, Any]] = []
-        if isinstance(kkg_data, list):
-            kkg_results = kkg_data
-        elif isinstance(kkg_data, dict):
-            bindings = kkg_data.get("results", {}).get("bindings", [])
-            for b in bindings:
-                kkg_results.append(
-                    {
-                        "nummeraanduiding": b.get("nummeraanduiding", {})
-                        .get("value", "")
-                        .strip(),
-                        "verblijfsobjectWKT": b.get("verblijfsobjectWKT", {}).get(
-                            "value", ""
-                        ),
-                        "grondslagcode": b.get("grondslagcode", {}).get("value", ""),
-                        "grondslag_gemeentelijk_monument": b.get(
-                            "grondslag_gemeentelijk_monument", {}
-                        ).get("value", ""),
-                    }
-                )
+        resultaten: List[Dict[str, Any]] = []
+        if op_te_vragen:
+            resultaten = await _haal_verblijfsobjecten_op(
+                session, op_te_vragen, met_geometrie
+            )
+            if cache is not None:
+                # ook onthouden dat een ID niet gevonden is, als lege lijst
+                nieuw: Dict[str, List[List[Optional[str]]]] = {
+                    i: [] for i in op_te_vragen
+                }
+                for rij in resultaten:
+                    nieuw[rij["identificatie"]].append(
+                        [rij["grondslagcode"], rij["grondslag_gemeentelijk_monument"]]
+                    )
+                await _zet_per_id(cache, "kkg", nieuw, ttl=_KKG_CACHE_TTL)
+        resultaten.extend(
+            {
+                "identificatie": vo_id,
+                "verblijfsobjectWKT": None,
+                "grondslagcode": grondslagcode,
+                "grondslag_gemeentelijk_monument": grondslag,
+            }
+            for vo_id, rijen in gecachet.items()
+            for grondslagcode, grondslag in rijen
+        )
+        return resultaten
 
-        if not kkg_results:
-            # We hebben wel geometrie-nummers maar geen beperkingen/geometry uit KKG
-            return []
 
-        resultaten: List[Dict[str, Any]] = []
-        for row in kkg_results:
-            na_uri = row.get("nummeraanduiding", "")
-            if not na_uri:
-                continue
-            vo_ids = na_to_vo_ids.get(na_uri, [])
-            if not vo_ids:
-                continue
-
-            for vo_id in vo_ids:
-                resultaten.append(
-                    {
-                        "identificatie": vo_id,
-                        "verblijfsobjectWKT": row.get("verblijfsobjectWKT"),
-                        "grondslagcode": row.get("grondslagcode") or None,
-                        "grondslag_gemeentelijk_monument": row.get(
-                            "grondslag_gemeentelijk_monument"
-                        )
-                        or None,
-                    }
-                )
+async def _haal_verblijfsobjecten_op(
+    session: aiohttp.ClientSession,
+    identificaties: List[str],
+    met_geometrie: bool,
+) -> List[Dict[str, Any]]:
+    """Vraag geometrie en beperkingen op bij BAG LV en KKG, zie `_query_verblijfsobjecten`."""
+    # -------------------------
+    # Stage 1 – BAG LV
+    # -------------------------
+    # met een gedeelde cache worden alleen de nog onbekende koppelingen opgevraagd
+    cache = _actieve_cache.get()
+    gecachet: Dict[str, List[str]] = {}
+    if cache is not None:
+        gecachet = await _haal_op_per_id(cache, "bag_lv", identificaties)
+        _verhoog(
+            "monumenten_cache_totaal",
+            len(gecachet),
+            cache="bag_lv",
+            resultaat="hit",
+        )
+        _verhoog(
+            "monumenten_cache_totaal",
+            len(identificaties) - len(gecachet),
+            cache="bag_lv",
+            resultaat="miss",
+        )
+    op_te_vragen = [i for i in identificaties if i not in gecachet]
+
+    bag_results: List[Dict[str, Any]] = []
+    if op_te_vragen:
+        bag_results = await _query_nummeraanduidingen(session, op_te_vragen)
+        if cache is not None:
+            nieuw: Dict[str, List[str]] = {}
+            for row in bag_results:
+                if row.get("voId") and row.get("nummeraanduiding"):
+                    nieuw.setdefault(row["voId"], []).append(row["nummeraanduiding"])
+            await _zet_per_id(cache, "bag_lv", nieuw, ttl=_BAG_LV_CACHE_TTL)
+            # ook onthouden dat een ID niet gevonden is, maar korter
+            await _zet_per_id(
+                cache,
+                "bag_lv",
+                {i: [] for i in op_te_vragen if i not in nieuw},
+                ttl=_BAG_LV_NIET_GEVONDEN_TTL,
+            )
+    bag_results.extend(
+        {"voId": vo_id, "nummeraanduiding": nummeraanduiding}
+        for vo_id, nummeraanduidingen in gecachet.items()
+        for nummeraanduiding in nummeraanduidingen
+    )
+
+    if not bag_results:
+        # Geen geldige BAG koppelingen gevonden
+        return []
+
+    # Map Nummeraanduiding URI -> set van verblijfsobject IDs
+    na_to_vo_ids: Dict[str, List[str]] = {}
+    for row in bag_results:
+        vo_id = row.get("voId")
+        na_uri = row.get("nummeraanduiding")
+        if not vo_id or not na_uri:
+            continue
+        na_to_vo_ids.setdefault(na_uri, []).append(vo_id)
+
+    if not na_to_vo_ids:
+        return []
+
+    nummeraanduiding_values = " ".join(f"<{uri}>" for uri in na_to_vo_ids.keys())
+
+    # -------------------------
+    # Stage 2 – KKG
+    # -------------------------
+    kkg_query = _KKG_VERBLIJFSOBJECTEN_QUERY_TEMPLATE.format(
+        nummeraanduiding_values=nummeraanduiding_values,
+        geometrie_patroon=_KKG_GEOMETRIE_PATROON if met_geometrie else "",
+    )
+
+    with _meet_stap("kkg"):
+        kkg_data = await _post_sparql_json(
+            session, "kkg", _KKG_ENDPOINT, kkg_query, "KKG verblijfsobjecten query"
+        )
 
-        return resultaten
+    kkg_results: List[Dict[str, Any]] = []
+    if isinstance(kkg_data, list):
+        kkg_results = kkg_data
+    elif isinstance(kkg_data, dict):
+        bindings = kkg_data.get("results", {}).get("bindings", [])
+        for b in bindings:
+            kkg_results.append(
+                {
+                    "nummeraanduiding": b.get("nummeraanduiding", {})
+                    .get("value", "")
+                    .strip(),
+                    "verblijfsobjectWKT": b.get("verblijfsobjectWKT", {}).get(
+                        "value", ""
+                    ),
+                    "beperkingen": b.get("beperkingen", {}).get("value", ""),
+                }
+            )
+
+    if not kkg_results:
+        # We hebben wel geometrie-nummers maar geen beperkingen/geometry uit KKG
+        return []
+
+    resultaten: List[Dict[str, Any]] = []
+    for row in kkg_results:
+        na_uri = row.get("nummeraanduiding", "")
+        if not na_uri:
+            continue
+        vo_ids = na_to_vo_ids.get(na_uri, [])
+        if not vo_ids:
+            continue
+
+        rijen = _rijen_per_beperking(row)
+        for vo_id in vo_ids:
+            resultaten.extend({"identificatie": vo_id, **rij} for rij in rijen)
+
+    return resultaten
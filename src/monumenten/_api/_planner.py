@@ -0,0 +1,173 @@
+"""Verdeling van de vrije plekken bij een endpoint over prioriteitsklassen.
+
+Zonder planner wachten alle batches in volgorde van aankomst op een vrije plek. Een bulkverwerking
+zet duizenden batches tegelijk klaar, waardoor een opvraging van een paar ID's achter al die
+batches aansluit. De planner verdeelt vrijgekomen plekken met weighted fair queuing: elke
+wachtende aanvraag krijgt een virtuele eindtijd die per klasse oploopt met 1 / gewicht, en de
+aanvraag met de laagste eindtijd krijgt de volgende plek. Een interactieve aanvraag komt daardoor
+vrijwel direct aan de beurt, terwijl bulk de rest van de capaciteit gebruikt.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+from monumenten.metrics import _observeer
+from monumenten.profiel import _span
+
+PRIORITEITEN = ("interactief", "bulk")
+
+# aandeel in de capaciteit als beide klassen aanvragen hebben klaarstaan
+_GEWICHTEN = {"interactief": 8.0, "bulk": 1.0}
+
+_actieve_prioriteit: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "monumenten_prioriteit", default="interactief"
+)
+
+
+@contextmanager
+def _gebruik_prioriteit(prioriteit: str) -> Iterator[None]:
+    """Laat de aanvragen binnen dit blok in de gegeven prioriteitsklasse wachten.
+
+    Args:
+        prioriteit (str): Een van `PRIORITEITEN`
+
+    Yields:
+        None: Binnen het blok geldt de prioriteit
+    """
+    token = _actieve_prioriteit.set(prioriteit)
+    try:
+        yield
+    finally:
+        _actieve_prioriteit.reset(token)
+
+
+def _controleer_prioriteit(prioriteit: Optional[str]) -> None:
+    """Controleer een opgegeven prioriteit.
+
+    Args:
+        prioriteit (Optional[str]): Een van `PRIORITEITEN`, of None voor automatisch
+
+    Raises:
+        ValueError: Bij een onbekende prioriteit
+    """
+    if prioriteit is not None and prioriteit not in PRIORITEITEN:
+        raise ValueError(
+            f"Onbekende prioriteit '{prioriteit}', kies uit: {', '.join(PRIORITEITEN)}"
+        )
+
+
+class _Planner:
+    """Beperkt het aantal gelijktijdige aanvragen bij een endpoint, met voorrang per klasse.
+
+    Args:
+        endpoint_naam (str): Naam van het endpoint voor de metingen
+        capaciteit (int): Maximaal aantal gelijktijdige aanvragen
+        gewichten (Optional[Dict[str, float]]): Gewicht per prioriteitsklasse. Standaard krijgt
+            interactief acht keer zoveel plekken als bulk zolang beide klassen wachten.
+    """
+
+    def __init__(
+        self,
+        endpoint_naam: str,
+        capaciteit: int,
+        gewichten: Optional[Dict[str, float]] = None,
+    ) -> None:
+        if capaciteit < 1:
+            raise ValueError("capaciteit moet minimaal 1 zijn")
+        self.endpoint_naam = endpoint_naam
+        self._vrij = capaciteit
+        self._gewichten = dict(gewichten or _GEWICHTEN)
+        self._wachtrijen: Dict[str, Deque[Tuple[float, asyncio.Future[None]]]] = {
+            klasse: deque() for klasse in self._gewichten
+        }
+        self._laatste_eindtijd = dict.fromkeys(self._gewichten, 0.0)
+        self._virtuele_tijd = 0.0
+
+    def wachtrij_lengtes(self) -> Dict[str, int]:
+        """Geef het aantal wachtende aanvragen per klasse.
+
+        Returns:
+            Dict[str, int]: Aantal wachtende aanvragen per prioriteitsklasse
+        """
+        return {
+            klasse: sum(not future.done() for _, future in wachtrij)
+            for klasse, wachtrij in self._wachtrijen.items()
+        }
+
+    @asynccontextmanager
+    async def slot(self, prioriteit: str) -> AsyncIterator[None]:
+        """Wacht op een vrije plek en geef hem na het blok weer vrij.
+
+        Args:
+            prioriteit (str): Prioriteitsklasse van de aanvraag
+
+        Yields:
+            None: Binnen het blok is er een plek bij het endpoint gereserveerd
+        """
+        start = time.perf_counter()
+        with _span(f"wachten {self.endpoint_naam}", "wachten", prioriteit=prioriteit):
+            await self._verkrijg(prioriteit)
+        _observeer(
+            "monumenten_wachttijd_seconden",
+            time.perf_counter() - start,
+            endpoint=self.endpoint_naam,
+            prioriteit=prioriteit,
+        )
+        try:
+            yield
+        finally:
+            self._geef_vrij()
+
+    async def _verkrijg(self, prioriteit: str) -> None:
+        wachtrij = self._wachtrijen[prioriteit]
+        _observeer(
+            "monumenten_wachtrij_lengte",
+            len(wachtrij),
+            endpoint=self.endpoint_naam,
+            prioriteit=prioriteit,
+        )
+        eindtijd = (
+            max(self._virtuele_tijd, self._laatste_eindtijd[prioriteit])
+            + 1 / self._gewichten[prioriteit]
+        )
+        self._laatste_eindtijd[prioriteit] = eindtijd
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        wachtrij.append((eindtijd, future))
+        self._wijs_toe()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # de plek was al toegewezen; doorgeven aan de volgende
+                self._geef_vrij()
+            else:
+                future.cancel()
+            raise
+
+    def _geef_vrij(self) -> None:
+        self._vrij += 1
+        self._wijs_toe()
+
+    def _wijs_toe(self) -> None:
+        """Geef vrije plekken aan de wachtende aanvragen met de laagste eindtijd."""
+        while self._vrij > 0:
+            kandidaten = [
+                (wachtrij[0][0], klasse)
+                for klasse, wachtrij in self._wachtrijen.items()
+                if wachtrij
+            ]
+            if not kandidaten:
+                return
+            _, klasse = min(kandidaten)
+            eindtijd, future = self._wachtrijen[klasse].popleft()
+            if future.done():
+                continue  # geannuleerd tijdens het wachten
+            self._vrij -= 1
+            self._virtuele_tijd = eindtijd
+            future.set_result(None)
@@ -0,0 +1,254 @@
+"""Gedeeld transport voor de SPARQL endpoints, met metingen per endpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextvars
+import json
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+import aiohttp
+
+from monumenten._api._planner import _actieve_prioriteit, _Planner
+from monumenten.metrics import _meet_stap, _observeer, _verhoog
+from monumenten.profiel import _span
+
+_T = TypeVar("_T")
+
+
+class _Hedger:
+    """Verstuurt een dubbele aanvraag als de eerste ongewoon lang duurt.
+
+    De drempel is een percentiel van de duur van de recente aanvragen naar hetzelfde endpoint.
+    Zodra een aanvraag langer duurt dan de drempel wordt een tweede, identieke aanvraag
+    verstuurd; de aanvraag die het eerst klaar is wint en de andere wordt geannuleerd. Het
+    aantal extra aanvragen blijft onder `budget` maal het totaal aantal aanvragen.
+
+    Args:
+        endpoint_naam (str): Naam van het endpoint voor de metingen
+        percentiel (float): Percentiel (0-1) van de recente aanvraagduur dat als drempel dient
+        budget (float): Maximale fractie extra aanvragen, bijvoorbeeld 0.05 voor 5%
+        min_metingen (int): Minimaal aantal metingen voordat er gehedged wordt
+        venster (int): Aantal recente metingen waarover het percentiel bepaald wordt
+    """
+
+    def __init__(
+        self,
+        endpoint_naam: str,
+        percentiel: float = 0.95,
+        budget: float = 0.05,
+        min_metingen: int = 20,
+        venster: int = 200,
+    ) -> None:
+        self._endpoint_naam = endpoint_naam
+        self._percentiel = percentiel
+        self._budget = budget
+        self._min_metingen = min_metingen
+        self._duren: Deque[float] = collections.deque(maxlen=venster)
+        self.aantal_aanvragen = 0
+        self.aantal_hedges = 0
+
+    def drempel(self) -> Optional[float]:
+        """Optional[float]: De huidige drempel in seconden, None zolang er te weinig metingen zijn."""
+        if len(self._duren) < self._min_metingen:
+            return None
+        gesorteerd = sorted(self._duren)
+        return gesorteerd[
+            min(int(self._percentiel * len(gesorteerd)), len(gesorteerd) - 1)
+        ]
+
+    def _binnen_budget(self) -> bool:
+        return self.aantal_hedges + 1 <= self._budget * self.aantal_aanvragen
+
+    async def voer_uit(self, aanvraag: Callable[[], Awaitable[_T]]) -> _T:
+        """Voer een aanvraag uit, met een dubbele aanvraag als hij te lang duurt.
+
+        Args:
+            aanvraag (Callable[[], Awaitable[_T]]): Functie die de aanvraag (opnieuw) uitvoert
+
+        Returns:
+            _T: Het resultaat van de aanvraag die het eerst klaar was
+
+        Raises:
+            BaseException: De fout van de aanvraag als alle aanvragen mislukken
+        """
+        self.aantal_aanvragen += 1
+        drempel = self.drempel()
+        start = time.perf_counter()
+        eerste = asyncio.ensure_future(aanvraag())
+        taken: Set[asyncio.Future[_T]] = {eerste}
+        starttijden: Dict[asyncio.Future[_T], float] = {eerste: start}
+        try:
+            if drempel is not None:
+                klaar, _ = await asyncio.wait(taken, timeout=drempel)
+                if not klaar and self._binnen_budget():
+                    self.aantal_hedges += 1
+                    _verhoog("monumenten_hedges_totaal", endpoint=self._endpoint_naam)
+                    tweede = asyncio.ensure_future(aanvraag())
+                    taken.add(tweede)
+                    starttijden[tweede] = time.perf_counter()
+
+            fout: Optional[BaseException] = None
+            while taken:
+                klaar, taken = await asyncio.wait(
+                    taken, return_when=asyncio.FIRST_COMPLETED
+                )
+                for taak in klaar:
+                    if taak.exception() is not None:
+                        fout = fout or taak.exception()
+                        continue
+                    self._duren.append(time.perf_counter() - starttijden[taak])
+                    if taak is not eerste:
+                        _verhoog(
+                            "monumenten_hedges_gewonnen_totaal",
+                            endpoint=self._endpoint_naam,
+                        )
+                    return taak.result()
+            assert fout is not None
+            raise fout
+        finally:
+            for taak in taken:
+                if not taak.done():
+                    # de verliezer: zijn duur is minstens zo lang als tot nu toe
+                    self._duren.append(time.perf_counter() - starttijden[taak])
+                    taak.cancel()
+
+
+# De hedgers (per endpoint) van de client die de huidige aanroep doet; None als hedging uit staat
+_actieve_hedgers: contextvars.ContextVar[Optional[Dict[str, _Hedger]]] = (
+    contextvars.ContextVar("monumenten_hedgers", default=None)
+)
+
+
+@contextmanager
+def _gebruik_hedging(hedgers: Optional[Dict[str, _Hedger]]) -> Iterator[None]:
+    """Gebruik `hedgers` voor de aanvragen binnen dit blok; None schakelt hedging uit."""
+    token = _actieve_hedgers.set(hedgers)
+    try:
+        yield
+    finally:
+        _actieve_hedgers.reset(token)
+
+
+@asynccontextmanager
+async def _endpoint_slot(planner: _Planner) -> AsyncIterator[None]:
+    """Wacht op een vrije plek bij een endpoint, in de prioriteitsklasse van de aanroeper.
+
+    Args:
+        planner (_Planner): De planner die het aantal gelijktijdige aanvragen beperkt
+
+    Yields:
+        None: Binnen het blok is er een plek bij het endpoint gereserveerd
+    """
+    async with planner.slot(_actieve_prioriteit.get()):
+        yield
+
+
+async def _open_verbindingen(
+    session: aiohttp.ClientSession, endpoint: str, aantal: int
+) -> None:
+    """Open alvast keep-alive verbindingen naar een endpoint.
+
+    Elke verbinding doet een HEAD-aanvraag, waarmee DNS, TCP en TLS al gedaan zijn; daarna
+    blijft de verbinding in de pool van de sessie voor de echte aanvragen. De statuscode
+    doet er niet toe.
+
+    Args:
+        session (aiohttp.ClientSession): De sessie waarvan de pool gevuld wordt
+        endpoint (str): URL van het SPARQL endpoint
+        aantal (int): Aantal verbindingen, gelijk aan het maximale aantal gelijktijdige aanvragen
+    """
+
+    async def _open() -> None:
+        async with session.head(endpoint, allow_redirects=False) as response:
+            await response.read()
+
+    await asyncio.gather(*(_open() for _ in range(aantal)))
+
+
+async def _post_sparql(
+    session: aiohttp.ClientSession, endpoint_naam: str, endpoint: str, query: str
+) -> Any:
+    """POST één SPARQL query (zonder retries) en geef de geparste JSON terug.
+
+    Als hedging aan staat (zie `_gebruik_hedging`) wordt bij een trage aanvraag een
+    dubbele aanvraag verstuurd.
+
+    Args:
+        session (aiohttp.ClientSession): De aiohttp ClientSession voor het uitvoeren van de HTTP-aanvraag
+        endpoint_naam (str): Naam van het endpoint voor de metingen, bijvoorbeeld "kkg"
+        endpoint (str): URL van het SPARQL endpoint
+        query (str): De SPARQL query
+
+    Returns:
+        Any: De geparste JSON response
+    """
+    hedgers = _actieve_hedgers.get()
+    if hedgers is None:
+        return await _post_sparql_poging(session, endpoint_naam, endpoint, query)
+
+    hedger = hedgers.get(endpoint_naam)
+    if hedger is None:
+        hedger = hedgers[endpoint_naam] = _Hedger(endpoint_naam)
+    return await hedger.voer_uit(
+        lambda: _post_sparql_poging(session, endpoint_naam, endpoint, query)
+    )
+
+
+async def _post_sparql_poging(
+    session: aiohttp.ClientSession, endpoint_naam: str, endpoint: str, query: str
+) -> Any:
+    """Voer één POST van een SPARQL query uit en geef de geparste JSON terug.
+
+    Args:
+        session (aiohttp.ClientSession): De aiohttp ClientSession voor het uitvoeren van de HTTP-aanvraag
+        endpoint_naam (str): Naam van het endpoint voor de metingen, bijvoorbeeld "kkg"
+        endpoint (str): URL van het SPARQL endpoint
+        query (str): De SPARQL query
+
+    Returns:
+        Any: De geparste JSON response
+
+    Raises:
+        aiohttp.ContentTypeError: Als de response geen JSON is
+    """
+    data = {"query": query, "format": "json"}
+    start = time.perf_counter()
+    with _span(f"http {endpoint_naam}", "http") as span:
+        async with session.post(endpoint, data=data) as response:
+            span["status"] = response.status
+            response.raise_for_status()
+            body = await response.read()
+            span["bytes"] = len(body)
+            if "json" not in response.content_type:
+                raise aiohttp.ContentTypeError(
+                    response.request_info,
+                    response.history,
+                    status=response.status,
+                    message=f"Attempt to decode JSON with unexpected mimetype: {response.content_type}",
+                    headers=response.headers,
+                )
+            encoding = response.get_encoding()
+    _observeer(
+        "monumenten_request_duur_seconden",
+        time.perf_counter() - start,
+        endpoint=endpoint_naam,
+    )
+    _verhoog("monumenten_ontvangen_bytes_totaal", len(body), endpoint=endpoint_naam)
+
+    with _meet_stap("json_parse"):
+        return json.loads(body.decode(encoding))
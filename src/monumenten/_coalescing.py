@@ -0,0 +1,179 @@
+"""Bundelen van ID's uit gelijktijdige aanvragen tot gedeelde batches."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+_VerwerkBatch = Callable[[List[str]], Awaitable[pd.DataFrame]]
+
+
+class _BatchCoalescer:
+    """Bundelt de ID's van gelijktijdige aanvragers tot batches van maximaal `max_batch_grootte`.
+
+    Een batch wordt verstuurd zodra hij vol is, of uiterlijk `max_wachttijd` seconden nadat
+    het eerste ID erin terechtkwam. Elke aanvrager krijgt de rijen voor zijn eigen ID's terug
+    uit het gecombineerde resultaat. ID's die al in een openstaande of lopende batch zitten
+    worden niet opnieuw opgevraagd, maar wachten op het resultaat van die batch.
+
+    Args:
+        verwerk_batch (Callable[[List[str]], Awaitable[pd.DataFrame]]): Functie die een batch ID's verwerkt
+            en een DataFrame met een kolom "identificatie" teruggeeft
+        max_batch_grootte (int): Maximaal aantal ID's per batch
+        max_wachttijd (float): Maximale tijd in seconden dat een onvolle batch op meer ID's wacht
+    """
+
+    def __init__(
+        self,
+        verwerk_batch: _VerwerkBatch,
+        max_batch_grootte: int = 500,
+        max_wachttijd: float = 0.02,
+    ) -> None:
+        if max_batch_grootte < 1:
+            raise ValueError("max_batch_grootte moet minimaal 1 zijn")
+        if max_wachttijd < 0:
+            raise ValueError("max_wachttijd mag niet negatief zijn")
+        self._verwerk_batch = verwerk_batch
+        self._max_batch_grootte = max_batch_grootte
+        self._max_wachttijd = max_wachttijd
+
+        # De batch die nog ID's verzamelt, met de future waarop zijn aanvragers wachten
+        self._open_batch: List[str] = []
+        self._open_future: Optional[asyncio.Future[pd.DataFrame]] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # ID -> future van de (open of lopende) batch waarin het ID zit
+        self._in_behandeling: Dict[str, asyncio.Future[pd.DataFrame]] = {}
+        # lopende batches, en per batch het aantal aanvragers dat op het resultaat wacht
+        self._taken: Dict[asyncio.Future[pd.DataFrame], asyncio.Task[None]] = {}
+        self._wachtenden: Dict[asyncio.Future[pd.DataFrame], int] = {}
+
+    @property
+    def aantal_in_behandeling(self) -> int:
+        """int: Aantal ID's in open of lopende batches."""
+        return len(self._in_behandeling)
+
+    async def verwerk(
+        self,
+        identificaties: List[str],
+        bij_voortgang: Optional[Callable[[int], None]] = None,
+    ) -> pd.DataFrame:
+        """Verwerk ID's via gedeelde batches.
+
+        Args:
+            identificaties (List[str]): De ID's van deze aanvrager
+            bij_voortgang (Optional[Callable[[int], None]]): Wordt na elke afgeronde batch aangeroepen
+                met het aantal ID's van deze aanvrager in die batch, bijvoorbeeld voor een voortgangsbalk
+
+        Returns:
+            pd.DataFrame: De rijen uit de batchresultaten die bij deze ID's horen
+        """
+        # per batch de future en het aantal ID's van deze aanvrager erin
+        futures: Dict[int, Tuple[asyncio.Future[pd.DataFrame], int]] = {}
+        for identificatie in dict.fromkeys(identificaties):
+            future = self._in_behandeling.get(identificatie)
+            if future is None:
+                future = self._voeg_toe(identificatie)
+            aantal = futures[id(future)][1] if id(future) in futures else 0
+            futures[id(future)] = (future, aantal + 1)
+
+        async def _wacht_op(
+            future: asyncio.Future[pd.DataFrame], aantal: int
+        ) -> pd.DataFrame:
+            # shield: een geannuleerde aanvrager mag de gedeelde batch niet annuleren
+            resultaat = await asyncio.shield(future)
+            if bij_voortgang is not None:
+                bij_voortgang(aantal)
+            return resultaat
+
+        for future, _ in futures.values():
+            self._wachtenden[future] = self._wachtenden.get(future, 0) + 1
+        try:
+            resultaten = await asyncio.gather(
+                *(_wacht_op(future, aantal) for future, aantal in futures.values())
+            )
+        finally:
+            for future, _ in futures.values():
+                self._laat_los(future)
+        if not resultaten:
+            return pd.DataFrame(columns=["identificatie"])
+        resultaat = pd.concat(resultaten, ignore_index=True)
+        return resultaat[resultaat["identificatie"].isin(identificaties)].reset_index(
+            drop=True
+        )
+
+    def _laat_los(self, future: asyncio.Future[pd.DataFrame]) -> None:
+        """Meld een aanvrager af bij een batch; zonder aanvragers wordt de batch afgebroken."""
+        over = self._wachtenden.pop(future) - 1
+        if over:
+            self._wachtenden[future] = over
+            return
+        if future.done():
+            return
+        # niemand wacht meer op deze batch (geannuleerd of deadline verstreken)
+        if future is self._open_future:
+            for identificatie in self._open_batch:
+                del self._in_behandeling[identificatie]
+            self._open_batch, self._open_future = [], None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            future.cancel()
+        elif future in self._taken:
+            self._taken[future].cancel()
+
+    def _voeg_toe(self, identificatie: str) -> asyncio.Future[pd.DataFrame]:
+        loop = asyncio.get_running_loop()
+        if self._open_future is None:
+            self._open_future = loop.create_future()
+            # voorkom "Future exception was never retrieved" als alle aanvragers weg zijn
+            self._open_future.add_done_callback(
+                lambda f: f.cancelled() or f.exception()
+            )
+        future = self._open_future
+        self._open_batch.append(identificatie)
+        self._in_behandeling[identificatie] = future
+
+        if len(self._open_batch) >= self._max_batch_grootte:
+            self._verstuur()
+        elif self._timer is None:
+            self._timer = loop.call_later(self._max_wachttijd, self._verstuur)
+        return future
+
+    def _verstuur(self) -> None:
+        """Sluit de open batch af en start de verwerking ervan."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._open_future is None:
+            return
+
+        batch, future = self._open_batch, self._open_future
+        self._open_batch, self._open_future = [], None
+
+        taak = asyncio.get_running_loop().create_task(self._draai(batch, future))
+        self._taken[future] = taak
+        taak.add_done_callback(lambda _: self._taken.pop(future, None))
+
+    async def _draai(
+        self, batch: List[str], future: asyncio.Future[pd.DataFrame]
+    ) -> None:
+        try:
+            resultaat = await self._verwerk_batch(batch)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            if not future.done():
+                future.set_result(resultaat)
+        finally:
+            for identificatie in batch:
+                if self._in_behandeling.get(identificatie) is future:
+                    del self._in_behandeling[identificatie]
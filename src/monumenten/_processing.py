@@ -3,36 +3,279 @@
 from __future__ import annotations
 
 import asyncio
-from typing import List, Tuple
+import contextvars
+import functools
+import logging
+import time
+import weakref
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import (
+    Any,
+    Coroutine,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import aiohttp
-import geopandas as gpd
 import numpy as np
 import pandas as pd
-from aiocache import cached_stampede
 from pandas import DataFrame
-from tqdm.asyncio import tqdm_asyncio
 
 from monumenten._api._cultureel_erfgoed import (
     _query_beschermde_gezichten,
     _query_rijksmonumenten,
+    _query_verblijfsobjecten_per_monument,
 )
 from monumenten._api._kadaster import _query_verblijfsobjecten
+from monumenten.cache import (
+    CacheBackend,
+    _actieve_cache,
+    _haal_op_of_bereken,
+    _standaard_cache,
+)
+from monumenten._spatial import (
+    _GezichtenIndex,
+    _GezichtLidmaatschap,
+    _maak_gezichten_index,
+)
+from monumenten.metrics import _meet_stap, _observeer, _verhoog
+from monumenten.profiel import _span
 
 _QUERY_BATCH_GROOTTE = 500  # lijkt meest optimaal qua performance
 
+_T = TypeVar("_T")
+
+logger = logging.getLogger("monumenten.processing")
+
+STATUSSEN = ("rijksmonument", "beschermd_gezicht", "gemeentelijk_monument")
+
+# volgorde waarin de ID's over de batches verdeeld worden, zie `_sorteer_op_locatie`
+BATCH_VOLGORDES = ("invoer", "locatie")
+
+# kolommen in het resultaat per status, voor `include=`
+_KOLOMMEN_PER_STATUS = {
+    "rijksmonument": [
+        "is_rijksmonument",
+        "rijksmonument_nummer",
+        "rijksmonument_url",
+        "rijksmonument_bron",
+    ],
+    "beschermd_gezicht": ["is_beschermd_gezicht", "beschermd_gezicht_naam"],
+    "gemeentelijk_monument": [
+        "is_gemeentelijk_monument",
+        "grondslag_gemeentelijk_monument",
+    ],
+}
+
+_GEZICHTEN_TTL = 60 * 60 * 24 * 7  # 7 dagen
+
+# Per cache de opgebouwde index over de gezichten per ruimtelijke backend, met het tijdstip
+# waarop hij verloopt; zo wordt de index niet bij elke aanroep opnieuw uit de cache opgebouwd
+_gezichten_indexen: weakref.WeakKeyDictionary[
+    CacheBackend, Dict[str, Tuple[float, _GezichtenIndex]]
+] = weakref.WeakKeyDictionary()
+
+# Wordt op True gezet als de gezichten echt opgehaald worden (cache miss)
+_gezichten_opgehaald: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "monumenten_gezichten_opgehaald", default=False
+)
+
+
+# rijksmonumenten, beschermde gezichten, gemeentelijke monumenten en aantal verwerkte ID's
+_BatchResultaat = Tuple[DataFrame, DataFrame, DataFrame, int]
+
+# de index over de beschermde gezichten, de taak die hem laadt, of None als ze niet nodig zijn
+_Gezichten = Union[_GezichtenIndex, "asyncio.Future[_GezichtenIndex]", None]
+
+
+class _TaakGroep:
+    """Taken die samen slagen of samen stoppen, zoals asyncio.TaskGroup (Python 3.11+).
+
+    Verlaat het blok met een fout of door annulering, dan worden de taken die nog lopen
+    geannuleerd en wordt op hun afronding gewacht. Zo houdt afgebroken werk geen plekken bij
+    de endpoints bezet.
+    """
+
+    def __init__(self) -> None:
+        self._taken: List[asyncio.Task[Any]] = []
+
+    async def __aenter__(self) -> "_TaakGroep":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is not None:
+            await self.annuleer()
+
+    def start(self, coroutine: Coroutine[Any, Any, _T]) -> asyncio.Task[_T]:
+        """Start een taak in de groep.
+
+        Args:
+            coroutine (Coroutine[Any, Any, _T]): Het werk van de taak
+
+        Returns:
+            asyncio.Task[_T]: De gestarte taak
+        """
+        taak = asyncio.get_running_loop().create_task(coroutine)
+        self._taken.append(taak)
+        return taak
+
+    async def annuleer(self) -> None:
+        """Annuleer de taken die nog lopen en wacht tot ze gestopt zijn."""
+        for taak in self._taken:
+            if not taak.done():
+                taak.cancel()
+        await asyncio.gather(*self._taken, return_exceptions=True)
+
+
+class _GeenVerblijfsobjectenError(ValueError):
+    """Geen enkel ID van een batch is als BAG verblijfsobject gevonden."""
+
+
+@dataclass
+class VerwerkingsRapport:
+    """Overzicht van de ID's die niet (volledig) verwerkt konden worden.
+
+    Wordt gevuld bij `on_error="isolate"`: een mislukte batch wordt dan steeds gehalveerd
+    tot de ID's gevonden zijn die de fout veroorzaken, en de rest wordt gewoon verwerkt.
+
+    Args:
+        ongeldig (List[str]): ID's met een ongeldig formaat, die niet opgevraagd zijn
+        niet_gevonden (List[str]): ID's die het Kadaster niet als verblijfsobject kent
+        mislukt (Dict[str, str]): Per ID waarvan de verwerking mislukte de foutmelding
+    """
+
+    ongeldig: List[str] = field(default_factory=list)
+    niet_gevonden: List[str] = field(default_factory=list)
+    mislukt: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def opnieuw_te_verwerken(self) -> List[str]:
+        """List[str]: De mislukte ID's, om later opnieuw aan te bieden."""
+        return list(self.mislukt)
+
+    @property
+    def volledig(self) -> bool:
+        """bool: Of alle geldige ID's verwerkt zijn."""
+        return not self.mislukt
+
+
+def _controleer_statussen(include: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """Bepaal welke statussen berekend moeten worden.
+
+    Args:
+        include (Optional[Iterable[str]]): Gevraagde statussen uit `STATUSSEN`, of None voor alle
+
+    Returns:
+        FrozenSet[str]: De te berekenen statussen
+
+    Raises:
+        ValueError: Bij een onbekende status of als er geen enkele status gevraagd wordt
+    """
+    if include is None:
+        return frozenset(STATUSSEN)
+    if isinstance(include, str):
+        include = [include]
+    statussen = frozenset(include)
+    onbekend = statussen.difference(STATUSSEN)
+    if onbekend:
+        raise ValueError(
+            f"Onbekende status(sen) {sorted(onbekend)}, kies uit: {', '.join(STATUSSEN)}"
+        )
+    if not statussen:
+        raise ValueError(f"Kies minimaal één status uit: {', '.join(STATUSSEN)}")
+    return statussen
+
+
+def _controleer_batch_volgorde(batch_volgorde: str) -> None:
+    """Controleer een opgegeven batchvolgorde.
+
+    Args:
+        batch_volgorde (str): Een van `BATCH_VOLGORDES`
+
+    Raises:
+        ValueError: Bij een onbekende batchvolgorde
+    """
+    if batch_volgorde not in BATCH_VOLGORDES:
+        raise ValueError(
+            f"Onbekende batch_volgorde '{batch_volgorde}', kies uit: {', '.join(BATCH_VOLGORDES)}"
+        )
+
+
+def _sorteer_op_locatie(verblijfsobject_ids: List[str]) -> List[str]:
+    """Sorteer ID's op gemeentecode en daarbinnen op volgnummer.
+
+    Een verblijfsobject ID bestaat uit de gemeentecode (vier cijfers), het objecttype (twee
+    cijfers) en een volgnummer. Geldige ID's zijn allemaal zestien cijfers lang, dus tekstueel
+    sorteren is hetzelfde als sorteren op gemeentecode en numeriek op volgnummer. Een batch van
+    opeenvolgende ID's bevat dan verblijfsobjecten uit één gemeente, die vaak bij dezelfde
+    panden, percelen en beschermde gezichten horen.
+
+    Args:
+        verblijfsobject_ids (List[str]): Geldige verblijfsobject ID's
+
+    Returns:
+        List[str]: De gesorteerde ID's
+    """
+    return sorted(verblijfsobject_ids)
+
+
+class _GeenVoortgangsbalk:
+    """Vervanger voor een tqdm voortgangsbalk die niets toont."""
+
+    def update(self, n: int) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _maak_voortgangsbalk(totaal: int, tonen: bool) -> _GeenVoortgangsbalk:
+    """Maak een voortgangsbalk aan; tqdm wordt alleen geïmporteerd als de balk getoond wordt."""
+    if not tonen:
+        return _GeenVoortgangsbalk()
+
+    from tqdm.asyncio import tqdm_asyncio
+
+    return cast(_GeenVoortgangsbalk, tqdm_asyncio(total=totaal))
+
 
 async def _process_batch(
     session: aiohttp.ClientSession,
     batch: List[str],
-    beschermde_gezichten_df: gpd.GeoDataFrame,
+    beschermde_gezichten: _Gezichten,
+    gezicht_lidmaatschap: Optional[_GezichtLidmaatschap] = None,
+    statussen: FrozenSet[str] = frozenset(STATUSSEN),
 ) -> Tuple[DataFrame, DataFrame, DataFrame, int]:
     """Verwerk een batch verblijfsobjecten.
 
     Args:
         session (aiohttp.ClientSession): De sessie voor HTTP requests
         batch (List[str]): Lijst met verblijfsobject ID's
-        beschermde_gezichten_df (gpd.GeoDataFrame): GeoDataFrame met beschermde gezichten
+        beschermde_gezichten (_Gezichten): Ruimtelijke index over de beschermde gezichten, of
+            de taak die hem nog laadt. Alleen de ruimtelijke test wacht op die taak; is de index
+            er nog niet, dan wordt voor alle ID's de geometrie opgehaald en wordt een gedeelde
+            cache pas daarna naar het lidmaatschap gevraagd. Zonder index wordt geen geometrie
+            opgehaald en niets ruimtelijk getest.
+        gezicht_lidmaatschap (Optional[_GezichtLidmaatschap]): Optionele tabel met het bekende
+            beschermd gezicht lidmaatschap per ID. Voor bekende ID's wordt de ruimtelijke test
+            overgeslagen, en als alle ID's bekend zijn ook het ophalen van de geometrie.
+        statussen (FrozenSet[str]): Te berekenen statussen. Zonder "rijksmonument" wordt de RCE
+            niet bevraagd en blijven de rijksmonumenten leeg.
 
     Returns:
         Tuple[DataFrame, DataFrame, DataFrame, int]: Tuple met rijksmonumenten,
@@ -41,20 +284,47 @@ async def _process_batch(
     Raises:
         ValueError: Als er geen geldige BAG verblijfsobjecten gevonden worden
     """
-    # Get the current event loop
-    loop = asyncio.get_running_loop()
-
-    # Create tasks using the current loop
-    rijksmonumenten_taak = loop.create_task(_query_rijksmonumenten(session, batch))
-    verblijfsobjecten_taak = loop.create_task(_query_verblijfsobjecten(session, batch))
-
-    # Wait for both tasks to complete
-    rijksmonumenten, verblijfsobjecten = await asyncio.gather(
-        rijksmonumenten_taak, verblijfsobjecten_taak
+    if gezicht_lidmaatschap is None:
+        gezicht_lidmaatschap = _GezichtLidmaatschap()
+    # een gedeelde cache kan het lidmaatschap kennen van ID's die andere processen al testten
+    cache = _actieve_cache.get() if beschermde_gezichten is not None else None
+    versie_bekend = not (
+        isinstance(beschermde_gezichten, asyncio.Future)
+        and not beschermde_gezichten.done()
     )
+    if not versie_bekend:
+        # de tabel wordt pas bij het laden van de gezichten op hun versie gebracht; tot dan
+        # is het lidmaatschap van geen enkel ID bekend en wordt niet op het laden gewacht
+        onbekend = list(batch)
+    else:
+        onbekend = [i for i in batch if i not in gezicht_lidmaatschap]
+        if cache is not None and onbekend:
+            await gezicht_lidmaatschap.laad(cache, onbekend)
+            onbekend = [i for i in onbekend if i not in gezicht_lidmaatschap]
+    met_geometrie = beschermde_gezichten is not None and bool(onbekend)
+    met_rijksmonumenten = "rijksmonument" in statussen
+    _observeer("monumenten_batch_grootte", len(batch))
+
+    # faalt een van beide queries, dan wordt de andere afgebroken
+    async with _TaakGroep() as groep:
+        verblijfsobjecten_taak = groep.start(
+            _query_verblijfsobjecten(
+                session,
+                batch,
+                met_geometrie=met_geometrie,
+                geometrie_voor=set(onbekend),
+            )
+        )
+        if met_rijksmonumenten:
+            rijksmonumenten_taak = groep.start(_query_rijksmonumenten(session, batch))
+            rijksmonumenten, verblijfsobjecten = await asyncio.gather(
+                rijksmonumenten_taak, verblijfsobjecten_taak
+            )
+        else:
+            rijksmonumenten, verblijfsobjecten = [], await verblijfsobjecten_taak
 
     if not verblijfsobjecten:
-        raise ValueError(
+        raise _GeenVerblijfsobjectenError(
             "Geen geldige BAG verblijfsobjecten gevonden voor een batch van verblijfsobject ID's"
         )
 
@@ -70,6 +340,7 @@ async def _process_batch(
         ),
         verblijfsobjecten_df[
             verblijfsobjecten_df["grondslagcode"].isin(["EWE", "EWD"])
+            & met_rijksmonumenten
         ][["identificatie", "grondslagcode"]],
         on="identificatie",
         how="outer",
@@ -104,21 +375,23 @@ async def _process_batch(
         verblijfsobjecten_df["grondslagcode"].isin(["GG", "GWA"])
     ][["identificatie", "grondslag_gemeentelijk_monument"]]
 
-    # Process beschermde gezichten
-    geo_df = gpd.GeoDataFrame(
-        verblijfsobjecten_df[["identificatie", "verblijfsobjectWKT"]].assign(
-            geometry=lambda x: gpd.GeoSeries.from_wkt(x["verblijfsobjectWKT"])
-        )[["identificatie", "geometry"]],
-        geometry="geometry",
-    )
-
     # Find objects within beschermde gezichten
-    verblijfsobjecten_in_beschermde_gezichten_df = gpd.sjoin(
-        geo_df,
-        beschermde_gezichten_df,
-        how="left",
-        predicate="within",
-    )[["identificatie", "beschermd_gezicht_naam"]]
+    if isinstance(beschermde_gezichten, asyncio.Future):
+        # shield: een afgebroken batch mag het laden voor de andere batches niet afbreken
+        index: Optional[_GezichtenIndex] = await asyncio.shield(beschermde_gezichten)
+    else:
+        index = beschermde_gezichten
+    if cache is not None and not versie_bekend and onbekend:
+        # nu de versie bekend is kan het gecachete lidmaatschap de ruimtelijke test besparen
+        await gezicht_lidmaatschap.laad(cache, onbekend)
+        onbekend = [i for i in onbekend if i not in gezicht_lidmaatschap]
+    verblijfsobjecten_in_beschermde_gezichten_df = _zoek_beschermde_gezichten(
+        verblijfsobjecten_df, index, gezicht_lidmaatschap
+    )
+    if cache is not None:
+        await gezicht_lidmaatschap.bewaar(
+            cache, [i for i in onbekend if i in gezicht_lidmaatschap]
+        )
 
     return (
         rijksmonumenten_df,
@@ -128,43 +401,305 @@ async def _process_batch(
     )
 
 
-@cached_stampede(ttl=60 * 60 * 24 * 7, noself=True)  # Cache resultaat voor 7 dagen
+def _zoek_beschermde_gezichten(
+    verblijfsobjecten_df: DataFrame,
+    beschermde_gezichten: Optional[_GezichtenIndex],
+    gezicht_lidmaatschap: _GezichtLidmaatschap,
+) -> DataFrame:
+    """Bepaal per gevonden verblijfsobject in welke beschermde gezichten het ligt.
+
+    Args:
+        verblijfsobjecten_df (DataFrame): De verblijfsobjecten uit het Kadaster, met hun WKT-geometrie
+        beschermde_gezichten (Optional[_GezichtenIndex]): Ruimtelijke index over de beschermde gezichten.
+            Zonder index wordt niets getest en krijgt elk verblijfsobject een lege naam.
+        gezicht_lidmaatschap (_GezichtLidmaatschap): Tabel met het bekende lidmaatschap per ID
+
+    Returns:
+        DataFrame: DataFrame met de kolommen identificatie en beschermd_gezicht_naam, met
+            minimaal één rij per gevonden verblijfsobject
+    """
+    gevonden_ids = verblijfsobjecten_df["identificatie"].drop_duplicates()
+    if beschermde_gezichten is None:
+        return pd.DataFrame(
+            {"identificatie": gevonden_ids, "beschermd_gezicht_naam": None}
+        )
+
+    # bekende ID's komen uit de lidmaatschapstabel
+    is_bekend = gevonden_ids.map(lambda x: x in gezicht_lidmaatschap).astype(bool)
+    aantal_bekend = int(is_bekend.sum())
+    _verhoog(
+        "monumenten_cache_totaal",
+        aantal_bekend,
+        cache="gezicht_lidmaatschap",
+        resultaat="hit",
+    )
+    _verhoog(
+        "monumenten_cache_totaal",
+        len(is_bekend) - aantal_bekend,
+        cache="gezicht_lidmaatschap",
+        resultaat="miss",
+    )
+    verblijfsobjecten_met_wkt = verblijfsobjecten_df.loc[
+        verblijfsobjecten_df["identificatie"].isin(gevonden_ids[~is_bekend]),
+        ["identificatie", "verblijfsobjectWKT"],
+    ].drop_duplicates()
+    nieuw_in_beschermde_gezichten_df = beschermde_gezichten.zoek(
+        verblijfsobjecten_met_wkt["identificatie"].tolist(),
+        verblijfsobjecten_met_wkt["verblijfsobjectWKT"].tolist(),
+    )
+    # zonder geometrie is er niets getest, dus dan ook niets onthouden
+    gezicht_lidmaatschap.bijwerken(
+        nieuw_in_beschermde_gezichten_df[
+            nieuw_in_beschermde_gezichten_df["identificatie"].isin(
+                verblijfsobjecten_met_wkt.loc[
+                    verblijfsobjecten_met_wkt["verblijfsobjectWKT"].notna(),
+                    "identificatie",
+                ]
+            )
+        ]
+    )
+    return pd.concat(
+        [
+            gezicht_lidmaatschap.opzoeken(gevonden_ids[is_bekend].tolist()),
+            nieuw_in_beschermde_gezichten_df,
+        ]
+    )
+
+
+def _lege_resultaten(
+    aantal: int,
+) -> Tuple[DataFrame, DataFrame, DataFrame, int]:
+    """Resultaat van `_process_batch` zonder rijen, voor een batch die niets opleverde."""
+    return (
+        pd.DataFrame(
+            columns=["identificatie", "rijksmonument_nummer", "rijksmonument_bron"],
+            dtype="string",
+        ),
+        pd.DataFrame(
+            columns=["identificatie", "beschermd_gezicht_naam"], dtype="string"
+        ),
+        pd.DataFrame(
+            columns=["identificatie", "grondslag_gemeentelijk_monument"],
+            dtype="string",
+        ),
+        aantal,
+    )
+
+
+async def _process_batch_geisoleerd(
+    session: aiohttp.ClientSession,
+    batch: List[str],
+    beschermde_gezichten: _Gezichten,
+    gezicht_lidmaatschap: Optional[_GezichtLidmaatschap],
+    rapport: VerwerkingsRapport,
+    statussen: FrozenSet[str] = frozenset(STATUSSEN),
+) -> Tuple[DataFrame, DataFrame, DataFrame, int]:
+    """Verwerk een batch, en halveer hem bij een fout tot de ID's met de fout gevonden zijn.
+
+    Args:
+        session (aiohttp.ClientSession): De sessie voor HTTP requests
+        batch (List[str]): Lijst met verblijfsobject ID's
+        beschermde_gezichten (_Gezichten): Zie `_process_batch`
+        gezicht_lidmaatschap (Optional[_GezichtLidmaatschap]): Zie `_process_batch`
+        rapport (VerwerkingsRapport): Rapport waarin niet gevonden en mislukte ID's worden bijgehouden
+        statussen (FrozenSet[str]): Zie `_process_batch`
+
+    Returns:
+        Tuple[DataFrame, DataFrame, DataFrame, int]: Zie `_process_batch`; zonder rijen voor de mislukte ID's
+    """
+    try:
+        resultaat = await _process_batch(
+            session, batch, beschermde_gezichten, gezicht_lidmaatschap, statussen
+        )
+    except _GeenVerblijfsobjectenError:
+        # ook afzonderlijk zou geen van deze ID's gevonden worden; halveren heeft geen zin
+        rapport.niet_gevonden.extend(batch)
+        return _lege_resultaten(len(batch))
+    except Exception as e:
+        if (
+            isinstance(beschermde_gezichten, asyncio.Future)
+            and beschermde_gezichten.done()
+            and not beschermde_gezichten.cancelled()
+            and beschermde_gezichten.exception() is e
+        ):
+            # het laden van de gezichten mislukte; dat ligt niet aan de ID's in de batch
+            raise
+        if len(batch) == 1:
+            logger.warning("Verwerking van %s mislukt: %r", batch[0], e)
+            rapport.mislukt[batch[0]] = f"{type(e).__name__}: {e}"
+            return _lege_resultaten(1)
+
+        midden = len(batch) // 2
+        delen = await asyncio.gather(
+            *(
+                _process_batch_geisoleerd(
+                    session,
+                    deel,
+                    beschermde_gezichten,
+                    gezicht_lidmaatschap,
+                    rapport,
+                    statussen,
+                )
+                for deel in (batch[:midden], batch[midden:])
+            )
+        )
+        return (
+            pd.concat([deel[0] for deel in delen]),
+            pd.concat([deel[1] for deel in delen]),
+            pd.concat([deel[2] for deel in delen]),
+            len(batch),
+        )
+
+    # elk gevonden verblijfsobject heeft een rij in het beschermd gezicht resultaat
+    gevonden = set(resultaat[1]["identificatie"])
+    rapport.niet_gevonden.extend(
+        identificatie for identificatie in batch if identificatie not in gevonden
+    )
+    return resultaat
+
+
 async def _get_beschermde_gezichten(
+    session: aiohttp.ClientSession, spatial_backend: str = "shapely"
+) -> _GezichtenIndex:
+    """Haal beschermde gezichten op (via de cache) en bouw er een ruimtelijke index over.
+
+    Args:
+        session (aiohttp.ClientSession): De sessie voor HTTP requests
+        spatial_backend (str): Naam van de ruimtelijke backend. Standaard is "shapely".
+
+    Returns:
+        _GezichtenIndex: Ruimtelijke index over de beschermde gezichten
+    """
+    bekend = _bekende_gezichten_index(spatial_backend)
+    if bekend is not None:
+        return bekend
+
+    cache = _actieve_cache.get() or _standaard_cache
+    beschermde_gezichten = await _haal_op_of_bereken(
+        cache,
+        "beschermde_gezichten",
+        functools.partial(_haal_beschermde_gezichten_op, session),
+        ttl=_GEZICHTEN_TTL,
+    )
+    index = _maak_gezichten_index(
+        spatial_backend,
+        [gezicht["beschermd_gezicht_naam"] for gezicht in beschermde_gezichten],
+        [gezicht["gezichtWKT"] for gezicht in beschermde_gezichten],
+    )
+    _gezichten_indexen.setdefault(cache, {})[spatial_backend] = (
+        time.monotonic() + _GEZICHTEN_TTL,
+        index,
+    )
+    return index
+
+
+def _bekende_gezichten_index(spatial_backend: str) -> Optional[_GezichtenIndex]:
+    """Geef de al opgebouwde index over de gezichten, als die nog geldig is.
+
+    Args:
+        spatial_backend (str): Naam van de ruimtelijke backend
+
+    Returns:
+        Optional[_GezichtenIndex]: De index, of None als hij opgehaald of opgebouwd moet worden
+    """
+    cache = _actieve_cache.get() or _standaard_cache
+    bekend = _gezichten_indexen.get(cache, {}).get(spatial_backend)
+    if bekend is not None and bekend[0] > time.monotonic():
+        return bekend[1]
+    return None
+
+
+async def _haal_beschermde_gezichten_op(
     session: aiohttp.ClientSession,
-) -> gpd.GeoDataFrame:
-    """Haal beschermde gezichten op."""
+) -> List[Dict[str, Any]]:
+    """Haal de beschermde gezichten op bij de RCE.
+
+    Args:
+        session (aiohttp.ClientSession): De sessie voor HTTP requests
+
+    Returns:
+        List[Dict[str, Any]]: Naam en WKT-geometrie per beschermd gezicht
+
+    Raises:
+        ValueError: Als er geen beschermde gezichten gevonden worden
+    """
+    _gezichten_opgehaald.set(True)
     beschermde_gezichten = await _query_beschermde_gezichten(session)
-    beschermde_gezichten_df = gpd.GeoDataFrame()
 
     if not beschermde_gezichten:
         raise ValueError("Geen beschermde gezichten gevonden")
 
-    beschermde_gezichten_df = pd.DataFrame(beschermde_gezichten)
-    beschermde_gezichten_df["geometry"] = gpd.GeoSeries.from_wkt(
-        beschermde_gezichten_df["gezichtWKT"]
-    )
-    beschermde_gezichten_df = gpd.GeoDataFrame(
-        beschermde_gezichten_df[["beschermd_gezicht_naam", "geometry"]],
-        geometry="geometry",
-    )
-
-    return beschermde_gezichten_df
+    return [
+        {
+            "beschermd_gezicht_naam": gezicht["beschermd_gezicht_naam"],
+            "gezichtWKT": gezicht["gezichtWKT"],
+        }
+        for gezicht in beschermde_gezichten
+    ]
 
 
 async def _query(
-    session: aiohttp.ClientSession, verblijfsobject_ids: List[str]
+    session: aiohttp.ClientSession,
+    verblijfsobject_ids: List[str],
+    spatial_backend: str = "shapely",
+    gezicht_lidmaatschap: Optional[_GezichtLidmaatschap] = None,
+    rapport: Optional[VerwerkingsRapport] = None,
+    statussen: FrozenSet[str] = frozenset(STATUSSEN),
+    deadline: Optional[float] = None,
 ) -> pd.DataFrame:
     """Voer queries uit voor een lijst verblijfsobjecten.
 
+    De batches draaien als groep: faalt een batch, dan worden de andere afgebroken, en dat
+    gebeurt ook als de aanroeper annuleert. Staan de gezichten nog niet in het geheugen, dan
+    worden ze in dezelfde groep naast de batches geladen.
+
     Args:
         session (aiohttp.ClientSession): De sessie voor HTTP requests
         verblijfsobject_ids (List[str]): Lijst met verblijfsobject ID's
+        spatial_backend (str): Naam van de ruimtelijke backend. Standaard is "shapely".
+        gezicht_lidmaatschap (Optional[_GezichtLidmaatschap]): Optionele tabel met het beschermd
+            gezicht lidmaatschap per ID, die over meerdere aanroepen heen hergebruikt wordt
+        rapport (Optional[VerwerkingsRapport]): Indien opgegeven breekt een mislukte batch de
+            verwerking niet af, maar worden de ID's met de fout opgespoord en in het rapport gezet
+        statussen (FrozenSet[str]): Te berekenen statussen. Alleen de bronnen die daarvoor nodig
+            zijn worden bevraagd; zonder "beschermd_gezicht" worden de gezichten niet geladen.
+        deadline (Optional[float]): Tijdstip volgens de klok van de event loop (`loop.time()`)
+            waarop de verwerking stopt. Batches die dan nog wachten of lopen worden afgebroken.
+            Met een rapport bevat het resultaat de afgeronde batches en staan de overige ID's
+            als mislukt in het rapport; zonder rapport volgt een asyncio.TimeoutError.
 
     Returns:
         pd.DataFrame: DataFrame met monumentinformatie
+
+    Raises:
+        asyncio.TimeoutError: Als de deadline verstrijkt en er geen rapport is
     """
-    # Load 'beschermde_gezichten' and convert to GeoDataFrame
-    beschermde_gezichten_df = await _get_beschermde_gezichten(session)
+    if gezicht_lidmaatschap is None:
+        gezicht_lidmaatschap = _GezichtLidmaatschap()
+
+    async def _laad_gezichten() -> _GezichtenIndex:
+        # Load 'beschermde_gezichten' into a spatial index
+        with _span("gezichten laden", "stap"):
+            token = _gezichten_opgehaald.set(False)
+            try:
+                index = await _get_beschermde_gezichten(session, spatial_backend)
+                opgehaald = _gezichten_opgehaald.get()
+            finally:
+                _gezichten_opgehaald.reset(token)
+        _verhoog(
+            "monumenten_cache_totaal",
+            cache="beschermde_gezichten",
+            resultaat="miss" if opgehaald else "hit",
+        )
+        gezicht_lidmaatschap.synchroniseer(index.versie)
+        return index
+
+    beschermde_gezichten: _Gezichten = None
+    laad_taak: Optional[asyncio.Task[_GezichtenIndex]] = None
+    if "beschermd_gezicht" in statussen:
+        if _bekende_gezichten_index(spatial_backend) is not None:
+            # de index staat al in het geheugen; laden is direct klaar
+            beschermde_gezichten = await _laad_gezichten()
 
     rijksmonumenten_result = pd.DataFrame()
     verblijfsobjecten_in_beschermd_gezicht_result = pd.DataFrame()
@@ -176,35 +711,170 @@ async def _query(
         for i in range(0, len(verblijfsobject_ids), _QUERY_BATCH_GROOTTE)
     ]
 
-    # Create tasks for each batch
-    tasks = [
-        _process_batch(session, batch, beschermde_gezichten_df) for batch in batches
-    ]
-
-    progress_bar = tqdm_asyncio(total=len(verblijfsobject_ids), disable=len(tasks) <= 1)
+    async def _verwerk(batch: List[str]) -> _BatchResultaat:
+        with _span("batch", "batch", ids=len(batch)):
+            if rapport is None:
+                return await _process_batch(
+                    session,
+                    batch,
+                    beschermde_gezichten,
+                    gezicht_lidmaatschap,
+                    statussen,
+                )
+            return await _process_batch_geisoleerd(
+                session,
+                batch,
+                beschermde_gezichten,
+                gezicht_lidmaatschap,
+                rapport,
+                statussen,
+            )
 
-    for task in asyncio.as_completed(tasks):
+    loop = asyncio.get_running_loop()
+    progress_bar = _maak_voortgangsbalk(
+        len(verblijfsobject_ids), tonen=len(batches) > 1
+    )
+    try:
+        async with _TaakGroep() as groep:
+            if "beschermd_gezicht" in statussen and beschermde_gezichten is None:
+                # de gezichten laden naast de eerste batches; alleen de ruimtelijke test van
+                # een batch wacht erop
+                laad_taak = groep.start(_laad_gezichten())
+                beschermde_gezichten = laad_taak
+            taken = [groep.start(_verwerk(batch)) for batch in batches]
+            open_taken: Set[asyncio.Task[_BatchResultaat]] = set(taken)
+            while open_taken:
+                klaar, open_taken = await asyncio.wait(
+                    open_taken,
+                    timeout=None
+                    if deadline is None
+                    else max(0, deadline - loop.time()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not klaar:
+                    break  # deadline verstreken
+                for taak in klaar:
+                    # een fout verlaat de groep, die dan de andere batches afbreekt
+                    (
+                        rijksmonumenten,
+                        verblijfsobjecten_in_beschermd_gezicht,
+                        gemeentelijke_monumenten,
+                        aantal,
+                    ) = taak.result()
+
+                    rijksmonumenten_result = pd.concat(
+                        [rijksmonumenten_result, rijksmonumenten]
+                    )
+                    verblijfsobjecten_in_beschermd_gezicht_result = pd.concat(
+                        [
+                            verblijfsobjecten_in_beschermd_gezicht_result,
+                            verblijfsobjecten_in_beschermd_gezicht,
+                        ]
+                    )
+                    gemeentelijke_monumenten_result = pd.concat(
+                        [gemeentelijke_monumenten_result, gemeentelijke_monumenten]
+                    )
+                    progress_bar.update(aantal)
+
+            if laad_taak is not None and not open_taken:
+                # ook als geen batch op de gezichten wachtte, bijvoorbeeld omdat er geen ID's
+                # gevonden werden, komt een fout bij het laden naar boven
+                await laad_taak
+
+            if open_taken:
+                niet_verwerkt = sum(
+                    len(batch)
+                    for batch, taak in zip(batches, taken)
+                    if taak in open_taken
+                )
+                logger.warning(
+                    "Deadline verstreken, %d van %d ID's niet verwerkt",
+                    niet_verwerkt,
+                    len(verblijfsobject_ids),
+                )
+                if rapport is None:
+                    raise asyncio.TimeoutError(
+                        f"Deadline verstreken, {niet_verwerkt} ID's niet verwerkt"
+                    )
+                await groep.annuleer()
+                for batch, taak in zip(batches, taken):
+                    if taak in open_taken:
+                        rapport.mislukt.update(
+                            dict.fromkeys(batch, "Deadline verstreken")
+                        )
+    finally:
+        progress_bar.close()
+
+    if verblijfsobjecten_in_beschermd_gezicht_result.columns.empty:
+        # geen enkele batch klaar (deadline); lege resultaten met kolommen, zodat het
+        # samenvoegen op identificatie lukt
         (
-            rijksmonumenten,
-            verblijfsobjecten_in_beschermd_gezicht,
-            gemeentelijke_monumenten,
-            aantal,
-        ) = await task
-
-        rijksmonumenten_result = pd.concat([rijksmonumenten_result, rijksmonumenten])
-        verblijfsobjecten_in_beschermd_gezicht_result = pd.concat(
-            [
-                verblijfsobjecten_in_beschermd_gezicht_result,
-                verblijfsobjecten_in_beschermd_gezicht,
-            ]
-        )
-        gemeentelijke_monumenten_result = pd.concat(
-            [gemeentelijke_monumenten_result, gemeentelijke_monumenten]
+            rijksmonumenten_result,
+            verblijfsobjecten_in_beschermd_gezicht_result,
+            gemeentelijke_monumenten_result,
+            _,
+        ) = _lege_resultaten(0)
+
+    with _meet_stap("merge"):
+        return _combineer_resultaten(
+            rijksmonumenten_result,
+            verblijfsobjecten_in_beschermd_gezicht_result,
+            gemeentelijke_monumenten_result,
         )
-        progress_bar.update(aantal)
 
-    progress_bar.close()
 
+async def _zoek_verblijfsobjecten_per_monument(
+    session: aiohttp.ClientSession, nummers: List[str]
+) -> pd.DataFrame:
+    """Zoek de verblijfsobjecten bij rijksmonumentnummers, in batches van `_QUERY_BATCH_GROOTTE`.
+
+    Args:
+        session (aiohttp.ClientSession): De sessie voor HTTP requests
+        nummers (List[str]): Unieke rijksmonumentnummers
+
+    Returns:
+        pd.DataFrame: DataFrame met de kolommen rijksmonument_nummer en identificatie, een rij
+            per gevonden verblijfsobject, in de volgorde van `nummers`
+    """
+    batches = [
+        nummers[i : i + _QUERY_BATCH_GROOTTE]
+        for i in range(0, len(nummers), _QUERY_BATCH_GROOTTE)
+    ]
+    for batch in batches:
+        _observeer("monumenten_batch_grootte", len(batch))
+    gevonden: Dict[str, List[str]] = {}
+    async with _TaakGroep() as groep:
+        taken = [
+            groep.start(_query_verblijfsobjecten_per_monument(session, batch))
+            for batch in batches
+        ]
+        for deel in await asyncio.gather(*taken):
+            gevonden.update(deel)
+    rijen = [
+        (nummer, identificatie)
+        for nummer in nummers
+        for identificatie in sorted(set(gevonden.get(nummer, ())))
+    ]
+    return pd.DataFrame(
+        rijen, columns=["rijksmonument_nummer", "identificatie"], dtype="string"
+    )
+
+
+def _combineer_resultaten(
+    rijksmonumenten_result: pd.DataFrame,
+    verblijfsobjecten_in_beschermd_gezicht_result: pd.DataFrame,
+    gemeentelijke_monumenten_result: pd.DataFrame,
+) -> pd.DataFrame:
+    """Ontdubbel de resultaten van alle batches en voeg ze samen tot één DataFrame.
+
+    Args:
+        rijksmonumenten_result (pd.DataFrame): Rijksmonumenten van alle batches
+        verblijfsobjecten_in_beschermd_gezicht_result (pd.DataFrame): Beschermd gezicht lidmaatschap van alle batches
+        gemeentelijke_monumenten_result (pd.DataFrame): Gemeentelijke monumenten van alle batches
+
+    Returns:
+        pd.DataFrame: DataFrame met monumentinformatie
+    """
     # The filtering in _process_batch already separates the data correctly:
     # - EWE/EWD rows go to rijksmonumenten_df
     # - GG/GWA rows go to gemeentelijke_monumenten_df
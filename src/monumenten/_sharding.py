@@ -0,0 +1,281 @@
+"""Verwerking van grote aantallen ID's verdeeld over meerdere worker processen.
+
+De post-processing (pandas en de ruimtelijke test) van één proces benut maar één core, lang
+voordat de endpoints verzadigd zijn. Met `workers=N` worden de ID's verdeeld over N processen,
+elk met een eigen event loop en ClientSession en een evenredig deel van het maximale aantal
+gelijktijdige aanvragen per endpoint. Er zijn nooit meer workers dan dat maximum, zodat de
+workers samen niet meer aanvragen tegelijk doen dan één proces. Een worker geeft zijn resultaat
+via de executor terug aan de parent.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+import pandas as pd
+
+from monumenten._api import _cultureel_erfgoed, _kadaster
+from monumenten._api._planner import _gebruik_prioriteit
+from monumenten._api._sparql import _gebruik_hedging, _Hedger
+from monumenten._processing import VerwerkingsRapport, _query
+from monumenten.cache import CacheBackend, _gebruik_cache
+from monumenten.metrics import Meting, Metrics, _gebruik_metrics
+from monumenten.sessie import SessieInstellingen
+
+logger = logging.getLogger("monumenten.sharding")
+
+
+@dataclass(frozen=True)
+class _WorkerConfiguratie:
+    """Instellingen van de parent die elke worker overneemt.
+
+    Args:
+        bag_lv_endpoint (str): URL van het BAG LV endpoint
+        kkg_endpoint (str): URL van het KKG endpoint
+        rce_endpoint (str): URL van het RCE endpoint
+    """
+
+    bag_lv_endpoint: str
+    kkg_endpoint: str
+    rce_endpoint: str
+
+
+@dataclass
+class _ShardResultaat:
+    """Wat een worker teruggeeft.
+
+    Args:
+        resultaat (pd.DataFrame): Het resultaat van de worker
+        aantal (int): Aantal verwerkte ID's
+        rapport (Optional[VerwerkingsRapport]): Het rapport van de worker bij on_error="isolate"
+        metingen (List[Meting]): De metingen van de worker
+    """
+
+    resultaat: pd.DataFrame
+    aantal: int
+    rapport: Optional[VerwerkingsRapport]
+    metingen: List[Meting]
+
+
+def _verdeel_ids(ids: List[str], aantal: int) -> List[List[str]]:
+    """Verdeel ID's in ongeveer even grote delen, gegroepeerd op gemeentecode.
+
+    De eerste vier cijfers van een verblijfsobject ID zijn de gemeentecode. Door te sorteren
+    komen ID's uit dezelfde gemeente (en dus uit dezelfde beschermde gezichten) in dezelfde
+    worker terecht; alleen een gemeente die groter is dan een deel wordt gesplitst.
+
+    Args:
+        ids (List[str]): Unieke verblijfsobject ID's
+        aantal (int): Gewenst aantal delen
+
+    Returns:
+        List[List[str]]: Maximaal `aantal` niet-lege delen
+    """
+    gesorteerd = sorted(ids)
+    grootte = -(-len(gesorteerd) // aantal)
+    return [
+        gesorteerd[i : i + grootte] for i in range(0, len(gesorteerd), max(grootte, 1))
+    ]
+
+
+def _verdeel_aanvragen(maximum: int, aantal: int) -> List[int]:
+    """Verdeel het maximale aantal gelijktijdige aanvragen bij een endpoint over de workers.
+
+    Args:
+        maximum (int): Maximaal aantal gelijktijdige aanvragen bij het endpoint
+        aantal (int): Aantal workers, niet meer dan `maximum`
+
+    Returns:
+        List[int]: Het aandeel per worker; samen precies `maximum`, elk minimaal 1
+    """
+    basis, rest = divmod(maximum, aantal)
+    return [basis + (i < rest) for i in range(aantal)]
+
+
+def _initialiseer_worker(configuratie: _WorkerConfiguratie) -> None:
+    """Neem de endpoints van de parent over in de worker."""
+    _kadaster._BAG_LV_ENDPOINT = configuratie.bag_lv_endpoint
+    _kadaster._KKG_ENDPOINT = configuratie.kkg_endpoint
+    _cultureel_erfgoed._CULTUREEL_ERFGOED_SPARQL_ENDPOINT = configuratie.rce_endpoint
+
+
+def _verwerk_shard(
+    ids: List[str],
+    spatial_backend: str,
+    statussen: FrozenSet[str],
+    isoleren: bool,
+    hedging: bool,
+    cache: Optional[CacheBackend],
+    sessie: SessieInstellingen,
+    prioriteit: str,
+    kadaster_aanvragen: int,
+    rce_aanvragen: int,
+) -> _ShardResultaat:
+    """Verwerk één deel van de ID's in een worker proces.
+
+    Args:
+        ids (List[str]): De ID's van dit deel
+        spatial_backend (str): Naam van de ruimtelijke backend
+        statussen (FrozenSet[str]): Te berekenen statussen
+        isoleren (bool): Spoor mislukte ID's op in plaats van af te breken (on_error="isolate")
+        hedging (bool): Verstuur een dubbele aanvraag bij trage endpoints
+        cache (Optional[CacheBackend]): Gedeelde cache van de client
+        sessie (SessieInstellingen): Instellingen voor de sessie van de worker
+        prioriteit (str): Prioriteitsklasse van de aanvragen
+        kadaster_aanvragen (int): Aandeel van dit deel in het maximale aantal gelijktijdige
+            aanvragen bij het Kadaster
+        rce_aanvragen (int): Aandeel van dit deel in het maximale aantal gelijktijdige
+            aanvragen bij de RCE
+
+    Returns:
+        _ShardResultaat: Het resultaat, met het rapport en de metingen van de worker
+    """
+    # per deel, want een worker kan na een snel deel nog een deel oppakken; elke aanroep van
+    # asyncio.run hieronder maakt nieuwe planners met deze aantallen
+    _kadaster._MAX_GELIJKTIJDIGE_AANVRAGEN = kadaster_aanvragen
+    _cultureel_erfgoed._MAX_GELIJKTIJDIGE_AANVRAGEN = rce_aanvragen
+    rapport = VerwerkingsRapport() if isoleren else None
+    metingen: List[Meting] = []
+
+    async def _verwerk() -> pd.DataFrame:
+        async with sessie._maak_sessie() as session:
+            hedgers: Optional[Dict[str, _Hedger]] = {} if hedging else None
+            with (
+                _gebruik_metrics(Metrics([metingen.append])),
+                _gebruik_hedging(hedgers),
+                _gebruik_cache(cache),
+                _gebruik_prioriteit(prioriteit),
+            ):
+                return await _query(
+                    session,
+                    ids,
+                    spatial_backend=spatial_backend,
+                    rapport=rapport,
+                    statussen=statussen,
+                )
+
+    return _ShardResultaat(asyncio.run(_verwerk()), len(ids), rapport, metingen)
+
+
+async def _query_in_workers(
+    ids: List[str],
+    workers: int,
+    spatial_backend: str,
+    statussen: FrozenSet[str],
+    metrics: Metrics,
+    rapport: Optional[VerwerkingsRapport] = None,
+    hedging: bool = False,
+    cache: Optional[CacheBackend] = None,
+    sessie: Optional[SessieInstellingen] = None,
+    prioriteit: str = "bulk",
+    bij_voortgang: Optional[Callable[[int], None]] = None,
+) -> pd.DataFrame:
+    """Verwerk ID's verdeeld over `workers` processen.
+
+    De workers worden met "spawn" gestart, zodat ze geen event loop of threads van de parent
+    erven. Resultaten worden verwerkt zodra een worker klaar is. Bij een fout, annulering of
+    verstreken deadline worden ook de workers die nog bezig zijn beëindigd.
+
+    Args:
+        ids (List[str]): Unieke verblijfsobject ID's
+        workers (int): Aantal worker processen; hooguit het maximale aantal gelijktijdige
+            aanvragen per endpoint wordt gebruikt
+        spatial_backend (str): Naam van de ruimtelijke backend
+        statussen (FrozenSet[str]): Te berekenen statussen
+        metrics (Metrics): Metrics waarin de metingen van de workers worden opgenomen
+        rapport (Optional[VerwerkingsRapport]): Indien opgegeven worden mislukte ID's opgespoord
+            en de rapporten van de workers hierin samengevoegd
+        hedging (bool): Verstuur in de workers een dubbele aanvraag bij trage endpoints
+        cache (Optional[CacheBackend]): Gedeelde cache voor de workers
+        sessie (Optional[SessieInstellingen]): Instellingen voor de sessies van de workers.
+            Standaard `SessieInstellingen()`.
+        prioriteit (str): Prioriteitsklasse van de aanvragen in de workers. Elke worker heeft
+            zijn eigen planner; de klasse bepaalt daar de voorrang en de labels van de metingen.
+        bij_voortgang (Optional[Callable[[int], None]]): Wordt per afgeronde worker aangeroepen
+            met het aantal verwerkte ID's
+
+    Returns:
+        pd.DataFrame: DataFrame met monumentinformatie van alle workers
+    """
+    # elke worker heeft minimaal één plek per endpoint nodig; meer workers zouden samen over
+    # het maximum heen gaan
+    delen = _verdeel_ids(
+        ids,
+        min(
+            workers,
+            _kadaster._MAX_GELIJKTIJDIGE_AANVRAGEN,
+            _cultureel_erfgoed._MAX_GELIJKTIJDIGE_AANVRAGEN,
+        ),
+    )
+    kadaster_aanvragen = _verdeel_aanvragen(
+        _kadaster._MAX_GELIJKTIJDIGE_AANVRAGEN, len(delen)
+    )
+    rce_aanvragen = _verdeel_aanvragen(
+        _cultureel_erfgoed._MAX_GELIJKTIJDIGE_AANVRAGEN, len(delen)
+    )
+    configuratie = _WorkerConfiguratie(
+        bag_lv_endpoint=_kadaster._BAG_LV_ENDPOINT,
+        kkg_endpoint=_kadaster._KKG_ENDPOINT,
+        rce_endpoint=_cultureel_erfgoed._CULTUREEL_ERFGOED_SPARQL_ENDPOINT,
+    )
+    logger.debug("%d ID's verdeeld over %d workers", len(ids), len(delen))
+
+    resultaten: List[pd.DataFrame] = []
+    executor = ProcessPoolExecutor(
+        max_workers=len(delen),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initialiseer_worker,
+        initargs=(configuratie,),
+    )
+    futures = [
+        executor.submit(
+            _verwerk_shard,
+            deel,
+            spatial_backend,
+            statussen,
+            rapport is not None,
+            hedging,
+            cache,
+            sessie or SessieInstellingen(),
+            prioriteit,
+            kadaster_aanvragen[i],
+            rce_aanvragen[i],
+        )
+        for i, deel in enumerate(delen)
+    ]
+    try:
+        for taak in asyncio.as_completed([asyncio.wrap_future(f) for f in futures]):
+            shard = await taak
+            resultaten.append(shard.resultaat)
+            for meting in shard.metingen:
+                if meting.soort == "counter":
+                    metrics.verhoog(meting.naam, meting.waarde, **meting.labels)
+                else:
+                    metrics.observeer(meting.naam, meting.waarde, **meting.labels)
+            if rapport is not None and shard.rapport is not None:
+                rapport.niet_gevonden.extend(shard.rapport.niet_gevonden)
+                rapport.mislukt.update(shard.rapport.mislukt)
+            if bij_voortgang is not None:
+                bij_voortgang(shard.aantal)
+    except BaseException:
+        # cancel_futures hieronder annuleert alleen delen die nog niet begonnen zijn; een
+        # lopende worker zou doorgaan met aanvragen voor werk waar niemand meer op wacht
+        _stop_workers(executor)
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return pd.concat(resultaten, ignore_index=True)
+
+
+def _stop_workers(executor: ProcessPoolExecutor) -> None:
+    """Beëindig de worker processen van `executor`, ook als ze nog een deel verwerken."""
+    # ProcessPoolExecutor biedt (voor Python 3.14) geen publieke manier om lopend werk te stoppen
+    processen = getattr(executor, "_processes", None) or {}
+    for proces in list(processen.values()):
+        if proces.is_alive():
+            proces.terminate()
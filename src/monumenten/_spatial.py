@@ -0,0 +1,457 @@
+"""Ruimtelijke backends voor de test of een verblijfsobject in een beschermd gezicht ligt."""
+
+from __future__ import annotations
+
+import hashlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+import pandas as pd
+
+from monumenten.cache import CacheBackend, _haal_op_per_id, _zet_per_id
+from monumenten.metrics import _meet_stap
+
+# De ligging van een verblijfsobject verandert in de praktijk niet; de sleutels horen bovendien
+# bij één versie van de gezichten-dataset
+_LIDMAATSCHAP_TTL = 60 * 60 * 24 * 30  # 30 dagen
+
+
+class _GezichtenIndex(ABC):
+    """Index over de geometrieën van beschermde gezichten.
+
+    Args:
+        namen (Sequence[str]): Namen van de beschermde gezichten
+        wkts (Sequence[str]): WKT-geometrieën van de beschermde gezichten, in dezelfde volgorde als `namen`
+    """
+
+    def __init__(self, namen: Sequence[str], wkts: Sequence[str]) -> None:
+        if len(namen) != len(wkts):
+            raise ValueError(
+                "Aantal namen en geometrieën van beschermde gezichten verschilt"
+            )
+        self._namen = np.asarray(namen, dtype=object)
+        self.versie = _bereken_versie(namen, wkts)
+
+    @abstractmethod
+    def _parse_punten(self, wkts: Sequence[Optional[str]]) -> Any:
+        """Zet de WKT-geometrieën van de verblijfsobjecten om naar geometrieën van de backend.
+
+        Args:
+            wkts (Sequence[Optional[str]]): WKT-geometrieën van de verblijfsobjecten
+
+        Returns:
+            Any: De geometrieën in het formaat van de backend
+        """
+
+    @abstractmethod
+    def _zoek_paren(self, punten: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Zoek welke punten binnen welke gezichten liggen.
+
+        Args:
+            punten (Any): Geometrieën van de verblijfsobjecten, zoals teruggegeven door `_parse_punten`
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices van de punten en van de bijbehorende gezichten
+        """
+
+    def zoek(
+        self, identificaties: Sequence[str], wkts: Sequence[Optional[str]]
+    ) -> pd.DataFrame:
+        """Bepaal per verblijfsobject in welke beschermde gezichten het ligt.
+
+        Het resultaat komt overeen met een left spatial join met predicate `within`: een rij per
+        gevonden gezicht, en een rij met een lege naam voor verblijfsobjecten buiten elk gezicht.
+
+        Args:
+            identificaties (Sequence[str]): Verblijfsobject ID's
+            wkts (Sequence[Optional[str]]): WKT-geometrieën van de verblijfsobjecten
+
+        Returns:
+            pd.DataFrame: DataFrame met de kolommen identificatie en beschermd_gezicht_naam
+        """
+        with _meet_stap("wkt_parse"):
+            punten = self._parse_punten(wkts)
+        with _meet_stap("sjoin"):
+            punt_idx, gezicht_idx = self._zoek_paren(punten)
+
+        # Zelfde volgorde als een sjoin: per punt, en daarbinnen per gezicht
+        volgorde = np.lexsort((gezicht_idx, punt_idx))
+        gevonden = pd.DataFrame(
+            {
+                "punt_idx": punt_idx[volgorde],
+                "beschermd_gezicht_naam": self._namen[gezicht_idx[volgorde]],
+            }
+        )
+        alle_punten = pd.DataFrame(
+            {
+                "punt_idx": np.arange(len(identificaties)),
+                "identificatie": pd.Series(identificaties, dtype="string"),
+            }
+        )
+        return alle_punten.merge(gevonden, on="punt_idx", how="left")[
+            ["identificatie", "beschermd_gezicht_naam"]
+        ]
+
+
+class _GezichtLidmaatschap:
+    """Tabel van verblijfsobject ID naar de namen van de beschermde gezichten waarin het ligt.
+
+    De ligging van een verblijfsobject verandert in de praktijk niet, dus zolang de
+    gezichten-dataset gelijk blijft hoeft de ruimtelijke test maar één keer per ID te
+    gebeuren. De tabel hoort bij één versie van de dataset en wordt geleegd zodra een
+    andere versie wordt gesynchroniseerd.
+    """
+
+    def __init__(self) -> None:
+        self._versie: Optional[str] = None
+        self._namen: Dict[str, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._namen)
+
+    def __contains__(self, identificatie: object) -> bool:
+        return identificatie in self._namen
+
+    def synchroniseer(self, versie: str) -> None:
+        """Leeg de tabel als de gezichten-dataset een andere versie heeft.
+
+        Args:
+            versie (str): Versie (hash) van de huidige gezichten-dataset
+        """
+        if versie != self._versie:
+            self._namen.clear()
+            self._versie = versie
+
+    def bijwerken(self, resultaat: pd.DataFrame) -> None:
+        """Neem het resultaat van `_GezichtenIndex.zoek` op in de tabel.
+
+        Args:
+            resultaat (pd.DataFrame): DataFrame met de kolommen identificatie en beschermd_gezicht_naam
+        """
+        for identificatie, namen in resultaat.groupby("identificatie", sort=False)[
+            "beschermd_gezicht_naam"
+        ]:
+            self._namen[str(identificatie)] = tuple(namen.dropna())
+
+    async def laad(self, cache: CacheBackend, identificaties: Sequence[str]) -> None:
+        """Neem het lidmaatschap van `identificaties` over uit een gedeelde cache, voor zover bekend.
+
+        Args:
+            cache (CacheBackend): De gedeelde cache
+            identificaties (Sequence[str]): Verblijfsobject ID's die nog niet in de tabel staan
+        """
+        if self._versie is None:
+            return
+        gevonden = await _haal_op_per_id(
+            cache, f"gezicht_lidmaatschap:{self._versie}", identificaties
+        )
+        for identificatie, namen in gevonden.items():
+            self._namen[identificatie] = tuple(namen)
+
+    async def bewaar(self, cache: CacheBackend, identificaties: Sequence[str]) -> None:
+        """Zet het lidmaatschap van `identificaties` in een gedeelde cache.
+
+        Args:
+            cache (CacheBackend): De gedeelde cache
+            identificaties (Sequence[str]): Verblijfsobject ID's die in de tabel staan
+        """
+        if self._versie is None or not identificaties:
+            return
+        await _zet_per_id(
+            cache,
+            f"gezicht_lidmaatschap:{self._versie}",
+            {
+                identificatie: self._namen[identificatie]
+                for identificatie in identificaties
+            },
+            ttl=_LIDMAATSCHAP_TTL,
+        )
+
+    def opzoeken(self, identificaties: Iterable[str]) -> pd.DataFrame:
+        """Geef het lidmaatschap van bekende ID's terug in hetzelfde formaat als `_GezichtenIndex.zoek`.
+
+        Args:
+            identificaties (Iterable[str]): Verblijfsobject ID's die in de tabel staan
+
+        Returns:
+            pd.DataFrame: DataFrame met de kolommen identificatie en beschermd_gezicht_naam
+        """
+        rijen = [
+            (identificatie, naam)
+            for identificatie in identificaties
+            for naam in (self._namen[identificatie] or (None,))
+        ]
+        return pd.DataFrame(
+            rijen, columns=["identificatie", "beschermd_gezicht_naam"]
+        ).astype({"identificatie": "string"})
+
+
+class _ShapelyGezichtenIndex(_GezichtenIndex):
+    """Lichtgewicht backend op basis van een shapely STRtree en geprepareerde geometrieën."""
+
+    def __init__(self, namen: Sequence[str], wkts: Sequence[str]) -> None:
+        import shapely
+
+        super().__init__(namen, wkts)
+        self._geometrieen = shapely.from_wkt(np.asarray(wkts, dtype=object))
+        shapely.prepare(self._geometrieen)
+        self._boom = shapely.STRtree(self._geometrieen)
+
+    def _parse_punten(self, wkts: Sequence[Optional[str]]) -> Any:
+        import shapely
+
+        return shapely.from_wkt(np.asarray(wkts, dtype=object))
+
+    def _zoek_paren(self, punten: Any) -> Tuple[np.ndarray, np.ndarray]:
+        import shapely
+
+        # Eerst kandidaten op basis van de bounding boxes, daarna de exacte test tegen de
+        # geprepareerde gezichten. contains(gezicht, punt) is gelijk aan within(punt, gezicht).
+        punt_idx, gezicht_idx = self._boom.query(punten)
+        binnen = shapely.contains(self._geometrieen[gezicht_idx], punten[punt_idx])
+        return punt_idx[binnen], gezicht_idx[binnen]
+
+
+# Aantal rastercellen langs de langste zijde van de bounding box van een gezicht
+_RASTER_CELLEN = 32
+
+# Klassen van een rastercel: de cel ligt geheel binnen, geheel buiten, of op de rand
+_BUITEN, _BINNEN, _RAND = 0, 1, 2
+
+
+class _RasterGezichtenIndex(_ShapelyGezichtenIndex):
+    """Shapely backend die de meeste punten zonder exacte test tegen het gezicht afhandelt.
+
+    Beschermde gezichten zijn gedetailleerde polygonen met veel hoekpunten, en de exacte
+    `within` test ertegen is het duurste deel van de ruimtelijke test. Bij het laden wordt per
+    gezicht vooraf berekend:
+
+    - een raster over de bounding box, met per cel of hij geheel binnen, geheel buiten of op de
+      rand van het gezicht ligt. Een punt in een binnen- of buitencel is met een paar
+      rekenkundige bewerkingen beslist.
+    - een vereenvoudigde binnenvorm die gegarandeerd binnen het gezicht ligt en een
+      vereenvoudigde buitenvorm die het gezicht gegarandeerd omsluit. Voor punten in een randcel
+      zijn deze met weinig hoekpunten bijna altijd voldoende.
+
+    Alleen punten tussen de binnen- en buitenvorm krijgen de exacte test. Beide garanties worden
+    bij het bouwen exact gecontroleerd, zodat het resultaat gelijk is aan dat van de shapely
+    backend. Het bouwen kost per gezicht een paar milliseconden extra.
+    """
+
+    def __init__(self, namen: Sequence[str], wkts: Sequence[str]) -> None:
+        import shapely
+
+        super().__init__(namen, wkts)
+        aantal = len(self._geometrieen)
+        self._oorsprong = np.zeros((aantal, 2))
+        self._celgrootte = np.ones(aantal)
+        self._vorm = np.ones((aantal, 2), dtype=np.intp)
+        self._begin = np.zeros(aantal, dtype=np.intp)
+        self._binnenvormen = np.empty(aantal, dtype=object)
+        self._buitenvormen = np.empty(aantal, dtype=object)
+        cellen: List[np.ndarray] = []
+        begin = 0
+        for g, geometrie in enumerate(self._geometrieen):
+            self._begin[g] = begin
+            klassen = self._bouw_gezicht(g, geometrie)
+            cellen.append(klassen)
+            begin += len(klassen)
+        self._cellen = np.concatenate(cellen) if cellen else np.zeros(0, dtype=np.int8)
+        shapely.prepare(self._binnenvormen)
+        shapely.prepare(self._buitenvormen)
+
+    def _bouw_gezicht(self, g: int, geometrie: Any) -> np.ndarray:
+        """Bereken het raster en de binnen- en buitenvorm van één gezicht.
+
+        Args:
+            g (int): Index van het gezicht
+            geometrie (Any): Shapely-geometrie van het gezicht
+
+        Returns:
+            np.ndarray: Klasse per rastercel (`_BUITEN`, `_BINNEN` of `_RAND`), kolom voor kolom
+        """
+        import shapely
+
+        leeg = shapely.Polygon()
+        if geometrie is None or shapely.is_empty(geometrie):
+            self._binnenvormen[g] = self._buitenvormen[g] = leeg
+            return np.full(1, _BUITEN, dtype=np.int8)
+
+        x0, y0, x1, y1 = shapely.bounds(geometrie)
+        grootte = max(x1 - x0, y1 - y0) / _RASTER_CELLEN or 1.0
+        nx = max(1, min(_RASTER_CELLEN, int(np.ceil((x1 - x0) / grootte))))
+        ny = max(1, min(_RASTER_CELLEN, int(np.ceil((y1 - y0) / grootte))))
+        self._oorsprong[g] = (x0, y0)
+        self._celgrootte[g] = grootte
+        self._vorm[g] = (nx, ny)
+
+        # De cellen zijn iets groter dan het raster, zodat een punt dat door afronding bij het
+        # bepalen van zijn cel net in de buurcel valt toch binnen de geteste cel ligt
+        marge = grootte * 1e-6
+        i, j = (
+            a.ravel() for a in np.meshgrid(np.arange(nx), np.arange(ny), indexing="ij")
+        )
+        dozen = shapely.box(
+            x0 + i * grootte - marge,
+            y0 + j * grootte - marge,
+            x0 + (i + 1) * grootte + marge,
+            y0 + (j + 1) * grootte + marge,
+        )
+        klassen = np.full(len(dozen), _RAND, dtype=np.int8)
+        klassen[shapely.contains_properly(geometrie, dozen)] = _BINNEN
+        klassen[shapely.disjoint(geometrie, dozen)] = _BUITEN
+
+        # Een vereenvoudiging wijkt hooguit `tolerantie` af van het gezicht; na krimpen of
+        # uitzetten met twee keer die afstand ligt hij er dus zeker binnen of omheen
+        tolerantie = grootte / 8
+        vereenvoudigd = shapely.simplify(geometrie, tolerantie)
+        binnen = shapely.buffer(vereenvoudigd, -2 * tolerantie, quad_segs=1)
+        buiten = shapely.buffer(vereenvoudigd, 2 * tolerantie, quad_segs=1)
+        self._binnenvormen[g] = (
+            binnen
+            if not shapely.is_empty(binnen)
+            and shapely.contains_properly(geometrie, binnen)
+            else leeg
+        )
+        self._buitenvormen[g] = (
+            buiten
+            if shapely.contains_properly(buiten, geometrie)
+            else shapely.box(x0 - marge, y0 - marge, x1 + marge, y1 + marge)
+        )
+        return klassen
+
+    def _zoek_paren(self, punten: Any) -> Tuple[np.ndarray, np.ndarray]:
+        import shapely
+
+        if len(punten) and not np.all(
+            shapely.get_type_id(punten[~shapely.is_missing(punten)]) == 0
+        ):
+            # het raster werkt per coördinaat; andere geometrieën dan punten exact testen
+            return super()._zoek_paren(punten)
+
+        punt_idx, gezicht_idx = self._boom.query(punten)
+        coordinaten = shapely.get_coordinates(punten[punt_idx])
+        grootte = self._celgrootte[gezicht_idx]
+        nx, ny = self._vorm[gezicht_idx].T
+        i = np.floor((coordinaten[:, 0] - self._oorsprong[gezicht_idx, 0]) / grootte)
+        j = np.floor((coordinaten[:, 1] - self._oorsprong[gezicht_idx, 1]) / grootte)
+        i = np.clip(i, 0, nx - 1).astype(np.intp)
+        j = np.clip(j, 0, ny - 1).astype(np.intp)
+        klassen = self._cellen[self._begin[gezicht_idx] + i * ny + j]
+
+        binnen = klassen == _BINNEN
+        rand = np.flatnonzero(klassen == _RAND)
+        if rand.size:
+            kandidaten = punten[punt_idx[rand]]
+            gezichten = gezicht_idx[rand]
+            uitkomst = shapely.contains(self._binnenvormen[gezichten], kandidaten)
+            twijfel = ~uitkomst & shapely.contains(
+                self._buitenvormen[gezichten], kandidaten
+            )
+            uitkomst[twijfel] = shapely.contains(
+                self._geometrieen[gezichten[twijfel]], kandidaten[twijfel]
+            )
+            binnen[rand] = uitkomst
+        return punt_idx[binnen], gezicht_idx[binnen]
+
+
+class _GeoPandasGezichtenIndex(_GezichtenIndex):
+    """Backend op basis van een geopandas spatial join.
+
+    Args:
+        namen (Sequence[str]): Namen van de beschermde gezichten
+        wkts (Sequence[str]): WKT-geometrieën van de beschermde gezichten
+
+    Raises:
+        ImportError: Als de optionele dependency geopandas niet geïnstalleerd is
+    """
+
+    def __init__(self, namen: Sequence[str], wkts: Sequence[str]) -> None:
+        try:
+            import geopandas as gpd
+        except ImportError as e:
+            raise ImportError(
+                "De geopandas backend vereist geopandas: pip install monumenten[geopandas]"
+            ) from e
+
+        super().__init__(namen, wkts)
+        self._gezichten_df = gpd.GeoDataFrame(
+            {"gezicht_idx": np.arange(len(wkts))},
+            geometry=gpd.GeoSeries.from_wkt(list(wkts)),
+        )
+
+    def _parse_punten(self, wkts: Sequence[Optional[str]]) -> Any:
+        import geopandas as gpd
+
+        return gpd.GeoDataFrame(
+            {"punt_idx": np.arange(len(wkts))},
+            geometry=gpd.GeoSeries.from_wkt(list(wkts)),
+        )
+
+    def _zoek_paren(self, punten: Any) -> Tuple[np.ndarray, np.ndarray]:
+        import geopandas as gpd
+
+        paren = gpd.sjoin(punten, self._gezichten_df, how="inner", predicate="within")
+        return (
+            paren["punt_idx"].to_numpy(dtype=np.intp),
+            paren["gezicht_idx"].to_numpy(dtype=np.intp),
+        )
+
+
+def _bereken_versie(namen: Sequence[str], wkts: Sequence[str]) -> str:
+    """Bereken een hash over de gezichten-dataset, onafhankelijk van de volgorde van de gezichten.
+
+    Args:
+        namen (Sequence[str]): Namen van de beschermde gezichten
+        wkts (Sequence[str]): WKT-geometrieën van de beschermde gezichten
+
+    Returns:
+        str: Hexadecimale sha256-hash van de dataset
+    """
+    h = hashlib.sha256()
+    for naam, wkt in sorted(zip(namen, wkts)):
+        h.update(naam.encode())
+        h.update(b"\0")
+        h.update(wkt.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+_SPATIAL_BACKENDS: Dict[str, Type[_GezichtenIndex]] = {
+    "shapely": _ShapelyGezichtenIndex,
+    "raster": _RasterGezichtenIndex,
+    "geopandas": _GeoPandasGezichtenIndex,
+}
+
+
+def _controleer_spatial_backend(spatial_backend: str) -> None:
+    """Controleer of de gekozen ruimtelijke backend bestaat.
+
+    Args:
+        spatial_backend (str): Naam van de backend, zie `_SPATIAL_BACKENDS`
+
+    Raises:
+        ValueError: Als de backend onbekend is
+    """
+    if spatial_backend not in _SPATIAL_BACKENDS:
+        raise ValueError(
+            f"Onbekende spatial backend '{spatial_backend}', kies uit: {', '.join(_SPATIAL_BACKENDS)}"
+        )
+
+
+def _maak_gezichten_index(
+    spatial_backend: str, namen: List[str], wkts: List[str]
+) -> _GezichtenIndex:
+    """Bouw een index over de beschermde gezichten met de gekozen backend.
+
+    Args:
+        spatial_backend (str): Naam van de backend, zie `_SPATIAL_BACKENDS`
+        namen (List[str]): Namen van de beschermde gezichten
+        wkts (List[str]): WKT-geometrieën van de beschermde gezichten
+
+    Returns:
+        _GezichtenIndex: De index over de beschermde gezichten
+    """
+    _controleer_spatial_backend(spatial_backend)
+    return _SPATIAL_BACKENDS[spatial_backend](namen, wkts)
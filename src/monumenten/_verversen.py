@@ -0,0 +1,230 @@
+"""Hulpfuncties voor het verversen van een eerder resultaat van `process_from_df`.
+
+Per status wordt bijgehouden wanneer hij voor het laatst gecontroleerd is, in een kolom
+`<status>_gecontroleerd_op`. Alleen statussen die ouder zijn dan hun maximale leeftijd worden
+opnieuw opgevraagd. Voor de beschermde gezichten is er daarnaast een goedkoop signaal: de
+versie (hash) van de gezichten-dataset. Verandert die, dan is elk beschermd gezicht verouderd.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Union
+
+import pandas as pd
+
+from monumenten._processing import _KOLOMMEN_PER_STATUS, STATUSSEN
+
+_GEZICHTEN_VERSIE_KOLOM = "beschermd_gezichten_versie"
+
+
+def _tijdstempel_kolom(status: str) -> str:
+    """Naam van de kolom met het tijdstip van de laatste controle van een status."""
+    return f"{status}_gecontroleerd_op"
+
+
+def _status_kolommen(status: str) -> List[str]:
+    """Alle kolommen die bij een status horen, inclusief tijdstempel (en versie)."""
+    kolommen = [*_KOLOMMEN_PER_STATUS[status], _tijdstempel_kolom(status)]
+    if status == "beschermd_gezicht":
+        kolommen.append(_GEZICHTEN_VERSIE_KOLOM)
+    return kolommen
+
+
+def _als_utc(tijdstip: Optional[datetime]) -> Optional[pd.Timestamp]:
+    """Zet een tijdstip om naar UTC; een tijdstip zonder tijdzone wordt als UTC gelezen."""
+    if tijdstip is None:
+        return None
+    tijdstempel = pd.Timestamp(tijdstip)
+    if tijdstempel.tzinfo is None:
+        return tijdstempel.tz_localize("UTC")
+    return tijdstempel.tz_convert("UTC")
+
+
+def _max_leeftijden(
+    max_leeftijd: Union[timedelta, Mapping[str, timedelta]],
+) -> Dict[str, timedelta]:
+    """Bepaal de maximale leeftijd per status.
+
+    Args:
+        max_leeftijd (Union[timedelta, Mapping[str, timedelta]]): Eén leeftijd voor alle
+            statussen, of een leeftijd per status; ontbrekende statussen worden altijd ververst
+
+    Returns:
+        Dict[str, timedelta]: Maximale leeftijd per status
+
+    Raises:
+        ValueError: Bij een onbekende status of een negatieve leeftijd
+    """
+    if isinstance(max_leeftijd, timedelta):
+        leeftijden = dict.fromkeys(STATUSSEN, max_leeftijd)
+    else:
+        onbekend = set(max_leeftijd).difference(STATUSSEN)
+        if onbekend:
+            raise ValueError(
+                f"Onbekende status(sen) {sorted(onbekend)} in max_leeftijd, kies uit: "
+                f"{', '.join(STATUSSEN)}"
+            )
+        leeftijden = {
+            status: max_leeftijd.get(status, timedelta(0)) for status in STATUSSEN
+        }
+    if any(leeftijd < timedelta(0) for leeftijd in leeftijden.values()):
+        raise ValueError("max_leeftijd mag niet negatief zijn")
+    return leeftijden
+
+
+def _verouderde_statussen(
+    vorig: pd.DataFrame,
+    id_kolom: str,
+    statussen: Iterable[str],
+    max_leeftijden: Mapping[str, timedelta],
+    nu: pd.Timestamp,
+    gecontroleerd_op: Optional[datetime] = None,
+    gezichten_versie: Optional[str] = None,
+) -> Dict[FrozenSet[str], List[str]]:
+    """Groepeer de ID's op de combinatie van statussen die opnieuw opgevraagd moet worden.
+
+    Args:
+        vorig (pd.DataFrame): Eerder resultaat
+        id_kolom (str): Naam van de kolom met de verblijfsobject ID's
+        statussen (Iterable[str]): Statussen die in het eerdere resultaat staan
+        max_leeftijden (Mapping[str, timedelta]): Maximale leeftijd per status
+        nu (pd.Timestamp): Huidig tijdstip (UTC)
+        gecontroleerd_op (Optional[datetime]): Tijdstip van controle voor statussen zonder
+            tijdstempelkolom; zonder tijdstip zijn die statussen verouderd
+        gezichten_versie (Optional[str]): Huidige versie van de gezichten-dataset
+
+    Returns:
+        Dict[FrozenSet[str], List[str]]: Per combinatie van verouderde statussen de ID's
+    """
+    verouderd: Dict[str, pd.Series[bool]] = {}
+    for status in statussen:
+        kolom = _tijdstempel_kolom(status)
+        if kolom in vorig.columns:
+            tijdstempels = pd.to_datetime(vorig[kolom], utc=True)
+        else:
+            tijdstempels = pd.Series(
+                _als_utc(gecontroleerd_op),
+                index=vorig.index,
+                dtype="datetime64[ns, UTC]",
+            )
+        is_verouderd = tijdstempels.isna() | (
+            tijdstempels < nu - max_leeftijden[status]
+        )
+        if (
+            status == "beschermd_gezicht"
+            and gezichten_versie is not None
+            and _GEZICHTEN_VERSIE_KOLOM in vorig.columns
+        ):
+            is_verouderd |= (
+                vorig[_GEZICHTEN_VERSIE_KOLOM].ne(gezichten_versie).fillna(True)
+            )
+        # bij meerdere rijen per ID (meerdere gezichten) telt de oudste controle
+        verouderd[status] = is_verouderd.groupby(vorig[id_kolom]).any()
+
+    groepen: Dict[FrozenSet[str], List[str]] = {}
+    per_id = pd.DataFrame(verouderd)
+    for identificatie, rij in per_id.iterrows():
+        combinatie = frozenset(str(status) for status, oud in rij.items() if oud)
+        if combinatie:
+            groepen.setdefault(combinatie, []).append(str(identificatie))
+    return groepen
+
+
+def _voeg_samen(
+    vorig: pd.DataFrame,
+    id_kolom: str,
+    statussen: Iterable[str],
+    nieuw: Mapping[FrozenSet[str], pd.DataFrame],
+    nu: pd.Timestamp,
+    gecontroleerd_op: Optional[datetime] = None,
+    gezichten_versie: Optional[str] = None,
+) -> pd.DataFrame:
+    """Vervang de verouderde statussen in het eerdere resultaat door de nieuwe.
+
+    Args:
+        vorig (pd.DataFrame): Eerder resultaat
+        id_kolom (str): Naam van de kolom met de verblijfsobject ID's
+        statussen (Iterable[str]): Statussen die in het eerdere resultaat staan
+        nieuw (Mapping[FrozenSet[str], pd.DataFrame]): Per combinatie van verouderde statussen
+            het nieuwe resultaat van `process_from_df` voor die ID's
+        nu (pd.Timestamp): Tijdstip van deze controle
+        gecontroleerd_op (Optional[datetime]): Tijdstip voor statussen zonder tijdstempelkolom
+        gezichten_versie (Optional[str]): Versie van de gezichten-dataset van deze controle
+
+    Returns:
+        pd.DataFrame: Het bijgewerkte resultaat, met tijdstempels per status
+    """
+    statussen = list(statussen)
+    status_kolommen = {k for status in STATUSSEN for k in _status_kolommen(status)}
+    basis = vorig[[k for k in vorig.columns if k not in status_kolommen]]
+    bijgewerkt = basis.drop_duplicates()
+
+    for status in statussen:
+        kolommen = _status_kolommen(status)
+        oud = vorig.reindex(columns=[id_kolom, *kolommen])
+        if _tijdstempel_kolom(status) not in vorig.columns:
+            oud[_tijdstempel_kolom(status)] = _als_utc(gecontroleerd_op)
+        delen = []
+        ververst: List[str] = []
+        for combinatie, resultaat in nieuw.items():
+            if status not in combinatie:
+                continue
+            deel = resultaat.reindex(columns=[id_kolom, *kolommen])
+            deel[_tijdstempel_kolom(status)] = nu
+            if status == "beschermd_gezicht":
+                deel[_GEZICHTEN_VERSIE_KOLOM] = gezichten_versie
+            delen.append(deel)
+            ververst.extend(resultaat[id_kolom])
+        oud = oud[~oud[id_kolom].isin(ververst)]
+        deeltabel = pd.concat([oud, *delen], ignore_index=True).drop_duplicates()
+        deeltabel[_tijdstempel_kolom(status)] = pd.to_datetime(
+            deeltabel[_tijdstempel_kolom(status)], utc=True
+        )
+        bijgewerkt = bijgewerkt.merge(deeltabel, on=id_kolom, how="left")
+
+    # dezelfde volgorde als het eerdere resultaat, nieuwe kolommen achteraan
+    volgorde = [k for k in vorig.columns if k in bijgewerkt.columns]
+    volgorde += [k for k in bijgewerkt.columns if k not in volgorde]
+    return bijgewerkt[volgorde].reset_index(drop=True)
+
+
+def _wijzigingen(
+    vorig: pd.DataFrame,
+    bijgewerkt: pd.DataFrame,
+    id_kolom: str,
+    statussen: Iterable[str],
+) -> pd.DataFrame:
+    """Bepaal per ID welke statussen erbij zijn gekomen en welke zijn vervallen.
+
+    Args:
+        vorig (pd.DataFrame): Eerder resultaat
+        bijgewerkt (pd.DataFrame): Bijgewerkt resultaat
+        id_kolom (str): Naam van de kolom met de verblijfsobject ID's
+        statussen (Iterable[str]): Vergeleken statussen
+
+    Returns:
+        pd.DataFrame: Eén rij per gewijzigde status met de kolommen `id_kolom`, "status" en
+            "wijziging" ("toegevoegd" of "verwijderd")
+    """
+    rijen = []
+    for status in statussen:
+        kolom = f"is_{status}"
+        oud = _per_id(vorig, id_kolom, kolom)
+        nieuw = _per_id(bijgewerkt, id_kolom, kolom).reindex(
+            oud.index, fill_value=False
+        )
+        for identificatie in oud.index[nieuw & ~oud]:
+            rijen.append((identificatie, status, "toegevoegd"))
+        for identificatie in oud.index[oud & ~nieuw]:
+            rijen.append((identificatie, status, "verwijderd"))
+    return (
+        pd.DataFrame(rijen, columns=[id_kolom, "status", "wijziging"])
+        .sort_values([id_kolom, "status"])
+        .reset_index(drop=True)
+    )
+
+
+def _per_id(df: pd.DataFrame, id_kolom: str, kolom: str) -> pd.Series[bool]:
+    """Of een booleaanse kolom voor minimaal één rij van elk ID waar is."""
+    return df[kolom].fillna(False).astype(bool).groupby(df[id_kolom]).any()
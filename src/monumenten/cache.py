@@ -0,0 +1,864 @@
+"""Cache backends voor de beschermde gezichten en de resultaten per verblijfsobject ID.
+
+Standaard worden alleen de beschermde gezichten gecachet, in het geheugen van het proces.
+Met een gedeelde backend (`DiskCache` of `RedisCache`) delen meerdere processen of containers
+ook de koppeling van verblijfsobject naar nummeraanduiding (BAG LV), het beschermd gezicht
+lidmaatschap en de resultaten per ID (beperkingen uit het KKG, rijksmonumentnummers van de RCE),
+zodat elke opvraging maar één keer betaald wordt::
+
+    cache = RedisCache("redis://cache:6379/0")
+    async with MonumentenClient(cache=cache) as client:
+        await client.process_from_df(df, "bag_verblijfsobject_id")
+
+Waarden worden opgeslagen als zlib-gecomprimeerde JSON. Het ophalen van de gezichten is over
+processen heen tegen een stampede beschermd: één proces haalt op, de rest wacht op het resultaat.
+De cache is een versnelling, geen voorwaarde: is de backend onbereikbaar of een waarde onleesbaar,
+dan wordt dat gelogd en wordt de waarde bij de endpoints opgevraagd.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import collections
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from contextlib import contextmanager
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from urllib.parse import unquote, urlparse
+
+__all__ = ["CacheBackend", "DiskCache", "MemoryCache", "RedisCache"]
+
+logger = logging.getLogger("monumenten.cache")
+
+_FORMAAT = b"\x01"  # zlib-gecomprimeerde JSON
+
+
+def _codeer(waarde: Any) -> bytes:
+    return _FORMAAT + zlib.compress(
+        json.dumps(waarde, separators=(",", ":"), ensure_ascii=False).encode()
+    )
+
+
+def _decodeer(data: bytes) -> Any:
+    if data[:1] != _FORMAAT:
+        raise ValueError(f"Onbekend formaat van cachewaarde: {data[:1]!r}")
+    return json.loads(zlib.decompress(data[1:]))
+
+
+class CacheBackend(abc.ABC):
+    """Interface van een cache backend. Sleutels zijn strings, waarden bytes.
+
+    Een backend implementeert naast ophalen en opslaan ook een slot (`vergrendel` en
+    `ontgrendel`), waarmee maar één proces tegelijk een ontbrekende waarde berekent.
+    """
+
+    @abc.abstractmethod
+    async def haal_op(self, sleutel: str) -> Optional[bytes]:
+        """Haal een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+
+        Returns:
+            Optional[bytes]: De waarde, None als de sleutel ontbreekt of verlopen is
+        """
+
+    @abc.abstractmethod
+    async def zet(self, sleutel: str, waarde: bytes, ttl: Optional[float]) -> None:
+        """Sla een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+            waarde (bytes): De waarde
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+
+    async def haal_op_meerdere(self, sleutels: Sequence[str]) -> List[Optional[bytes]]:
+        """Haal meerdere waarden in één keer op.
+
+        Args:
+            sleutels (Sequence[str]): De sleutels
+
+        Returns:
+            List[Optional[bytes]]: De waarden, in dezelfde volgorde als `sleutels`
+        """
+        return [await self.haal_op(sleutel) for sleutel in sleutels]
+
+    async def zet_meerdere(
+        self, waarden: Mapping[str, bytes], ttl: Optional[float]
+    ) -> None:
+        """Sla meerdere waarden in één keer op.
+
+        Args:
+            waarden (Mapping[str, bytes]): Sleutels en waarden
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+        for sleutel, waarde in waarden.items():
+            await self.zet(sleutel, waarde, ttl)
+
+    @abc.abstractmethod
+    async def vergrendel(self, sleutel: str, token: str, ttl: float) -> bool:
+        """Probeer een slot te nemen.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): Unieke waarde van de houder, nodig om het slot vrij te geven
+            ttl (float): Na zoveel seconden vervalt het slot, ook als de houder verdwenen is
+
+        Returns:
+            bool: True als het slot genomen is
+        """
+
+    @abc.abstractmethod
+    async def ontgrendel(self, sleutel: str, token: str) -> None:
+        """Geef een slot vrij als het nog van de houder met `token` is.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): De waarde waarmee het slot genomen is
+        """
+
+    @abc.abstractmethod
+    async def leeg(self) -> None:
+        """Verwijder alle waarden."""
+
+
+class MemoryCache(CacheBackend):
+    """Cache in het geheugen van het proces, met een maximaal aantal sleutels (LRU).
+
+    De cache is thread-safe en kan dus ook door clients op verschillende event loops
+    gedeeld worden.
+
+    Args:
+        max_sleutels (int): Maximaal aantal sleutels; de minst recent gebruikte vallen eruit.
+            Standaard is 100.000.
+    """
+
+    def __init__(self, max_sleutels: int = 100_000) -> None:
+        self._max_sleutels = max_sleutels
+        self._waarden: collections.OrderedDict[str, Tuple[float, bytes]] = (
+            collections.OrderedDict()
+        )
+        self._sloten: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # een kopie voor een ander proces begint leeg
+        return (MemoryCache, (self._max_sleutels,))
+
+    async def haal_op(self, sleutel: str) -> Optional[bytes]:
+        """Haal een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+
+        Returns:
+            Optional[bytes]: De waarde, None als de sleutel ontbreekt of verlopen is
+        """
+        with self._lock:
+            item = self._waarden.get(sleutel)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._waarden[sleutel]
+                return None
+            self._waarden.move_to_end(sleutel)
+            return item[1]
+
+    async def zet(self, sleutel: str, waarde: bytes, ttl: Optional[float]) -> None:
+        """Sla een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+            waarde (bytes): De waarde
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+        verloopt = float("inf") if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._waarden[sleutel] = (verloopt, waarde)
+            self._waarden.move_to_end(sleutel)
+            while len(self._waarden) > self._max_sleutels:
+                self._waarden.popitem(last=False)
+
+    async def vergrendel(self, sleutel: str, token: str, ttl: float) -> bool:
+        """Probeer een slot te nemen.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): Unieke waarde van de houder, nodig om het slot vrij te geven
+            ttl (float): Na zoveel seconden vervalt het slot, ook als de houder verdwenen is
+
+        Returns:
+            bool: True als het slot genomen is
+        """
+        nu = time.monotonic()
+        with self._lock:
+            slot = self._sloten.get(sleutel)
+            if slot is not None and slot[0] > nu:
+                return False
+            self._sloten[sleutel] = (nu + ttl, token)
+            return True
+
+    async def ontgrendel(self, sleutel: str, token: str) -> None:
+        """Geef een slot vrij als het nog van de houder met `token` is.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): De waarde waarmee het slot genomen is
+        """
+        with self._lock:
+            slot = self._sloten.get(sleutel)
+            if slot is not None and slot[1] == token:
+                del self._sloten[sleutel]
+
+    async def leeg(self) -> None:
+        """Verwijder alle waarden."""
+        with self._lock:
+            self._waarden.clear()
+            self._sloten.clear()
+
+
+class DiskCache(CacheBackend):
+    """Cache in een lokale map, te delen door processen en containers met dezelfde schijf.
+
+    Elke sleutel is een bestand; een slot is een bestand dat exclusief aangemaakt wordt.
+
+    Args:
+        pad (Union[str, os.PathLike[str]]): De map voor de cachebestanden. Wordt aangemaakt als hij
+            nog niet bestaat.
+    """
+
+    def __init__(self, pad: Union[str, os.PathLike[str]]) -> None:
+        self._map = os.fspath(pad)
+        os.makedirs(self._map, exist_ok=True)
+
+    def _pad(self, sleutel: str, extensie: str = ".cache") -> str:
+        naam = hashlib.sha256(sleutel.encode()).hexdigest()
+        return os.path.join(self._map, naam + extensie)
+
+    def _lees(self, sleutel: str) -> Optional[bytes]:
+        try:
+            with open(self._pad(sleutel), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < 8:
+            return None  # afgebroken of geen cachebestand
+        (verloopt,) = struct.unpack(">d", data[:8])
+        if verloopt < time.time():
+            return None
+        return data[8:]
+
+    def _schrijf(self, sleutel: str, waarde: bytes, ttl: Optional[float]) -> None:
+        verloopt = float("inf") if ttl is None else time.time() + ttl
+        # eerst naar een tijdelijk bestand, zodat lezers nooit een half bestand zien
+        fd, tijdelijk = tempfile.mkstemp(dir=self._map, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(struct.pack(">d", verloopt) + waarde)
+            os.replace(tijdelijk, self._pad(sleutel))
+        except BaseException:
+            os.unlink(tijdelijk)
+            raise
+
+    def _vergrendel(self, sleutel: str, token: str, ttl: float) -> bool:
+        pad = self._pad(sleutel, ".slot")
+        for _ in range(2):
+            try:
+                fd = os.open(pad, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._lees_slot(pad)[1] > time.time():
+                    return False
+                # de houder is verdwenen zonder vrij te geven
+                try:
+                    os.unlink(pad)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{token}\n{time.time() + ttl}")
+            return True
+        return False
+
+    @staticmethod
+    def _lees_slot(pad: str) -> Tuple[str, float]:
+        try:
+            with open(pad) as f:
+                token, _, verloopt = f.read().partition("\n")
+            if verloopt:
+                return token, float(verloopt)
+            # net aangemaakt en nog niet beschreven; bezet, maar niet voor altijd
+            return token, os.path.getmtime(pad) + 60
+        except FileNotFoundError:
+            return "", 0.0
+
+    def _ontgrendel(self, sleutel: str, token: str) -> None:
+        pad = self._pad(sleutel, ".slot")
+        if self._lees_slot(pad)[0] != token:
+            return
+        try:
+            os.unlink(pad)
+        except FileNotFoundError:
+            pass
+
+    def _leeg(self) -> None:
+        for naam in os.listdir(self._map):
+            if naam.endswith((".cache", ".slot")):
+                try:
+                    os.unlink(os.path.join(self._map, naam))
+                except FileNotFoundError:
+                    pass
+
+    async def haal_op(self, sleutel: str) -> Optional[bytes]:
+        """Haal een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+
+        Returns:
+            Optional[bytes]: De waarde, None als de sleutel ontbreekt of verlopen is
+        """
+        return await asyncio.to_thread(self._lees, sleutel)
+
+    async def haal_op_meerdere(self, sleutels: Sequence[str]) -> List[Optional[bytes]]:
+        """Haal meerdere waarden in één keer op.
+
+        Args:
+            sleutels (Sequence[str]): De sleutels
+
+        Returns:
+            List[Optional[bytes]]: De waarden, in dezelfde volgorde als `sleutels`
+        """
+        return await asyncio.to_thread(lambda: [self._lees(s) for s in sleutels])
+
+    async def zet(self, sleutel: str, waarde: bytes, ttl: Optional[float]) -> None:
+        """Sla een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+            waarde (bytes): De waarde
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+        await asyncio.to_thread(self._schrijf, sleutel, waarde, ttl)
+
+    async def zet_meerdere(
+        self, waarden: Mapping[str, bytes], ttl: Optional[float]
+    ) -> None:
+        """Sla meerdere waarden in één keer op.
+
+        Args:
+            waarden (Mapping[str, bytes]): Sleutels en waarden
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+
+        def _schrijf_alles() -> None:
+            for sleutel, waarde in waarden.items():
+                self._schrijf(sleutel, waarde, ttl)
+
+        await asyncio.to_thread(_schrijf_alles)
+
+    async def vergrendel(self, sleutel: str, token: str, ttl: float) -> bool:
+        """Probeer een slot te nemen.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): Unieke waarde van de houder, nodig om het slot vrij te geven
+            ttl (float): Na zoveel seconden vervalt het slot, ook als de houder verdwenen is
+
+        Returns:
+            bool: True als het slot genomen is
+        """
+        return await asyncio.to_thread(self._vergrendel, sleutel, token, ttl)
+
+    async def ontgrendel(self, sleutel: str, token: str) -> None:
+        """Geef een slot vrij als het nog van de houder met `token` is.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): De waarde waarmee het slot genomen is
+        """
+        await asyncio.to_thread(self._ontgrendel, sleutel, token)
+
+    async def leeg(self) -> None:
+        """Verwijder alle waarden."""
+        await asyncio.to_thread(self._leeg)
+
+
+_RespWaarde = Union[None, int, bytes, str, List[Any]]
+
+
+class _RespVerbinding:
+    """Eén verbinding met een server die het Redis-protocol (RESP2) spreekt."""
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+        # na een afgebroken commando kan er nog een antwoord onderweg zijn; de verbinding is
+        # dan niet meer bruikbaar
+        self.kapot = False
+
+    @staticmethod
+    def _codeer_commando(argumenten: Sequence[Union[str, bytes]]) -> bytes:
+        delen = [b"*%d\r\n" % len(argumenten)]
+        for argument in argumenten:
+            data = argument.encode() if isinstance(argument, str) else argument
+            delen.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(delen)
+
+    async def _lees_antwoord(self) -> _RespWaarde:
+        regel = await self._reader.readuntil(b"\r\n")
+        soort, inhoud = regel[:1], regel[1:-2]
+        if soort == b"+":
+            return inhoud.decode()
+        if soort == b"-":
+            raise RuntimeError(f"Fout van de cacheserver: {inhoud.decode()}")
+        if soort == b":":
+            return int(inhoud)
+        if soort == b"$":
+            lengte = int(inhoud)
+            if lengte == -1:
+                return None
+            return (await self._reader.readexactly(lengte + 2))[:-2]
+        if soort == b"*":
+            aantal = int(inhoud)
+            if aantal == -1:
+                return None
+            return [await self._lees_antwoord() for _ in range(aantal)]
+        raise RuntimeError(f"Onverwacht antwoord van de cacheserver: {regel!r}")
+
+    async def voer_uit(
+        self, *commandos: Sequence[Union[str, bytes]]
+    ) -> List[_RespWaarde]:
+        """Stuur één of meer commando's in één keer (pipelining) en lees de antwoorden.
+
+        Args:
+            *commandos (Sequence[Union[str, bytes]]): De commando's met hun argumenten
+
+        Returns:
+            List[_RespWaarde]: Een antwoord per commando
+
+        Raises:
+            ConnectionResetError: Als de verbinding door een eerder afgebroken commando
+                gesloten is
+        """
+        async with self._lock:
+            if self.kapot:
+                raise ConnectionResetError("Verbinding met de cacheserver is gesloten")
+            try:
+                self._writer.write(
+                    b"".join(self._codeer_commando(c) for c in commandos)
+                )
+                await self._writer.drain()
+                return [await self._lees_antwoord() for _ in commandos]
+            except BaseException:
+                # ook bij annulering en foutantwoorden: een ongelezen antwoord zou bij het
+                # volgende commando terechtkomen
+                self.sluit()
+                raise
+
+    def sluit(self) -> None:
+        self.kapot = True
+        self._writer.close()
+
+
+class RedisCache(CacheBackend):
+    """Cache op een server die het Redis-protocol spreekt (Redis, Valkey, KeyDB, ...).
+
+    Er is geen extra dependency nodig; de client spreekt zelf RESP2 over een TCP-verbinding.
+    Per event loop wordt één verbinding geopend, bij het eerste gebruik.
+
+    Args:
+        url (str): URL van de server, zoals "redis://:wachtwoord@localhost:6379/0".
+            Standaard is "redis://localhost:6379/0".
+        prefix (str): Voorvoegsel voor alle sleutels. Standaard is "monumenten:".
+    """
+
+    def __init__(
+        self, url: str = "redis://localhost:6379/0", prefix: str = "monumenten:"
+    ) -> None:
+        onderdelen = urlparse(url)
+        if onderdelen.scheme != "redis":
+            raise ValueError(f"Alleen redis:// URL's worden ondersteund, niet '{url}'")
+        self._url = url
+        self._host = onderdelen.hostname or "localhost"
+        self._poort = onderdelen.port or 6379
+        self._wachtwoord = unquote(onderdelen.password) if onderdelen.password else None
+        self._database = int(onderdelen.path.lstrip("/") or 0)
+        self._prefix = prefix
+        self._verbindingen: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, "asyncio.Future[_RespVerbinding]"
+        ] = weakref.WeakKeyDictionary()
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # verbindingen horen bij dit proces; een kopie maakt zelf verbinding
+        return (RedisCache, (self._url, self._prefix))
+
+    async def sluit(self) -> None:
+        """Sluit de verbinding van de huidige event loop."""
+        verbinding = self._verbindingen.pop(asyncio.get_running_loop(), None)
+        if verbinding is not None and verbinding.done() and not verbinding.exception():
+            verbinding.result().sluit()
+
+    async def _maak_verbinding(self) -> _RespVerbinding:
+        reader, writer = await asyncio.open_connection(self._host, self._poort)
+        verbinding = _RespVerbinding(reader, writer)
+        commandos: List[Sequence[str]] = []
+        if self._wachtwoord is not None:
+            commandos.append(("AUTH", self._wachtwoord))
+        if self._database:
+            commandos.append(("SELECT", str(self._database)))
+        if commandos:
+            await verbinding.voer_uit(*commandos)
+        return verbinding
+
+    async def _verbinding(self) -> _RespVerbinding:
+        loop = asyncio.get_running_loop()
+        verbinding = self._verbindingen.get(loop)
+        if verbinding is None or (
+            verbinding.done() and verbinding.exception() is not None
+        ):
+            verbinding = self._verbindingen[loop] = asyncio.ensure_future(
+                self._maak_verbinding()
+            )
+        return await asyncio.shield(verbinding)
+
+    async def _voer_uit(self, *commandos: Sequence[Union[str, bytes]]) -> List[Any]:
+        verbinding = await self._verbinding()
+        try:
+            return await verbinding.voer_uit(*commandos)
+        except BaseException:
+            if verbinding.kapot:
+                # de volgende keer opnieuw verbinden, tenzij een andere taak dat al deed
+                loop = asyncio.get_running_loop()
+                huidige = self._verbindingen.get(loop)
+                if (
+                    huidige is not None
+                    and huidige.done()
+                    and not huidige.cancelled()
+                    and huidige.exception() is None
+                    and huidige.result() is verbinding
+                ):
+                    del self._verbindingen[loop]
+            raise
+
+    def _set_commando(
+        self,
+        sleutel: str,
+        waarde: Union[str, bytes],
+        ttl: Optional[float],
+        *opties: str,
+    ) -> List[Union[str, bytes]]:
+        commando: List[Union[str, bytes]] = ["SET", self._prefix + sleutel, waarde]
+        commando.extend(opties)
+        if ttl is not None:
+            commando.extend(["PX", str(max(int(ttl * 1000), 1))])
+        return commando
+
+    async def haal_op(self, sleutel: str) -> Optional[bytes]:
+        """Haal een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+
+        Returns:
+            Optional[bytes]: De waarde, None als de sleutel ontbreekt of verlopen is
+        """
+        (waarde,) = await self._voer_uit(("GET", self._prefix + sleutel))
+        return waarde  # type: ignore[no-any-return]
+
+    async def haal_op_meerdere(self, sleutels: Sequence[str]) -> List[Optional[bytes]]:
+        """Haal meerdere waarden in één keer op.
+
+        Args:
+            sleutels (Sequence[str]): De sleutels
+
+        Returns:
+            List[Optional[bytes]]: De waarden, in dezelfde volgorde als `sleutels`
+        """
+        if not sleutels:
+            return []
+        (waarden,) = await self._voer_uit(
+            ("MGET", *(self._prefix + sleutel for sleutel in sleutels))
+        )
+        return waarden  # type: ignore[no-any-return]
+
+    async def zet(self, sleutel: str, waarde: bytes, ttl: Optional[float]) -> None:
+        """Sla een waarde op.
+
+        Args:
+            sleutel (str): De sleutel
+            waarde (bytes): De waarde
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+        await self._voer_uit(self._set_commando(sleutel, waarde, ttl))
+
+    async def zet_meerdere(
+        self, waarden: Mapping[str, bytes], ttl: Optional[float]
+    ) -> None:
+        """Sla meerdere waarden in één keer op.
+
+        Args:
+            waarden (Mapping[str, bytes]): Sleutels en waarden
+            ttl (Optional[float]): Geldigheid in seconden, None voor onbeperkt
+        """
+        if waarden:
+            await self._voer_uit(
+                *(
+                    self._set_commando(sleutel, waarde, ttl)
+                    for sleutel, waarde in waarden.items()
+                )
+            )
+
+    async def vergrendel(self, sleutel: str, token: str, ttl: float) -> bool:
+        """Probeer een slot te nemen.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): Unieke waarde van de houder, nodig om het slot vrij te geven
+            ttl (float): Na zoveel seconden vervalt het slot, ook als de houder verdwenen is
+
+        Returns:
+            bool: True als het slot genomen is
+        """
+        (antwoord,) = await self._voer_uit(
+            self._set_commando(sleutel, token, ttl, "NX")
+        )
+        return bool(antwoord == "OK")
+
+    async def ontgrendel(self, sleutel: str, token: str) -> None:
+        """Geef een slot vrij als het nog van de houder met `token` is.
+
+        Args:
+            sleutel (str): Sleutel van het slot
+            token (str): De waarde waarmee het slot genomen is
+        """
+        # niet atomair: verloopt het slot precies hiertussen, dan rekent hooguit een
+        # tweede proces dezelfde waarde uit
+        (houder,) = await self._voer_uit(("GET", self._prefix + sleutel))
+        if houder == token.encode():
+            await self._voer_uit(("DEL", self._prefix + sleutel))
+
+    async def leeg(self) -> None:
+        """Verwijder alle waarden met het voorvoegsel van deze cache."""
+        cursor = "0"
+        while True:
+            ((cursor_bytes, sleutels),) = await self._voer_uit(
+                ("SCAN", cursor, "MATCH", self._prefix + "*", "COUNT", "1000")
+            )
+            if sleutels:
+                await self._voer_uit(("DEL", *sleutels))
+            cursor = cursor_bytes.decode()
+            if cursor == "0":
+                return
+
+
+# Standaard worden alleen de beschermde gezichten gecachet, in het geheugen van het proces
+_standaard_cache = MemoryCache()
+
+# De gedeelde cache van de client die de huidige aanroep doet; None zonder gedeelde cache
+_actieve_cache: contextvars.ContextVar[Optional[CacheBackend]] = contextvars.ContextVar(
+    "monumenten_cache", default=None
+)
+
+
+@contextmanager
+def _gebruik_cache(cache: Optional[CacheBackend]) -> Iterator[None]:
+    """Gebruik `cache` voor de cachelagen binnen dit blok; None voor alleen de standaardcache."""
+    token = _actieve_cache.set(cache)
+    try:
+        yield
+    finally:
+        _actieve_cache.reset(token)
+
+
+# Caches waarvan een fout al als waarschuwing gelogd is
+_gemelde_caches: weakref.WeakSet[CacheBackend] = weakref.WeakSet()
+
+# Een cache-aanroep die mislukte, en een waarde die niet (bruikbaar) in de cache staat
+_MISLUKT = object()
+_ONTBREEKT = object()
+
+
+def _meld_cachefout(cache: CacheBackend, actie: str, fout: Exception) -> None:
+    """Log een fout van de cache; alleen de eerste fout van een cache als waarschuwing."""
+    if cache in _gemelde_caches:
+        logger.debug("Cache %s mislukt bij %s: %r", type(cache).__name__, actie, fout)
+        return
+    _gemelde_caches.add(cache)
+    logger.warning(
+        "Cache %s mislukt bij %s, de waarden worden zonder cache opgevraagd: %r",
+        type(cache).__name__,
+        actie,
+        fout,
+    )
+
+
+async def _probeer(cache: CacheBackend, actie: str, aanroep: Awaitable[Any]) -> Any:
+    """Wacht op een aanroep van de cache; geeft `_MISLUKT` als de backend faalt."""
+    try:
+        return await aanroep
+    except Exception as fout:
+        _meld_cachefout(cache, actie, fout)
+        return _MISLUKT
+
+
+def _decodeer_of_ontbreekt(cache: CacheBackend, data: Optional[bytes]) -> Any:
+    """Decodeer een cachewaarde; geeft `_ONTBREEKT` als die er niet is of onleesbaar is."""
+    if data is None:
+        return _ONTBREEKT
+    try:
+        return _decodeer(data)
+    except Exception as fout:
+        # bijvoorbeeld een waarde in een ouder formaat: behandelen als ontbrekend
+        _meld_cachefout(cache, "decoderen", fout)
+        return _ONTBREEKT
+
+
+async def _haal_op_of_bereken(
+    cache: CacheBackend,
+    sleutel: str,
+    bereken: Callable[[], Awaitable[Any]],
+    ttl: Optional[float],
+    max_wachttijd: float = 60.0,
+) -> Any:
+    """Haal een waarde uit de cache, of bereken en bewaar hem als hij ontbreekt.
+
+    Maar één aanroeper tegelijk (ook over processen heen, bij een gedeelde backend) berekent
+    een ontbrekende waarde; de anderen wachten tot die in de cache staat. Duurt dat langer dan
+    `max_wachttijd`, dan rekenen ze zelf. Faalt de cache, dan wordt de waarde berekend zonder
+    hem te bewaren; een onleesbare waarde geldt als ontbrekend.
+
+    Args:
+        cache (CacheBackend): De cache
+        sleutel (str): Sleutel van de waarde
+        bereken (Callable[[], Awaitable[Any]]): Berekent de waarde; het resultaat moet naar
+            JSON te schrijven zijn
+        ttl (Optional[float]): Geldigheid van de waarde in seconden
+        max_wachttijd (float): Maximale wachttijd op een ander, en geldigheid van het slot
+
+    Returns:
+        Any: De waarde
+    """
+    data = await _probeer(cache, "ophalen", cache.haal_op(sleutel))
+    if data is _MISLUKT:
+        return await bereken()
+    waarde = _decodeer_of_ontbreekt(cache, data)
+    if waarde is not _ONTBREEKT:
+        return waarde
+
+    token = uuid.uuid4().hex
+    slot = sleutel + ":slot"
+    start = time.monotonic()
+    wachttijd = 0.01
+    while True:
+        vergrendeld = await _probeer(
+            cache, "vergrendelen", cache.vergrendel(slot, token, max_wachttijd)
+        )
+        if vergrendeld is _MISLUKT:
+            return await bereken()
+        if vergrendeld:
+            break
+        await asyncio.sleep(wachttijd)
+        wachttijd = min(wachttijd * 2, 0.5)
+        data = await _probeer(cache, "ophalen", cache.haal_op(sleutel))
+        if data is _MISLUKT:
+            return await bereken()
+        waarde = _decodeer_of_ontbreekt(cache, data)
+        if waarde is not _ONTBREEKT:
+            return waarde
+        if time.monotonic() - start > max_wachttijd:
+            return await bereken()
+
+    try:
+        # een ander kan net klaar zijn geweest
+        data = await _probeer(cache, "ophalen", cache.haal_op(sleutel))
+        if data is _MISLUKT:
+            return await bereken()
+        waarde = _decodeer_of_ontbreekt(cache, data)
+        if waarde is not _ONTBREEKT:
+            return waarde
+        waarde = await bereken()
+        await _probeer(cache, "opslaan", cache.zet(sleutel, _codeer(waarde), ttl))
+        return waarde
+    finally:
+        await _probeer(cache, "ontgrendelen", cache.ontgrendel(slot, token))
+
+
+async def _haal_op_per_id(
+    cache: CacheBackend, namespace: str, identificaties: Sequence[str]
+) -> Dict[str, Any]:
+    """Haal de gecachete waarden van meerdere ID's in één keer op.
+
+    Args:
+        cache (CacheBackend): De cache
+        namespace (str): Voorvoegsel van de sleutels, bijvoorbeeld "bag_lv"
+        identificaties (Sequence[str]): De ID's
+
+    Returns:
+        Dict[str, Any]: De waarden van de ID's die in de cache staan; leeg als de cache faalt
+    """
+    waarden = await _probeer(
+        cache,
+        "ophalen",
+        cache.haal_op_meerdere(
+            [f"{namespace}:{identificatie}" for identificatie in identificaties]
+        ),
+    )
+    if waarden is _MISLUKT:
+        return {}
+    gevonden = {}
+    for identificatie, data in zip(identificaties, waarden):
+        waarde = _decodeer_of_ontbreekt(cache, data)
+        if waarde is not _ONTBREEKT:
+            gevonden[identificatie] = waarde
+    return gevonden
+
+
+async def _zet_per_id(
+    cache: CacheBackend, namespace: str, waarden: Mapping[str, Any], ttl: float
+) -> None:
+    """Bewaar waarden per ID in één keer.
+
+    Args:
+        cache (CacheBackend): De cache
+        namespace (str): Voorvoegsel van de sleutels, bijvoorbeeld "bag_lv"
+        waarden (Mapping[str, Any]): Waarde per ID
+        ttl (float): Geldigheid in seconden
+    """
+    await _probeer(
+        cache,
+        "opslaan",
+        cache.zet_meerdere(
+            {
+                f"{namespace}:{identificatie}": _codeer(waarde)
+                for identificatie, waarde in waarden.items()
+            },
+            ttl,
+        ),
+    )
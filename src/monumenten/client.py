@@ -2,14 +2,116 @@
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+import time
 import warnings
-from typing import Any, Dict, List, Optional, Union, cast
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import (
+    Any,
+    Awaitable,
+    Coroutine,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import aiohttp
 import numpy as np
 import pandas as pd
 
-from monumenten._processing import _query
+from monumenten._api import _cultureel_erfgoed, _kadaster
+from monumenten._api._planner import _controleer_prioriteit, _gebruik_prioriteit
+from monumenten._api._sparql import _gebruik_hedging, _Hedger, _open_verbindingen
+from monumenten._coalescing import _BatchCoalescer
+from monumenten._processing import (
+    _QUERY_BATCH_GROOTTE,
+    _get_beschermde_gezichten,
+    _KOLOMMEN_PER_STATUS,
+    STATUSSEN,
+    VerwerkingsRapport,
+    _combineer_resultaten,
+    _controleer_batch_volgorde,
+    _controleer_statussen,
+    _GeenVerblijfsobjectenError,
+    _lege_resultaten,
+    _maak_voortgangsbalk,
+    _query,
+    _sorteer_op_locatie,
+    _zoek_verblijfsobjecten_per_monument,
+)
+from monumenten._sharding import _query_in_workers
+from monumenten._verversen import (
+    _max_leeftijden,
+    _verouderde_statussen,
+    _voeg_samen,
+    _wijzigingen,
+)
+from monumenten._spatial import _controleer_spatial_backend, _GezichtLidmaatschap
+from monumenten.cache import CacheBackend, _gebruik_cache
+from monumenten.index import MonumentenIndex
+from monumenten.profiel import Profiel, _gebruik_profiel
+from monumenten.sessie import SessieInstellingen
+from monumenten.metrics import (
+    Metrics,
+    MetricsSink,
+    _gebruik_metrics,
+    _meet_stap,
+    _observeer,
+    _verhoog,
+)
+
+_T = TypeVar("_T")
+
+logger = logging.getLogger("monumenten.client")
+
+
+def _ongeldige_verblijfsobject_ids(ids: pd.Series[str]) -> pd.Series[bool]:
+    """Bepaal welke verblijfsobject ID's een ongeldig formaat hebben.
+
+    Args:
+        ids (pd.Series[str]): Verblijfsobject ID's
+
+    Returns:
+        pd.Series[bool]: True voor elk ongeldig ID
+    """
+    # verblijfsobject_id's moeten 16 cijfers lang zijn, en cijfers 5 en 6 moeten '01', '02' of '03' zijn
+    return (
+        (ids.str.len() != 16)
+        | (~ids.str.isdigit())
+        | (~ids.str.slice(4, 6).isin(["01", "02", "03"]))
+    )
+
+
+async def _binnen_deadline(werk: Awaitable[_T], einde: Optional[float]) -> _T:
+    """Wacht op `werk`, maar niet langer dan tot `einde`; daarna wordt het werk geannuleerd.
+
+    Args:
+        werk (Awaitable[_T]): Het werk
+        einde (Optional[float]): Tijdstip volgens `loop.time()`, of None voor geen limiet
+
+    Returns:
+        _T: Het resultaat van het werk
+    """
+    if einde is None:
+        return await werk
+    return await asyncio.wait_for(
+        werk, max(0.0, einde - asyncio.get_running_loop().time())
+    )
 
 
 class MonumentenClient:
@@ -18,17 +120,193 @@ class MonumentenClient:
     Args:
         session (Optional[aiohttp.ClientSession]): Optionele aiohttp.ClientSession. Indien niet opgegeven wordt
                 een nieuwe sessie aangemaakt en beheerd door de client.
+        spatial_backend (str): Backend voor de test of een verblijfsobject in een beschermd gezicht ligt:
+                "shapely" (standaard), "raster" of "geopandas" (vereist `pip install monumenten[geopandas]`).
+                "raster" berekent bij het laden per gezicht een raster en vereenvoudigde binnen- en
+                buitenvormen, zodat de meeste verblijfsobjecten zonder exacte test tegen het
+                gedetailleerde gezicht beslist zijn; sneller bij grote aantallen ID's, met dezelfde
+                uitkomst.
+        batch_wachttijd (Optional[float]): De ID's van gelijktijdige aanroepen worden gebundeld tot
+                gedeelde batches van maximaal 500 ID's, en ID's die al in een lopende batch zitten worden
+                niet opnieuw opgevraagd maar wachten op die batch. Een onvolle batch wacht maximaal
+                zoveel seconden op ID's van andere aanroepen. Een hogere waarde, zoals 0.02 in
+                `python -m monumenten.serve`, bundelt beter bij veel kleine aanvragen. Standaard is 0
+                (alleen aanroepen die tegelijk starten bundelen); None schakelt het bundelen uit.
+        metrics_sinks (Sequence[MetricsSink]): Optionele sinks die elke meting ontvangen, bijvoorbeeld
+                `monumenten.metrics.OpenTelemetrySink()`. De metingen zijn ook altijd beschikbaar via
+                `client.metrics`.
+        hedging (bool): Verstuur een dubbele SPARQL-aanvraag als een aanvraag langer duurt dan het
+                95e percentiel van de recente aanvragen naar hetzelfde endpoint; het antwoord dat het
+                eerst binnen is wordt gebruikt. Dit verkort de staart van de latentie bij trage
+                endpoints, met maximaal 5% extra aanvragen. Standaard is False.
+        cache (Optional[CacheBackend]): Gedeelde cache, zoals `monumenten.cache.RedisCache` of
+                `monumenten.cache.DiskCache`. Naast de beschermde gezichten worden dan ook de
+                BAG-koppelingen, het beschermd gezicht lidmaatschap en de resultaten van het KKG
+                en de RCE per ID gedeeld met andere processen die dezelfde cache gebruiken; die
+                resultaten zijn daardoor hooguit een dag oud. Standaard (None) worden alleen de
+                beschermde gezichten gecachet, in het geheugen van dit proces.
+        warmup (bool): Voer `warmup()` uit bij het openen van de client, zodat ook de eerste
+                aanroep snel is. Standaard is False.
+        sessie (Optional[SessieInstellingen]): Instellingen voor de sessie die de client aanmaakt,
+                zoals de grootte van de pool van verbindingen, timeouts en compressie. Standaard
+                (None) `SessieInstellingen()`. Niet toegestaan samen met `session`.
+        index (Optional[Union[str, os.PathLike[str], MonumentenIndex]]): Lokale index, of de map
+                ervan, gebouwd met `python -m monumenten.index build`. ID's die in de index staan
+                worden zonder netwerk uit de index beantwoord, met de statussen van het moment van
+                bouwen (zie `MonumentenIndex.bronnen`); alleen de overige ID's worden opgevraagd.
+        batch_volgorde (str): Volgorde waarin de ID's over de batches van 500 verdeeld worden.
+                Bij "invoer" (standaard) in de opgegeven volgorde. Bij "locatie" eerst gesorteerd op
+                gemeentecode en volgnummer, zodat een batch verblijfsobjecten uit één gemeente bevat
+                en de KKG-query een samenhangend deel van de graaf raakt in plaats van panden en
+                percelen door het hele land. Het resultaat houdt de volgorde van de invoer.
+        profiel (Optional[Union[str, os.PathLike[str]]]): Map waarin bij het sluiten van de client
+                een profiel van de run geschreven wordt: een Chrome trace met de spans van elke
+                batch, HTTP-aanvraag en verwerkingsstap per asyncio taak, en de gesamplede stacks
+                van de event loop als folded stacks, zie `monumenten.profiel`. Standaard (None) de
+                map uit de omgevingsvariabele `MONUMENTEN_PROFIEL`; zonder die variabele wordt er
+                niet geprofileerd. Het profiel is tijdens de run beschikbaar als `client.profiel`.
+
+    Raises:
+        ValueError: Als zowel `session` als `sessie` is opgegeven, als `index` geen
+            monumentenindex is of bij een onbekende `batch_volgorde`
     """
 
-    def __init__(self, session: Optional[aiohttp.ClientSession] = None) -> None:
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        spatial_backend: str = "shapely",
+        batch_wachttijd: Optional[float] = 0.0,
+        metrics_sinks: Sequence[MetricsSink] = (),
+        hedging: bool = False,
+        cache: Optional[CacheBackend] = None,
+        warmup: bool = False,
+        sessie: Optional[SessieInstellingen] = None,
+        index: Optional[Union[str, os.PathLike[str], MonumentenIndex]] = None,
+        batch_volgorde: str = "invoer",
+        profiel: Optional[Union[str, os.PathLike[str]]] = None,
+    ) -> None:
+        _controleer_spatial_backend(spatial_backend)
+        _controleer_batch_volgorde(batch_volgorde)
+        if session is not None and sessie is not None:
+            raise ValueError(
+                "sessie kan niet samen met een eigen session worden opgegeven"
+            )
         self._session = session
+        self._sessie_instellingen = sessie or SessieInstellingen()
         self._owns_session = session is None
+        self._spatial_backend = spatial_backend
+        self.metrics = Metrics(metrics_sinks)
+        # blijft over aanroepen heen bestaan, zodat herhaalde runs de ruimtelijke test overslaan
+        self._gezicht_lidmaatschap = _GezichtLidmaatschap()
+        self._batch_wachttijd = batch_wachttijd
+        # één coalescer per combinatie van statussen (en prioriteit), want een batch berekent
+        # één combinatie
+        self._coalescers: Dict[Tuple[FrozenSet[str], str], _BatchCoalescer] = {}
+        # per endpoint; de geleerde latenties blijven over aanroepen heen bestaan
+        self._hedgers: Optional[Dict[str, _Hedger]] = {} if hedging else None
+        self._cache = cache
+        self._warmup = warmup
+        if index is not None and not isinstance(index, MonumentenIndex):
+            index = MonumentenIndex.open(index)
+        self._index = index
+        self._batch_volgorde = batch_volgorde
+        self._profiel_map = profiel or os.environ.get("MONUMENTEN_PROFIEL") or None
+        self.profiel: Optional[Profiel] = None
 
     async def __aenter__(self) -> "MonumentenClient":
+        if self._profiel_map is not None:
+            self.profiel = Profiel()
+            self.profiel.start()
         if self._owns_session:
-            self._session = aiohttp.ClientSession()
+            self._session = self._sessie_instellingen._maak_sessie()
+        if self._warmup:
+            await self.warmup()
         return self
 
+    async def warmup(self) -> Dict[str, float]:
+        """Open alvast verbindingen naar de endpoints en laad de beschermde gezichten.
+
+        Zonder warm-up betaalt de eerste batch DNS, TCP en TLS naar drie hosts plus het downloaden
+        van de beschermde gezichten, wat bij kleine aanroepen direct na het starten de latentie
+        bepaalt. De stappen lopen gelijktijdig. Een mislukte stap wordt gelogd en overgeslagen;
+        de eerste aanroep probeert het dan opnieuw.
+
+        Returns:
+            Dict[str, float]: Duur in seconden per geslaagde stap: "bag_lv", "kkg" en "rce"
+                (verbindingen openen) en "beschermde_gezichten" (ophalen en index bouwen)
+
+        Raises:
+            RuntimeError: Als de client niet als context manager wordt gebruikt
+        """
+        if not self._session:
+            raise RuntimeError("Client must be used as a context manager")
+        session = self._session
+
+        async def _laad_gezichten() -> None:
+            index = await _get_beschermde_gezichten(session, self._spatial_backend)
+            self._gezicht_lidmaatschap.synchroniseer(index.versie)
+
+        async def _stap(naam: str, stap: Awaitable[None]) -> Optional[float]:
+            start = time.perf_counter()
+            try:
+                await stap
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.warning("Warm-up van %s mislukt: %s", naam, e)
+                return None
+            duur = time.perf_counter() - start
+            _observeer("monumenten_stap_duur_seconden", duur, stap=f"warmup_{naam}")
+            return duur
+
+        stappen: Dict[str, Awaitable[None]] = {
+            "bag_lv": _open_verbindingen(
+                session,
+                _kadaster._BAG_LV_ENDPOINT,
+                _kadaster._MAX_GELIJKTIJDIGE_AANVRAGEN,
+            ),
+            "kkg": _open_verbindingen(
+                session,
+                _kadaster._KKG_ENDPOINT,
+                _kadaster._MAX_GELIJKTIJDIGE_AANVRAGEN,
+            ),
+            "rce": _open_verbindingen(
+                session,
+                _cultureel_erfgoed._CULTUREEL_ERFGOED_SPARQL_ENDPOINT,
+                _cultureel_erfgoed._MAX_GELIJKTIJDIGE_AANVRAGEN,
+            ),
+            "beschermde_gezichten": _laad_gezichten(),
+        }
+        with self._gebruik_instellingen():
+            duren = await asyncio.gather(
+                *(_stap(naam, stap) for naam, stap in stappen.items())
+            )
+        resultaat = {
+            naam: duur for naam, duur in zip(stappen, duren) if duur is not None
+        }
+        logger.info(
+            "Warm-up klaar: %s",
+            ", ".join(f"{naam} {duur:.2f}s" for naam, duur in resultaat.items()),
+        )
+        return resultaat
+
+    def wachtrijen(self) -> Dict[str, Dict[str, int]]:
+        """Geef het aantal aanvragen dat per endpoint en prioriteit op een vrije plek wacht.
+
+        Moet binnen de event loop van de client worden aangeroepen. De wachtrijen worden per
+        event loop bijgehouden en gedeeld door alle clients in die loop.
+
+        Returns:
+            Dict[str, Dict[str, int]]: Per endpoint ("kadaster", "rce") het aantal wachtende
+                aanvragen per prioriteitsklasse
+        """
+        loop = asyncio.get_running_loop()
+        return {
+            planner.endpoint_naam: planner.wachtrij_lengtes()
+            for planner in (
+                _kadaster._get_planner(loop),
+                _cultureel_erfgoed._get_planner(loop),
+            )
+        }
+
     async def __aexit__(
         self,
         exc_type: Optional[type[BaseException]],
@@ -37,10 +315,107 @@ class MonumentenClient:
     ) -> None:
         if self._owns_session and self._session:
             await self._session.close()
+        if self.profiel is not None and self._profiel_map is not None:
+            self.profiel.stop()
+            trace, folded = self.profiel.schrijf(self._profiel_map)
+            logger.info("Profiel geschreven naar %s en %s", trace, folded)
+
+    async def _query_voor_index(self, ids: List[str]) -> Tuple[pd.DataFrame, str]:
+        """Vraag alle statussen op voor het bouwen van een `MonumentenIndex`.
+
+        Args:
+            ids (List[str]): Unieke, geldige verblijfsobject ID's
+
+        Returns:
+            Tuple[pd.DataFrame, str]: Het resultaat van de queries en de versie van de gezichten
+
+        Raises:
+            RuntimeError: Als de client niet als context manager wordt gebruikt
+        """
+        if not self._session:
+            raise RuntimeError("Client must be used as a context manager")
+        with self._gebruik_instellingen():
+            index = await _get_beschermde_gezichten(
+                self._session, self._spatial_backend
+            )
+            resultaten = await _query(
+                self._session,
+                ids,
+                spatial_backend=self._spatial_backend,
+                gezicht_lidmaatschap=self._gezicht_lidmaatschap,
+            )
+        return resultaten, index.versie
+
+    async def _query(
+        self,
+        verblijfsobject_ids: List[str],
+        rapport: Optional[VerwerkingsRapport] = None,
+        statussen: FrozenSet[str] = frozenset(STATUSSEN),
+        prioriteit: str = "interactief",
+        deadline: Optional[float] = None,
+    ) -> pd.DataFrame:
+        if not self._session:
+            raise RuntimeError("Client must be used as a context manager")
+        # ook hier, omdat gebundelde batches buiten de aanroep van process_from_df draaien
+        with self._gebruik_instellingen(), _gebruik_prioriteit(prioriteit):
+            return await _query(
+                self._session,
+                verblijfsobject_ids,
+                spatial_backend=self._spatial_backend,
+                gezicht_lidmaatschap=self._gezicht_lidmaatschap,
+                rapport=rapport,
+                statussen=statussen,
+                deadline=deadline,
+            )
+
+    async def _query_gebundeld(
+        self,
+        verblijfsobject_ids: List[str],
+        statussen: FrozenSet[str],
+        prioriteit: str,
+    ) -> pd.DataFrame:
+        # een gebundelde batch zonder bekende ID's is geen fout van de andere aanvragers in de
+        # batch; elke aanvrager controleert zijn eigen ID's in _process_from_df
+        try:
+            return await self._query(
+                verblijfsobject_ids, statussen=statussen, prioriteit=prioriteit
+            )
+        except _GeenVerblijfsobjectenError:
+            return _combineer_resultaten(*_lege_resultaten(0)[:3])
+
+    @contextmanager
+    def _gebruik_instellingen(self) -> Iterator[None]:
+        """Gebruik de metrics, hedging, cache en het profiel van deze client in dit blok."""
+        with (
+            _gebruik_metrics(self.metrics),
+            _gebruik_hedging(self._hedgers),
+            _gebruik_cache(self._cache),
+            _gebruik_profiel(self.profiel),
+        ):
+            yield
+
+    def _coalescer(
+        self, statussen: FrozenSet[str], prioriteit: str
+    ) -> Optional[_BatchCoalescer]:
+        if self._batch_wachttijd is None:
+            return None
+        # per prioriteit een eigen bundelaar, zodat een interactieve aanroep niet in de batch
+        # van een bulkverwerking terechtkomt en met bulkprioriteit wacht
+        sleutel = (statussen, prioriteit)
+        coalescer = self._coalescers.get(sleutel)
+        if coalescer is None:
+            coalescer = self._coalescers[sleutel] = _BatchCoalescer(
+                functools.partial(
+                    self._query_gebundeld, statussen=statussen, prioriteit=prioriteit
+                ),
+                max_batch_grootte=_QUERY_BATCH_GROOTTE,
+                max_wachttijd=self._batch_wachttijd,
+            )
+        return coalescer
 
     def _naar_referentiedata(self, row: pd.Series[bool]) -> List[Dict[str, object]]:
         statuses = []
-        if row.is_rijksmonument:
+        if getattr(row, "is_rijksmonument", False):
             statuses.append(
                 {
                     "code": "RIJ",
@@ -48,9 +423,9 @@ class MonumentenClient:
                     "bron": row.rijksmonument_bron,
                 }
             )
-        if row.is_beschermd_gezicht:
+        if getattr(row, "is_beschermd_gezicht", False):
             statuses.append({"code": "SGR", "naam": "Rijksbeschermd stadsgezicht"})
-        if row.is_gemeentelijk_monument:
+        if getattr(row, "is_gemeentelijk_monument", False):
             statuses.append({"code": "GEM", "naam": "Gemeentelijk monument"})
         return statuses
 
@@ -58,50 +433,216 @@ class MonumentenClient:
         self,
         df: pd.DataFrame,
         verblijfsobject_id_col: str,
+        on_error: Literal["raise", "isolate"] = "raise",
+        include: Optional[Sequence[str]] = None,
+        workers: Optional[int] = None,
+        prioriteit: Optional[Literal["interactief", "bulk"]] = None,
+        deadline: Optional[float] = None,
     ) -> pd.DataFrame:
         """Verwerk een DataFrame met verblijfsobject ID's.
 
         Args:
             df (pd.DataFrame): Input DataFrame met verblijfsobject ID's
             verblijfsobject_id_col (str): Naam van de kolom met de verblijfsobject ID's
+            on_error (Literal["raise", "isolate"]): Bij "raise" (standaard) breekt een mislukte batch
+                de hele verwerking af. Bij "isolate" wordt een mislukte batch gehalveerd tot de ID's
+                met de fout gevonden zijn; de overige ID's worden gewoon verwerkt. Rijen van mislukte
+                ID's ontbreken dan in het resultaat en staan in het VerwerkingsRapport in
+                `resultaat.attrs["rapport"]`.
+            include (Optional[Sequence[str]]): Te berekenen statussen: "rijksmonument", "beschermd_gezicht"
+                en/of "gemeentelijk_monument". Alleen de daarvoor benodigde bronnen worden bevraagd en
+                alleen de bijbehorende kolommen worden toegevoegd. Zonder "beschermd_gezicht" worden
+                bijvoorbeeld geen gezichten en geometrieën opgehaald. Standaard (None) alle statussen.
+            workers (Optional[int]): Verdeel de ID's, gegroepeerd op gemeentecode, over zoveel worker
+                processen, elk met een eigen event loop, sessie en deel van het maximale aantal
+                gelijktijdige aanvragen per endpoint. Bedoeld voor zeer grote aantallen ID's, waarbij
+                één proces niet genoeg rekenkracht heeft voor de verwerking. Er worden niet meer
+                workers gestart dan het maximale aantal gelijktijdige aanvragen per endpoint (4).
+                Het starten van de workers kost enkele seconden. Standaard (None) wordt alles in
+                dit proces verwerkt.
+            prioriteit (Optional[Literal["interactief", "bulk"]]): Prioriteitsklasse waarmee de
+                batches op een vrije plek bij de endpoints wachten. Interactieve aanvragen gaan voor
+                wachtende bulkaanvragen. Standaard (None) "bulk" als de ID's niet in één batch
+                passen en anders "interactief".
+            deadline (Optional[float]): Maximale duur in seconden. Daarna worden geen nieuwe batches
+                meer gestart en worden lopende batches afgebroken, zodat ze geen plekken bij de
+                endpoints bezet houden; met `workers` worden de lopende workers beëindigd. Bij
+                on_error="isolate" zonder `workers` bevat het resultaat de afgeronde batches en
+                staan de overige ID's als mislukt in het rapport; anders volgt een
+                asyncio.TimeoutError. Standaard (None) geen limiet.
 
         Returns:
-            pd.DataFrame: DataFrame met toegevoegde monumentinformatie
+            pd.DataFrame: DataFrame met toegevoegde monumentinformatie. De geldige ID's die niet
+                als BAG verblijfsobject gevonden zijn staan in `resultaat.attrs["niet_gevonden"]`.
 
         Raises:
             RuntimeError: Als de client niet als context manager wordt gebruikt
+            ValueError: Bij een onbekende waarde voor `on_error` of `prioriteit`, een onbekende status
+                in `include`, als `workers` kleiner is dan 1 of als `deadline` niet positief is,
+                en zonder on_error="isolate" als een batch geen enkel BAG verblijfsobject bevat
+            asyncio.TimeoutError: Als de deadline verstrijkt, behalve bij on_error="isolate" zonder
+                `workers`
         """
+        if on_error not in ("raise", "isolate"):
+            raise ValueError(
+                f"Onbekende waarde voor on_error '{on_error}', kies uit: raise, isolate"
+            )
+        if workers is not None and workers < 1:
+            raise ValueError(f"workers moet minimaal 1 zijn, niet {workers}")
+        if deadline is not None and deadline <= 0:
+            raise ValueError(f"deadline moet positief zijn, niet {deadline}")
+        _controleer_prioriteit(prioriteit)
+        statussen = _controleer_statussen(include)
+        einde = (
+            None if deadline is None else asyncio.get_running_loop().time() + deadline
+        )
+        with self._gebruik_instellingen():
+            return await self._process_from_df(
+                df,
+                verblijfsobject_id_col,
+                VerwerkingsRapport() if on_error == "isolate" else None,
+                statussen,
+                workers,
+                prioriteit,
+                einde,
+            )
 
+    async def _process_from_df(
+        self,
+        df: pd.DataFrame,
+        verblijfsobject_id_col: str,
+        rapport: Optional[VerwerkingsRapport],
+        statussen: FrozenSet[str],
+        workers: Optional[int] = None,
+        prioriteit: Optional[str] = None,
+        einde: Optional[float] = None,
+    ) -> pd.DataFrame:
         if not self._session:
             raise RuntimeError("Client must be used as a context manager")
 
-        # verblijfsobject_id's moeten 16 cijfers lang zijn, en cijfers 5 en 6 moeten '01', '02' of '03' zijn
         ids = df[verblijfsobject_id_col]
-        invalid_verblijf_object_ids = (
-            (ids.str.len() != 16)
-            | (~ids.str.isdigit())
-            | (~ids.str.slice(4, 6).isin(["01", "02", "03"]))
-        )
+        invalid_verblijf_object_ids = _ongeldige_verblijfsobject_ids(ids)
         if invalid_verblijf_object_ids.any():
             invalid_ids = ids[invalid_verblijf_object_ids].drop_duplicates().tolist()
             warnings.warn(
                 f"{len(invalid_ids)} onjuiste verblijfsobject ID's gevonden: {invalid_ids}"
             )
+            if rapport is not None:
+                rapport.ongeldig.extend(invalid_ids)
 
         valid_id_df = df.loc[~invalid_verblijf_object_ids]
         if valid_id_df.empty:
             raise ValueError("Geen enkel geldig verblijfsobject ID gevonden")
-        results = await _query(
-            self._session,
-            valid_id_df.loc[:, verblijfsobject_id_col].drop_duplicates().tolist(),
-        )
-        merged = pd.merge(
-            valid_id_df,
-            results,
-            left_on=verblijfsobject_id_col,
-            right_on="identificatie",
-            how="left",
+        unieke_ids = (
+            valid_id_df.loc[:, verblijfsobject_id_col].drop_duplicates().tolist()
         )
+        alle_ids = unieke_ids
+        uit_index: Optional[pd.DataFrame] = None
+        if self._index is not None:
+            uit_index, niet_gevonden, unieke_ids = self._index._zoek(unieke_ids)
+            _verhoog(
+                "monumenten_cache_totaal",
+                uit_index["identificatie"].nunique() + len(niet_gevonden),
+                cache="index",
+                resultaat="hit",
+            )
+            _verhoog(
+                "monumenten_cache_totaal",
+                len(unieke_ids),
+                cache="index",
+                resultaat="miss",
+            )
+            if rapport is not None:
+                rapport.niet_gevonden.extend(niet_gevonden)
+        if self._batch_volgorde == "locatie":
+            # de merge met de invoer hieronder herstelt de oorspronkelijke volgorde
+            unieke_ids = _sorteer_op_locatie(unieke_ids)
+        if prioriteit is None:
+            prioriteit = (
+                "bulk" if len(unieke_ids) > _QUERY_BATCH_GROOTTE else "interactief"
+            )
+        # gebundelde batches worden gedeeld met andere aanroepers en hebben dus geen eigen
+        # rapport; bij on_error="isolate" wordt niet gebundeld
+        coalescer = self._coalescer(statussen, prioriteit) if rapport is None else None
+        if uit_index is not None and not unieke_ids:
+            results = uit_index
+        elif workers is not None and workers > 1:
+            voortgang = _maak_voortgangsbalk(
+                len(unieke_ids), tonen=len(unieke_ids) > _QUERY_BATCH_GROOTTE
+            )
+            try:
+                results = await _binnen_deadline(
+                    _query_in_workers(
+                        unieke_ids,
+                        workers,
+                        self._spatial_backend,
+                        statussen,
+                        self.metrics,
+                        rapport=rapport,
+                        hedging=self._hedgers is not None,
+                        cache=self._cache,
+                        sessie=self._sessie_instellingen,
+                        prioriteit=prioriteit,
+                        bij_voortgang=voortgang.update,
+                    ),
+                    einde,
+                )
+            finally:
+                voortgang.close()
+        elif coalescer is not None:
+            voortgang = _maak_voortgangsbalk(
+                len(unieke_ids), tonen=len(unieke_ids) > _QUERY_BATCH_GROOTTE
+            )
+            try:
+                results = await _binnen_deadline(
+                    coalescer.verwerk(unieke_ids, voortgang.update), einde
+                )
+            finally:
+                voortgang.close()
+            if results.empty:
+                # net als zonder bundelen, waar _query deze fout geeft
+                raise _GeenVerblijfsobjectenError(
+                    "Geen geldige BAG verblijfsobjecten gevonden voor een batch van "
+                    "verblijfsobject ID's"
+                )
+        else:
+            results = await self._query(
+                unieke_ids,
+                rapport=rapport,
+                statussen=statussen,
+                prioriteit=prioriteit,
+                deadline=einde,
+            )
+
+        if uit_index is not None and unieke_ids and not results.empty:
+            # een leeg resultaat (alleen onbekende ID's) heeft andere kolomtypes
+            results = pd.concat([uit_index, results], ignore_index=True)
+        elif uit_index is not None:
+            results = uit_index
+
+        gevonden = set(results["identificatie"]) if not results.empty else set()
+        niet_gevonden = [
+            identificatie
+            for identificatie in alle_ids
+            if identificatie not in gevonden
+            and (rapport is None or identificatie not in rapport.mislukt)
+        ]
+        if rapport is not None and rapport.mislukt:
+            warnings.warn(
+                f"Verwerking van {len(rapport.mislukt)} verblijfsobject ID's mislukt, "
+                "zie resultaat.attrs['rapport']"
+            )
+            valid_id_df = valid_id_df[
+                ~valid_id_df[verblijfsobject_id_col].isin(list(rapport.mislukt))
+            ]
+        with _meet_stap("merge"):
+            merged = pd.merge(
+                valid_id_df,
+                results,
+                left_on=verblijfsobject_id_col,
+                right_on="identificatie",
+                how="left",
+            )
 
         if "identificatie" not in df.columns:
             merged = merged.drop(columns=["identificatie"])
@@ -171,16 +712,42 @@ class MonumentenClient:
 
         merged = merged.replace([np.nan, ""], pd.NA)
         merged = merged.replace({None: pd.NA})
+        merged = merged.drop(
+            columns=[
+                kolom
+                for status, kolommen in _KOLOMMEN_PER_STATUS.items()
+                if status not in statussen
+                for kolom in kolommen
+                if kolom not in df.columns
+            ]
+        )
+        merged.attrs["niet_gevonden"] = niet_gevonden
+        if rapport is not None:
+            merged.attrs["rapport"] = rapport
         return merged
 
     async def process_from_list(
-        self, verblijfsobject_ids: List[str], to_vera: bool = False
+        self,
+        verblijfsobject_ids: List[str],
+        to_vera: bool = False,
+        on_error: Literal["raise", "isolate"] = "raise",
+        include: Optional[Sequence[str]] = None,
+        workers: Optional[int] = None,
+        prioriteit: Optional[Literal["interactief", "bulk"]] = None,
+        deadline: Optional[float] = None,
     ) -> Union[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, Any]]]:
         """Verwerk een lijst met verblijfsobject ID's.
 
         Args:
             verblijfsobject_ids (List[str]): Lijst met te verwerken ID's
             to_vera (bool): Of de output in VERA-referentiedataformaat moet zijn. Standaard is False.
+            on_error (Literal["raise", "isolate"]): Zie `process_from_df`. Bij "isolate" ontbreken
+                mislukte ID's in het resultaat; gebruik `process_from_df` voor het volledige rapport.
+            include (Optional[Sequence[str]]): Te berekenen statussen, zie `process_from_df`
+            workers (Optional[int]): Aantal worker processen, zie `process_from_df`
+            prioriteit (Optional[Literal["interactief", "bulk"]]): Prioriteitsklasse, zie
+                `process_from_df`
+            deadline (Optional[float]): Maximale duur in seconden, zie `process_from_df`
 
         Returns:
             Union[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, Any]]]: Dictionary met verblijfsobject ID's als keys en lijst van monumentstatussen als values
@@ -189,8 +756,29 @@ class MonumentenClient:
             {"bag_verblijfsobject_id": verblijfsobject_ids}
         ).drop_duplicates()
 
-        result = await self.process_from_df(df, "bag_verblijfsobject_id")
+        result = await self.process_from_df(
+            df,
+            "bag_verblijfsobject_id",
+            on_error=on_error,
+            include=include,
+            workers=workers,
+            prioriteit=prioriteit,
+            deadline=deadline,
+        )
+        return self._naar_dict(result, to_vera)
+
+    def _naar_dict(
+        self, result: pd.DataFrame, to_vera: bool
+    ) -> Union[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, Any]]]:
+        """Zet een resultaat van `process_from_df` om naar het formaat van `process_from_list`.
+
+        Args:
+            result (pd.DataFrame): Resultaat met de ID's in de kolom bag_verblijfsobject_id
+            to_vera (bool): Of de output in VERA-referentiedataformaat moet zijn
 
+        Returns:
+            Union[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, Any]]]: Zie `process_from_list`
+        """
         result = result.replace({pd.NA: None, pd.NaT: None, np.nan: None})
 
         if "rijksmonument_bron" in result.columns:
@@ -215,3 +803,523 @@ class MonumentenClient:
             Dict[str, List[Dict[str, str]]],
             result_indexed.apply(self._naar_referentiedata, axis=1).to_dict(),
         )
+
+    async def process_from_rijksmonumentnummers(
+        self,
+        rijksmonumentnummers: Sequence[Union[int, str]],
+        verrijken: bool = False,
+        include: Optional[Sequence[str]] = None,
+        prioriteit: Optional[Literal["interactief", "bulk"]] = None,
+    ) -> pd.DataFrame:
+        """Zoek de BAG verblijfsobjecten bij een lijst rijksmonumentnummers.
+
+        Gebruikt dezelfde koppeling tussen rijksmonument en verblijfsobject als de rijksmonument
+        status, in batches van maximaal 500 nummers, met dezelfde gelijktijdigheid, prioriteit en
+        gedeelde cache als `process_from_df`.
+
+        Args:
+            rijksmonumentnummers (Sequence[Union[int, str]]): Rijksmonumentnummers
+            verrijken (bool): Bepaal ook de monumentstatussen van de gevonden verblijfsobjecten, in
+                dezelfde aanroep. Standaard is False.
+            include (Optional[Sequence[str]]): Te berekenen statussen bij `verrijken`, zie
+                `process_from_df`
+            prioriteit (Optional[Literal["interactief", "bulk"]]): Prioriteitsklasse, zie
+                `process_from_df`
+
+        Returns:
+            pd.DataFrame: Een rij per gevonden verblijfsobject, met de kolommen
+                "gevraagd_rijksmonument_nummer" en "bag_verblijfsobject_id", en bij `verrijken` de
+                kolommen van `process_from_df`. Nummers zonder verblijfsobject krijgen één rij met
+                een leeg ID. De volgorde is die van `rijksmonumentnummers`.
+
+        Raises:
+            RuntimeError: Als de client niet als context manager wordt gebruikt
+            ValueError: Bij een onbekende waarde voor `prioriteit` of een onbekende status in
+                `include`
+        """
+        if not self._session:
+            raise RuntimeError("Client must be used as a context manager")
+        _controleer_prioriteit(prioriteit)
+        statussen = _controleer_statussen(include)
+
+        nummers = list(
+            dict.fromkeys(str(nummer).strip() for nummer in rijksmonumentnummers)
+        )
+        ongeldig = [nummer for nummer in nummers if not nummer.isdigit()]
+        if ongeldig:
+            warnings.warn(
+                f"{len(ongeldig)} onjuiste rijksmonumentnummers gevonden: {ongeldig}"
+            )
+            nummers = [nummer for nummer in nummers if nummer.isdigit()]
+        if prioriteit is None:
+            prioriteit = (
+                "bulk" if len(nummers) > _QUERY_BATCH_GROOTTE else "interactief"
+            )
+
+        with self._gebruik_instellingen(), _gebruik_prioriteit(prioriteit):
+            gevonden = (
+                await _zoek_verblijfsobjecten_per_monument(self._session, nummers)
+            ).rename(
+                columns={
+                    "rijksmonument_nummer": "gevraagd_rijksmonument_nummer",
+                    "identificatie": "bag_verblijfsobject_id",
+                }
+            )
+            if verrijken and not gevonden.empty:
+                gevonden = await self._process_from_df(
+                    gevonden,
+                    "bag_verblijfsobject_id",
+                    None,
+                    statussen,
+                    prioriteit=prioriteit,
+                )
+
+        met_verblijfsobject = set(gevonden["gevraagd_rijksmonument_nummer"])
+        niet_gevonden = [
+            nummer for nummer in nummers if nummer not in met_verblijfsobject
+        ]
+        if niet_gevonden:
+            logger.info(
+                "Geen verblijfsobjecten gevonden bij %d rijksmonumentnummers",
+                len(niet_gevonden),
+            )
+            gevonden = pd.concat(
+                [
+                    gevonden,
+                    pd.DataFrame(
+                        {"gevraagd_rijksmonument_nummer": niet_gevonden},
+                        dtype="string",
+                    ),
+                ],
+                ignore_index=True,
+            )
+        volgorde = {nummer: i for i, nummer in enumerate(nummers)}
+        return gevonden.sort_values(
+            "gevraagd_rijksmonument_nummer",
+            key=lambda kolom: kolom.map(volgorde),
+            kind="stable",
+        ).reset_index(drop=True)
+
+    async def refresh_from_df(
+        self,
+        vorig: pd.DataFrame,
+        verblijfsobject_id_col: str,
+        max_leeftijd: Union[timedelta, Mapping[str, timedelta]] = timedelta(days=7),
+        gecontroleerd_op: Optional[datetime] = None,
+        on_error: Literal["raise", "isolate"] = "raise",
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Ververs een eerder resultaat van `process_from_df` of `refresh_from_df`.
+
+        Alleen statussen die langer dan `max_leeftijd` geleden gecontroleerd zijn worden opnieuw
+        opgevraagd, en alleen bij de bronnen die ervoor nodig zijn (zie `include` bij
+        `process_from_df`). Het tijdstip van controle staat per status in de kolom
+        `<status>_gecontroleerd_op`. Voor de beschermde gezichten wordt ook de versie van de
+        gezichten-dataset bijgehouden (kolom `beschermd_gezichten_versie`); is die veranderd,
+        dan worden alle beschermde gezichten opnieuw bepaald. Zo schalen de kosten van een
+        periodieke verversing met het aantal verouderde statussen in plaats van met het aantal ID's.
+
+        Args:
+            vorig (pd.DataFrame): Eerder resultaat, bijvoorbeeld ingelezen uit een opgeslagen snapshot
+            verblijfsobject_id_col (str): Naam van de kolom met de verblijfsobject ID's
+            max_leeftijd (Union[timedelta, Mapping[str, timedelta]]): Maximale leeftijd van een
+                status, voor alle statussen of per status (bijvoorbeeld
+                `{"rijksmonument": timedelta(days=30), "gemeentelijk_monument": timedelta(days=7)}`);
+                statussen die in een mapping ontbreken worden altijd ververst. Standaard 7 dagen.
+            gecontroleerd_op (Optional[datetime]): Tijdstip waarop `vorig` gemaakt is, voor statussen
+                zonder tijdstempelkolom (zoals in de uitvoer van `process_from_df`). Zonder tijdzone
+                wordt UTC aangenomen. Standaard (None) worden die statussen allemaal ververst.
+            on_error (Literal["raise", "isolate"]): Zie `process_from_df`. Bij "isolate" houden
+                mislukte ID's hun eerdere statussen en staat het rapport in `bijgewerkt.attrs["rapport"]`.
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Het bijgewerkte resultaat, met dezelfde rijen en
+                kolommen plus de tijdstempelkolommen, en de wijzigingen: één rij per toegevoegde of
+                vervallen status met de kolommen `verblijfsobject_id_col`, "status" en "wijziging"
+                ("toegevoegd" of "verwijderd")
+
+        Raises:
+            RuntimeError: Als de client niet als context manager wordt gebruikt
+            ValueError: Als `vorig` geen statuskolommen bevat, of bij een onbekende status of
+                negatieve leeftijd in `max_leeftijd`
+        """
+        if not self._session:
+            raise RuntimeError("Client must be used as a context manager")
+        statussen = [s for s in STATUSSEN if f"is_{s}" in vorig.columns]
+        if not statussen:
+            raise ValueError(
+                "Geen statuskolommen gevonden; verwacht een resultaat van process_from_df"
+            )
+        max_leeftijden = _max_leeftijden(max_leeftijd)
+        nu = pd.Timestamp.now(tz="UTC")
+
+        gezichten_versie = None
+        if "beschermd_gezicht" in statussen:
+            with self._gebruik_instellingen():
+                index = await _get_beschermde_gezichten(
+                    self._session, self._spatial_backend
+                )
+            gezichten_versie = index.versie
+
+        geldig = vorig[~_ongeldige_verblijfsobject_ids(vorig[verblijfsobject_id_col])]
+        groepen = _verouderde_statussen(
+            geldig,
+            verblijfsobject_id_col,
+            statussen,
+            max_leeftijden,
+            nu,
+            gecontroleerd_op,
+            gezichten_versie,
+        )
+        rapport = VerwerkingsRapport() if on_error == "isolate" else None
+        nieuw: Dict[FrozenSet[str], pd.DataFrame] = {}
+        for combinatie, ids in groepen.items():
+            resultaat = await self.process_from_df(
+                pd.DataFrame({verblijfsobject_id_col: ids}),
+                verblijfsobject_id_col,
+                on_error=on_error,
+                include=sorted(combinatie),
+            )
+            if rapport is not None:
+                deelrapport: VerwerkingsRapport = resultaat.attrs.pop("rapport")
+                rapport.niet_gevonden.extend(deelrapport.niet_gevonden)
+                rapport.mislukt.update(deelrapport.mislukt)
+            nieuw[combinatie] = resultaat
+        logger.info(
+            "%d van %d ID's ververst",
+            sum(len(ids) for ids in groepen.values()),
+            vorig[verblijfsobject_id_col].nunique(),
+        )
+
+        bijgewerkt = _voeg_samen(
+            vorig,
+            verblijfsobject_id_col,
+            statussen,
+            nieuw,
+            nu,
+            gecontroleerd_op,
+            gezichten_versie,
+        )
+        if rapport is not None:
+            bijgewerkt.attrs["rapport"] = rapport
+        return bijgewerkt, _wijzigingen(
+            vorig, bijgewerkt, verblijfsobject_id_col, statussen
+        )
+
+
+def _nieuwe_event_loop(use_uvloop: bool) -> asyncio.AbstractEventLoop:
+    """Maak een nieuwe event loop aan, met uvloop indien gewenst en geïnstalleerd."""
+    if use_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return cast(asyncio.AbstractEventLoop, uvloop.new_event_loop())
+    return asyncio.new_event_loop()
+
+
+class MonumentenSyncClient:
+    """Synchrone client voor gebruik vanuit niet-async code (bijv. Django views of Airflow operators).
+
+    De client start één achtergrondthread met een langlevende event loop en een
+    MonumentenClient met eigen ClientSession. Verbindingen en caches blijven daardoor
+    warm tussen aanroepen. De client is thread-safe: meerdere threads kunnen tegelijk
+    aanroepen doen, die dan gelijktijdig op dezelfde event loop worden verwerkt. `close()` breekt
+    aanroepen die dan nog lopen af; die krijgen een RuntimeError.
+
+    Args:
+        use_uvloop (bool): Gebruik uvloop voor de event loop als deze geïnstalleerd is. Standaard is True.
+        spatial_backend (str): Backend voor de beschermd-gezicht test, zie MonumentenClient. Standaard is "shapely".
+        metrics_sinks (Sequence[MetricsSink]): Optionele sinks voor de metingen, zie MonumentenClient.
+        hedging (bool): Verstuur een dubbele aanvraag bij trage endpoints, zie MonumentenClient. Standaard is False.
+        cache (Optional[CacheBackend]): Gedeelde cache, zie MonumentenClient
+        warmup (bool): Voer `warmup()` uit bij het starten van de client. Standaard is False.
+        sessie (Optional[SessieInstellingen]): Instellingen voor de sessie, zie MonumentenClient
+        batch_volgorde (str): Volgorde van de ID's over de batches, zie MonumentenClient. Standaard
+            is "invoer".
+        profiel (Optional[Union[str, os.PathLike[str]]]): Map voor een profiel van de run, dat bij
+            het sluiten van de client geschreven wordt, zie MonumentenClient
+        batch_wachttijd (Optional[float]): Wachttijd voor het bundelen van gelijktijdige aanroepen,
+            bijvoorbeeld uit meerdere threads, zie MonumentenClient. Standaard is 0; None schakelt
+            het bundelen uit.
+        index (Optional[Union[str, os.PathLike[str], MonumentenIndex]]): Lokale index, of de map
+            ervan, zie MonumentenClient
+
+    Raises:
+        ValueError: Als `index` geen monumentenindex is of bij een onbekende `batch_volgorde`
+    """
+
+    def __init__(
+        self,
+        use_uvloop: bool = True,
+        spatial_backend: str = "shapely",
+        metrics_sinks: Sequence[MetricsSink] = (),
+        hedging: bool = False,
+        cache: Optional[CacheBackend] = None,
+        warmup: bool = False,
+        sessie: Optional[SessieInstellingen] = None,
+        batch_volgorde: str = "invoer",
+        profiel: Optional[Union[str, os.PathLike[str]]] = None,
+        batch_wachttijd: Optional[float] = 0.0,
+        index: Optional[Union[str, os.PathLike[str], MonumentenIndex]] = None,
+    ) -> None:
+        # eerst de client, zodat een ongeldige optie geen event loop achterlaat
+        self._client = MonumentenClient(
+            spatial_backend=spatial_backend,
+            metrics_sinks=metrics_sinks,
+            hedging=hedging,
+            cache=cache,
+            warmup=warmup,
+            sessie=sessie,
+            batch_volgorde=batch_volgorde,
+            profiel=profiel,
+            batch_wachttijd=batch_wachttijd,
+            index=index,
+        )
+        self._loop = _nieuwe_event_loop(use_uvloop)
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="monumenten-event-loop",
+            daemon=True,
+        )
+        # de lock bewaakt `_closed`: na het sluiten wordt er niets meer naar de loop gestuurd
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._thread.start()
+        try:
+            self._run(self._client.__aenter__())
+        except BaseException:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            raise
+
+    @property
+    def metrics(self) -> Metrics:
+        """Metrics: De metingen van de onderliggende MonumentenClient."""
+        return self._client.metrics
+
+    def __enter__(self) -> "MonumentenSyncClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[Any],
+    ) -> None:
+        self.close()
+
+    def _run(self, coro: Coroutine[Any, Any, _T]) -> _T:
+        """Voer een coroutine uit op de achtergrond-event loop en wacht op het resultaat.
+
+        Raises:
+            RuntimeError: Als de client al gesloten is, tijdens de aanroep gesloten wordt of
+                vanuit zijn eigen event loop wordt aangeroepen
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError(
+                "MonumentenSyncClient kan niet vanuit zijn eigen event loop worden aangeroepen"
+            )
+        with self._lock:
+            if self._closed:
+                coro.close()
+                raise RuntimeError("MonumentenSyncClient is al gesloten")
+            future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result()
+        except concurrent.futures.CancelledError:
+            if self._closed:
+                raise RuntimeError(
+                    "MonumentenSyncClient is tijdens de aanroep gesloten"
+                ) from None
+            raise
+        except BaseException:
+            # Bijvoorbeeld een KeyboardInterrupt tijdens het wachten: stop ook het werk in de loop
+            future.cancel()
+            raise
+
+    async def _sluit(self) -> None:
+        """Breek de lopende aanroepen af, wacht tot ze gestopt zijn en sluit de client."""
+        # de lopende aanroepen en de taken die ze starten, zoals gedeelde batches; de loop is
+        # van deze client en stopt hierna
+        taken = asyncio.all_tasks() - {asyncio.current_task()}
+        for taak in taken:
+            taak.cancel()
+        await asyncio.gather(*taken, return_exceptions=True)
+        await self._client.__aexit__(None, None, None)
+
+    def close(self) -> None:
+        """Sluit de sessie en stop de achtergrond-event loop. Meerdere keren aanroepen is toegestaan.
+
+        Aanroepen die vanuit andere threads nog lopen worden afgebroken en krijgen een
+        RuntimeError.
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError(
+                "MonumentenSyncClient kan niet vanuit zijn eigen event loop worden gesloten"
+            )
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        try:
+            asyncio.run_coroutine_threadsafe(self._sluit(), self._loop).result()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def warmup(self) -> Dict[str, float]:
+        """Open alvast verbindingen en laad de beschermde gezichten (blokkerend).
+
+        Returns:
+            Dict[str, float]: Duur in seconden per geslaagde stap, zie MonumentenClient.warmup
+
+        Raises:
+            RuntimeError: Als de client al gesloten is of tijdens de aanroep gesloten wordt
+        """
+        return self._run(self._client.warmup())
+
+    def process_from_df(
+        self,
+        df: pd.DataFrame,
+        verblijfsobject_id_col: str,
+        on_error: Literal["raise", "isolate"] = "raise",
+        include: Optional[Sequence[str]] = None,
+        workers: Optional[int] = None,
+        prioriteit: Optional[Literal["interactief", "bulk"]] = None,
+        deadline: Optional[float] = None,
+    ) -> pd.DataFrame:
+        """Verwerk een DataFrame met verblijfsobject ID's (blokkerend).
+
+        Args:
+            df (pd.DataFrame): Input DataFrame met verblijfsobject ID's
+            verblijfsobject_id_col (str): Naam van de kolom met de verblijfsobject ID's
+            on_error (Literal["raise", "isolate"]): Zie MonumentenClient.process_from_df
+            include (Optional[Sequence[str]]): Zie MonumentenClient.process_from_df
+            workers (Optional[int]): Zie MonumentenClient.process_from_df
+            prioriteit (Optional[Literal["interactief", "bulk"]]): Zie MonumentenClient.process_from_df
+            deadline (Optional[float]): Zie MonumentenClient.process_from_df
+
+        Returns:
+            pd.DataFrame: DataFrame met toegevoegde monumentinformatie
+
+        Raises:
+            RuntimeError: Als de client al gesloten is of tijdens de aanroep gesloten wordt
+        """
+        return self._run(
+            self._client.process_from_df(
+                df,
+                verblijfsobject_id_col,
+                on_error=on_error,
+                include=include,
+                workers=workers,
+                prioriteit=prioriteit,
+                deadline=deadline,
+            )
+        )
+
+    def process_from_list(
+        self,
+        verblijfsobject_ids: List[str],
+        to_vera: bool = False,
+        on_error: Literal["raise", "isolate"] = "raise",
+        include: Optional[Sequence[str]] = None,
+        workers: Optional[int] = None,
+        prioriteit: Optional[Literal["interactief", "bulk"]] = None,
+        deadline: Optional[float] = None,
+    ) -> Union[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, Any]]]:
+        """Verwerk een lijst met verblijfsobject ID's (blokkerend).
+
+        Args:
+            verblijfsobject_ids (List[str]): Lijst met te verwerken ID's
+            to_vera (bool): Of de output in VERA-referentiedataformaat moet zijn. Standaard is False.
+            on_error (Literal["raise", "isolate"]): Zie MonumentenClient.process_from_df
+            include (Optional[Sequence[str]]): Zie MonumentenClient.process_from_df
+            workers (Optional[int]): Zie MonumentenClient.process_from_df
+            prioriteit (Optional[Literal["interactief", "bulk"]]): Zie MonumentenClient.process_from_df
+            deadline (Optional[float]): Zie MonumentenClient.process_from_df
+
+        Returns:
+            Union[Dict[str, List[Dict[str, str]]], Dict[str, Dict[str, Any]]]: Dictionary met verblijfsobject ID's als keys en lijst van monumentstatussen als values
+
+        Raises:
+            RuntimeError: Als de client al gesloten is of tijdens de aanroep gesloten wordt
+        """
+        return self._run(
+            self._client.process_from_list(
+                verblijfsobject_ids,
+                to_vera=to_vera,
+                on_error=on_error,
+                include=include,
+                workers=workers,
+                prioriteit=prioriteit,
+                deadline=deadline,
+            )
+        )
+
+    def process_from_rijksmonumentnummers(
+        self,
+        rijksmonumentnummers: Sequence[Union[int, str]],
+        verrijken: bool = False,
+        include: Optional[Sequence[str]] = None,
+        prioriteit: Optional[Literal["interactief", "bulk"]] = None,
+    ) -> pd.DataFrame:
+        """Zoek de BAG verblijfsobjecten bij een lijst rijksmonumentnummers (blokkerend).
+
+        Args:
+            rijksmonumentnummers (Sequence[Union[int, str]]): Rijksmonumentnummers
+            verrijken (bool): Zie MonumentenClient.process_from_rijksmonumentnummers
+            include (Optional[Sequence[str]]): Zie MonumentenClient.process_from_df
+            prioriteit (Optional[Literal["interactief", "bulk"]]): Zie MonumentenClient.process_from_df
+
+        Returns:
+            pd.DataFrame: Zie MonumentenClient.process_from_rijksmonumentnummers
+
+        Raises:
+            RuntimeError: Als de client al gesloten is of tijdens de aanroep gesloten wordt
+        """
+        return self._run(
+            self._client.process_from_rijksmonumentnummers(
+                rijksmonumentnummers,
+                verrijken=verrijken,
+                include=include,
+                prioriteit=prioriteit,
+            )
+        )
+
+    def refresh_from_df(
+        self,
+        vorig: pd.DataFrame,
+        verblijfsobject_id_col: str,
+        max_leeftijd: Union[timedelta, Mapping[str, timedelta]] = timedelta(days=7),
+        gecontroleerd_op: Optional[datetime] = None,
+        on_error: Literal["raise", "isolate"] = "raise",
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Ververs een eerder resultaat (blokkerend).
+
+        Args:
+            vorig (pd.DataFrame): Zie MonumentenClient.refresh_from_df
+            verblijfsobject_id_col (str): Naam van de kolom met de verblijfsobject ID's
+            max_leeftijd (Union[timedelta, Mapping[str, timedelta]]): Zie MonumentenClient.refresh_from_df
+            gecontroleerd_op (Optional[datetime]): Zie MonumentenClient.refresh_from_df
+            on_error (Literal["raise", "isolate"]): Zie MonumentenClient.process_from_df
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: Het bijgewerkte resultaat en de wijzigingen
+
+        Raises:
+            RuntimeError: Als de client al gesloten is of tijdens de aanroep gesloten wordt
+        """
+        return self._run(
+            self._client.refresh_from_df(
+                vorig,
+                verblijfsobject_id_col,
+                max_leeftijd=max_leeftijd,
+                gecontroleerd_op=gecontroleerd_op,
+                on_error=on_error,
+            )
+        )
@@ -0,0 +1,474 @@
+"""Lokale, memory-mapped index met de monumentstatussen van een vaste verzameling verblijfsobjecten.
+
+Voor analyses over grote aantallen verblijfsobjecten (tot alle verblijfsobjecten van Nederland)
+wordt de index één keer gebouwd uit de SPARQL endpoints. Daarna beantwoordt de client
+opvragingen uit het bestand, zonder netwerk en met een gevectoriseerde binaire zoekactie over
+de gesorteerde ID's: miljoenen opvragingen per seconde.
+
+De index is een map met één ``.npy`` bestand per kolom en ``meta.json``:
+
+- ``identificatie`` (uint64): gesorteerde verblijfsobject ID's; een ID met meerdere
+  grondslagen heeft meerdere rijen
+- ``vlaggen`` (uint8): bitveld met de statussen, de bron van het rijksmonument en of het
+  ID bij het Kadaster niet gevonden is
+- ``rijksmonument_nummer`` (uint32): 0 als er geen nummer is
+- ``beschermd_gezicht`` en ``grondslag`` (uint16): 1-gebaseerde positie in de tabellen met
+  namen en grondslagen in ``meta.json``; 0 als er geen is
+
+``meta.json`` bevat verder per kolom een sha256 controlegetal en per bron het tijdstip
+waarop de gegevens opgehaald zijn.
+
+Command line::
+
+    python -m monumenten.index build pad/naar/index --ids verblijfsobjecten.csv
+    python -m monumenten.index verify pad/naar/index
+    python -m monumenten.index load pad/naar/index 0599010000360091 0599010000486642
+
+Gebruik in de client::
+
+    async with MonumentenClient(index="pad/naar/index") as client:
+        result = await client.process_from_df(df, "bag_verblijfsobject_id")
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from monumenten.client import MonumentenClient
+
+logger = logging.getLogger("monumenten.index")
+
+_FORMAAT_VERSIE = 1
+
+_RIJKSMONUMENT = 1
+_BRON_RCE = 2
+_BRON_KADASTER = 4
+_BESCHERMD_GEZICHT = 8
+_GEMEENTELIJK_MONUMENT = 16
+_NIET_GEVONDEN = 128
+
+_KOLOMMEN: Dict[str, np.dtype[Any]] = {
+    "identificatie": np.dtype(np.uint64),
+    "vlaggen": np.dtype(np.uint8),
+    "rijksmonument_nummer": np.dtype(np.uint32),
+    "beschermd_gezicht": np.dtype(np.uint16),
+    "grondslag": np.dtype(np.uint16),
+}
+
+_BRONNEN = ("bag_lv", "kkg", "rce")
+
+
+def _controlegetal(pad: Path) -> str:
+    """Bereken de sha256 van een bestand."""
+    sha = hashlib.sha256()
+    with open(pad, "rb") as f:
+        for blok in iter(lambda: f.read(1 << 20), b""):
+            sha.update(blok)
+    return sha.hexdigest()
+
+
+def _naar_uint64(ids: Sequence[str]) -> np.ndarray[Any, np.dtype[np.uint64]]:
+    """Zet verblijfsobject ID's (16 cijfers) om naar uint64."""
+    return np.asarray(pd.Series(ids, dtype="string").astype("uint64"), dtype=np.uint64)
+
+
+class MonumentenIndex:
+    """Een geopende, memory-mapped index.
+
+    Openen met `MonumentenIndex.open(pad)`. Het openen leest alleen ``meta.json``; de kolommen
+    worden door het besturingssysteem ingelezen zodra ze nodig zijn en gedeeld tussen processen
+    die dezelfde index openen.
+
+    Args:
+        pad (Path): Map van de index
+        meta (Dict[str, Any]): Inhoud van ``meta.json``
+        kolommen (Dict[str, np.ndarray]): De memory-mapped kolommen
+    """
+
+    def __init__(
+        self,
+        pad: Path,
+        meta: Dict[str, Any],
+        kolommen: Dict[str, np.ndarray[Any, Any]],
+    ) -> None:
+        self.pad = pad
+        self._meta = meta
+        self._kolommen = kolommen
+        # index 0 betekent "geen", vandaar het lege eerste element
+        self._gezichten = np.array([None, *meta["beschermde_gezichten"]], dtype=object)
+        self._grondslagen = np.array([None, *meta["grondslagen"]], dtype=object)
+
+    @classmethod
+    def open(cls, pad: Union[str, os.PathLike[str]]) -> "MonumentenIndex":
+        """Open een index.
+
+        Args:
+            pad (Union[str, os.PathLike[str]]): Map van de index
+
+        Returns:
+            MonumentenIndex: De geopende index
+
+        Raises:
+            ValueError: Als de map geen index (van deze versie) bevat
+        """
+        pad = Path(pad)
+        try:
+            meta = json.loads((pad / "meta.json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise ValueError(f"Geen monumentenindex gevonden in {pad}") from None
+        if meta.get("formaat_versie") != _FORMAAT_VERSIE:
+            raise ValueError(
+                f"Onbekende versie {meta.get('formaat_versie')!r} van de monumentenindex in "
+                f"{pad}, verwacht {_FORMAAT_VERSIE}; bouw de index opnieuw"
+            )
+        kolommen = {
+            naam: np.load(pad / f"{naam}.npy", mmap_mode="r", allow_pickle=False)
+            for naam in _KOLOMMEN
+        }
+        return cls(pad, meta, kolommen)
+
+    def __len__(self) -> int:
+        return int(self._meta["aantal_ids"])
+
+    @property
+    def bronnen(self) -> Dict[str, datetime]:
+        """Dict[str, datetime]: Per bron (bag_lv, kkg, rce) het tijdstip waarop de gegevens zijn opgehaald."""
+        return {
+            bron: datetime.fromisoformat(tijdstip)
+            for bron, tijdstip in self._meta["bronnen"].items()
+        }
+
+    @property
+    def gezichten_versie(self) -> str:
+        """str: Versie (hash) van de gezichten-dataset waarmee de index gebouwd is."""
+        return str(self._meta["gezichten_versie"])
+
+    def verifieer(self) -> None:
+        """Controleer of de bestanden van de index compleet en onbeschadigd zijn.
+
+        Raises:
+            ValueError: Met een beschrijving van het eerste gevonden probleem
+        """
+        aantal_rijen = int(self._meta["aantal_rijen"])
+        for naam, dtype in _KOLOMMEN.items():
+            kolom = self._kolommen[naam]
+            if kolom.dtype != dtype or kolom.shape != (aantal_rijen,):
+                raise ValueError(
+                    f"Kolom {naam} heeft type {kolom.dtype} en vorm {kolom.shape}, "
+                    f"verwacht {dtype} en ({aantal_rijen},)"
+                )
+            if _controlegetal(self.pad / f"{naam}.npy") != self._meta["sha256"][naam]:
+                raise ValueError(f"Controlegetal van kolom {naam} klopt niet")
+        ids = self._kolommen["identificatie"]
+        if aantal_rijen and bool(np.any(ids[1:] < ids[:-1])):
+            raise ValueError("De ID's in de index zijn niet gesorteerd")
+        if aantal_rijen and 1 + int(np.count_nonzero(ids[1:] != ids[:-1])) != len(self):
+            raise ValueError("Het aantal unieke ID's klopt niet met meta.json")
+        for naam, tabel in (
+            ("beschermd_gezicht", self._gezichten),
+            ("grondslag", self._grondslagen),
+        ):
+            if aantal_rijen and int(self._kolommen[naam].max()) >= len(tabel):
+                raise ValueError(f"Kolom {naam} verwijst buiten de tabel in meta.json")
+
+    def _zoek(self, ids: Sequence[str]) -> Tuple[pd.DataFrame, List[str], List[str]]:
+        """Zoek verblijfsobject ID's op in de index.
+
+        Args:
+            ids (Sequence[str]): Unieke, geldige verblijfsobject ID's
+
+        Returns:
+            Tuple[pd.DataFrame, List[str], List[str]]: De gevonden rijen in het formaat van het
+                resultaat van de SPARQL queries, de ID's die het Kadaster volgens de index niet kent,
+                en de ID's die niet in de index staan
+        """
+        gezocht = _naar_uint64(ids)
+        index_ids = self._kolommen["identificatie"]
+        links = np.searchsorted(index_ids, gezocht, side="left")
+        rechts = np.searchsorted(index_ids, gezocht, side="right")
+        aantallen = rechts - links
+
+        # per gevonden ID alle rijen: links, links + 1, ..., rechts - 1
+        positie = np.repeat(np.arange(len(gezocht)), aantallen)
+        starts = np.repeat(np.cumsum(aantallen) - aantallen, aantallen)
+        rijen = np.repeat(links, aantallen) + (np.arange(len(positie)) - starts)
+
+        vlaggen = np.asarray(self._kolommen["vlaggen"][rijen])
+        gevonden = (vlaggen & _NIET_GEVONDEN) == 0
+        rijen, positie, vlaggen = rijen[gevonden], positie[gevonden], vlaggen[gevonden]
+        identificaties = np.asarray(ids, dtype=object)
+
+        nummers = np.asarray(self._kolommen["rijksmonument_nummer"][rijen])
+        rce = (vlaggen & _BRON_RCE) != 0
+        kadaster = (vlaggen & _BRON_KADASTER) != 0
+        bron = np.full(len(rijen), None, dtype=object)
+        bron[rce & kadaster] = "RCE, Kadaster"
+        bron[rce & ~kadaster] = "RCE"
+        bron[kadaster & ~rce] = "Kadaster"
+        resultaat = pd.DataFrame(
+            {
+                "identificatie": pd.array(identificaties[positie], dtype="string"),
+                "rijksmonument_nummer": pd.Series(
+                    nummers.astype(str), dtype="string"
+                ).where(nummers > 0),
+                "rijksmonument_bron": bron,
+                "beschermd_gezicht_naam": self._gezichten[
+                    np.asarray(self._kolommen["beschermd_gezicht"][rijen])
+                ],
+                "grondslag_gemeentelijk_monument": self._grondslagen[
+                    np.asarray(self._kolommen["grondslag"][rijen])
+                ],
+            }
+        )
+
+        per_id = np.zeros(len(gezocht), dtype=np.int64)
+        np.add.at(per_id, positie, 1)
+        niet_gevonden = identificaties[(aantallen > 0) & (per_id == 0)].tolist()
+        ontbrekend = identificaties[aantallen == 0].tolist()
+        return resultaat, niet_gevonden, ontbrekend
+
+
+def _schrijf_index(
+    pad: Path,
+    resultaten: pd.DataFrame,
+    niet_gevonden: Sequence[str],
+    bronnen: Dict[str, str],
+    gezichten_versie: str,
+) -> None:
+    """Schrijf de resultaten van de SPARQL queries als index naar `pad`.
+
+    De index wordt eerst in een tijdelijke map naast `pad` geschreven en pas daarna op zijn
+    plaats gezet, zodat een lezer nooit een half geschreven index ziet.
+
+    Args:
+        pad (Path): Map van de index; een bestaande index wordt vervangen
+        resultaten (pd.DataFrame): Resultaat van `_query` voor alle gevonden ID's
+        niet_gevonden (Sequence[str]): ID's die het Kadaster niet kent
+        bronnen (Dict[str, str]): Per bron het tijdstip van ophalen (ISO 8601)
+        gezichten_versie (str): Versie van de gezichten-dataset
+
+    Raises:
+        ValueError: Als een rijksmonumentnummer niet numeriek is
+    """
+    gezichten = sorted(resultaten["beschermd_gezicht_naam"].dropna().unique())
+    grondslagen = sorted(
+        resultaten["grondslag_gemeentelijk_monument"].dropna().unique()
+    )
+    bron = resultaten["rijksmonument_bron"].fillna("")
+    nummer = resultaten["rijksmonument_nummer"].fillna("0")
+    if not nummer.str.isdigit().all():
+        raise ValueError("Niet-numeriek rijksmonumentnummer gevonden")
+    vlaggen = (
+        np.where(bron != "", _RIJKSMONUMENT, 0)
+        | np.where(bron.str.contains("RCE"), _BRON_RCE, 0)
+        | np.where(bron.str.contains("Kadaster"), _BRON_KADASTER, 0)
+        | np.where(resultaten["beschermd_gezicht_naam"].notna(), _BESCHERMD_GEZICHT, 0)
+        | np.where(
+            resultaten["grondslag_gemeentelijk_monument"].notna(),
+            _GEMEENTELIJK_MONUMENT,
+            0,
+        )
+    )
+    tabel = pd.DataFrame(
+        {
+            "identificatie": _naar_uint64(resultaten["identificatie"].tolist()),
+            "vlaggen": vlaggen,
+            "rijksmonument_nummer": nummer.astype("uint32").to_numpy(),
+            "beschermd_gezicht": resultaten["beschermd_gezicht_naam"]
+            .map({naam: i + 1 for i, naam in enumerate(gezichten)})
+            .fillna(0)
+            .to_numpy(),
+            "grondslag": resultaten["grondslag_gemeentelijk_monument"]
+            .map({naam: i + 1 for i, naam in enumerate(grondslagen)})
+            .fillna(0)
+            .to_numpy(),
+        }
+    )
+    tabel = pd.concat(
+        [
+            tabel,
+            pd.DataFrame(
+                {
+                    "identificatie": _naar_uint64(list(niet_gevonden)),
+                    "vlaggen": _NIET_GEVONDEN,
+                    "rijksmonument_nummer": 0,
+                    "beschermd_gezicht": 0,
+                    "grondslag": 0,
+                }
+            ),
+        ],
+        ignore_index=True,
+    ).sort_values("identificatie", kind="stable")
+
+    pad.parent.mkdir(parents=True, exist_ok=True)
+    tijdelijk = Path(tempfile.mkdtemp(prefix=f".{pad.name}-", dir=pad.parent))
+    try:
+        sha256 = {}
+        for naam, dtype in _KOLOMMEN.items():
+            bestand = tijdelijk / f"{naam}.npy"
+            np.save(bestand, tabel[naam].to_numpy().astype(dtype), allow_pickle=False)
+            sha256[naam] = _controlegetal(bestand)
+        meta = {
+            "formaat_versie": _FORMAAT_VERSIE,
+            "aantal_rijen": len(tabel),
+            "aantal_ids": int(tabel["identificatie"].nunique()),
+            "bronnen": bronnen,
+            "gezichten_versie": gezichten_versie,
+            "beschermde_gezichten": gezichten,
+            "grondslagen": grondslagen,
+            "sha256": sha256,
+        }
+        (tijdelijk / "meta.json").write_text(
+            json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        oud = pad.with_name(f".{pad.name}-oud")
+        if pad.exists():
+            os.replace(pad, oud)
+        os.replace(tijdelijk, pad)
+        shutil.rmtree(oud, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tijdelijk, ignore_errors=True)
+        raise
+
+
+async def bouw_index(
+    pad: Union[str, os.PathLike[str]],
+    verblijfsobject_ids: Sequence[str],
+    client: Optional[MonumentenClient] = None,
+) -> MonumentenIndex:
+    """Bouw een index voor de opgegeven verblijfsobjecten uit de SPARQL endpoints.
+
+    Voor een landelijke index worden alle verblijfsobject ID's van de BAG opgegeven. ID's die
+    niet in de index staan worden door een client met deze index gewoon bij de endpoints
+    opgevraagd.
+
+    Args:
+        pad (Union[str, os.PathLike[str]]): Map voor de index; een bestaande index wordt vervangen
+        verblijfsobject_ids (Sequence[str]): De verblijfsobject ID's; ongeldige ID's worden overgeslagen
+        client (Optional[MonumentenClient]): Te gebruiken client, bijvoorbeeld met een gedeelde cache.
+            Standaard wordt een nieuwe client aangemaakt.
+
+    Returns:
+        MonumentenIndex: De gebouwde index, geopend
+
+    Raises:
+        ValueError: Als er geen enkel geldig verblijfsobject ID is
+    """
+    from monumenten.client import MonumentenClient, _ongeldige_verblijfsobject_ids
+
+    ids = pd.Series(list(dict.fromkeys(verblijfsobject_ids)), dtype="string")
+    ongeldig = _ongeldige_verblijfsobject_ids(ids)
+    if ongeldig.any():
+        warnings.warn(
+            f"{int(ongeldig.sum())} onjuiste verblijfsobject ID's overgeslagen"
+        )
+    geldig = ids[~ongeldig].tolist()
+    if not geldig:
+        raise ValueError("Geen enkel geldig verblijfsobject ID gevonden")
+
+    async def _bouw(client: MonumentenClient) -> MonumentenIndex:
+        opgehaald_op = datetime.now(timezone.utc).isoformat()
+        resultaten, gezichten_versie = await client._query_voor_index(geldig)
+        gevonden = set(resultaten["identificatie"])
+        _schrijf_index(
+            Path(pad),
+            resultaten,
+            [i for i in geldig if i not in gevonden],
+            dict.fromkeys(_BRONNEN, opgehaald_op),
+            gezichten_versie,
+        )
+        logger.info("Index met %d ID's geschreven naar %s", len(geldig), pad)
+        return MonumentenIndex.open(pad)
+
+    if client is not None:
+        return await _bouw(client)
+    async with MonumentenClient() as nieuwe_client:
+        return await _bouw(nieuwe_client)
+
+
+def _lees_ids(bestand: str, kolom: Optional[str]) -> List[str]:
+    """Lees verblijfsobject ID's uit een CSV-bestand, of één ID per regel."""
+    if kolom is None:
+        with open(bestand, encoding="utf-8") as f:
+            return [regel.strip() for regel in f if regel.strip()]
+    return pd.read_csv(bestand, dtype=str, usecols=[kolom])[kolom].dropna().tolist()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Bouw, controleer of gebruik een index vanaf de command line.
+
+    Args:
+        argv (Optional[Sequence[str]]): Command line argumenten. Standaard worden die van sys.argv gebruikt.
+
+    Returns:
+        int: Exitcode; 1 als de controle van de index mislukt
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m monumenten.index",
+        description="Memory-mapped index met monumentstatussen.",
+    )
+    commandos = parser.add_subparsers(dest="commando", required=True)
+    build = commandos.add_parser("build", help="Bouw een index uit de SPARQL endpoints")
+    build.add_argument("pad", help="Map voor de index")
+    build.add_argument(
+        "--ids",
+        required=True,
+        help="Bestand met verblijfsobject ID's: één per regel, of een CSV met --kolom",
+    )
+    build.add_argument("--kolom", help="Kolom met de ID's in een CSV-bestand")
+    verify = commandos.add_parser("verify", help="Controleer een index")
+    verify.add_argument("pad", help="Map van de index")
+    load = commandos.add_parser(
+        "load", help="Open een index, toon de versheid per bron en zoek ID's op"
+    )
+    load.add_argument("pad", help="Map van de index")
+    load.add_argument("ids", nargs="*", help="Op te zoeken verblijfsobject ID's")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.commando == "build":
+        index = asyncio.run(bouw_index(args.pad, _lees_ids(args.ids, args.kolom)))
+        print(f"{len(index)} ID's in {index.pad}")
+        return 0
+
+    index = MonumentenIndex.open(args.pad)
+    if args.commando == "verify":
+        try:
+            index.verifieer()
+        except ValueError as e:
+            print(f"Index ongeldig: {e}", file=sys.stderr)
+            return 1
+        print(f"Index in orde: {len(index)} ID's")
+        return 0
+
+    print(f"{len(index)} ID's, gezichten versie {index.gezichten_versie}")
+    for bron, tijdstip in index.bronnen.items():
+        print(f"{bron}: opgehaald op {tijdstip.isoformat()}")
+    if args.ids:
+        resultaat, niet_gevonden, ontbrekend = index._zoek(args.ids)
+        print(resultaat.to_json(orient="records", force_ascii=False))
+        for identificatie in niet_gevonden:
+            print(f"{identificatie}: niet gevonden bij het Kadaster")
+        for identificatie in ontbrekend:
+            print(f"{identificatie}: niet in de index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
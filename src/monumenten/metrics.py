@@ -0,0 +1,351 @@
+"""Metingen van de monumenten pipeline, per endpoint en per verwerkingsstap.
+
+Elke MonumentenClient houdt zijn metingen bij in `client.metrics`. Daarnaast kunnen metingen
+doorgestuurd worden naar sinks: een eigen callback, of OpenTelemetry indien geïnstalleerd.
+
+Gemeten worden:
+
+- ``monumenten_request_duur_seconden`` (histogram, per endpoint): duur van elke HTTP-aanvraag
+- ``monumenten_ontvangen_bytes_totaal`` (counter, per endpoint): ontvangen bytes
+- ``monumenten_retries_totaal`` (counter, per endpoint): opnieuw geprobeerde aanvragen
+- ``monumenten_wachttijd_seconden`` (histogram, per endpoint en prioriteit): wachttijd op een vrije plek bij het endpoint
+- ``monumenten_wachtrij_lengte`` (histogram, per endpoint en prioriteit): aantal wachtende aanvragen
+  in dezelfde prioriteitsklasse op het moment dat een aanvraag aansluit
+- ``monumenten_hedges_totaal`` (counter, per endpoint): extra aanvragen door hedging
+- ``monumenten_hedges_gewonnen_totaal`` (counter, per endpoint): hedges die eerder klaar waren dan de oorspronkelijke aanvraag
+- ``monumenten_batch_grootte`` (histogram): aantal ID's per batch
+- ``monumenten_cache_totaal`` (counter, per cache en resultaat hit/miss)
+- ``monumenten_stap_duur_seconden`` (histogram, per stap): duur van de stappen bag_lv, kkg,
+  rce_rijksmonumenten, rce_gezichten, rce_monumenten (verblijfsobjecten per
+  rijksmonumentnummer), json_parse, wkt_parse, sjoin en merge, en van de warm-up stappen
+  warmup_bag_lv, warmup_kkg, warmup_rce en warmup_beschermde_gezichten
+
+Voorbeeld::
+
+    async with MonumentenClient(metrics_sinks=[print]) as client:
+        await client.process_from_df(df, "bag_verblijfsobject_id")
+    print(client.metrics.to_prometheus())
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from monumenten.profiel import _span
+
+_SECONDEN_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_BUCKETS: Dict[str, Tuple[float, ...]] = {
+    "monumenten_batch_grootte": (1, 10, 50, 100, 250, 500),
+    "monumenten_wachtrij_lengte": (0, 1, 5, 10, 50, 100, 500, 1000),
+}
+
+_BESCHRIJVINGEN = {
+    "monumenten_request_duur_seconden": "Duur van HTTP-aanvragen per endpoint",
+    "monumenten_ontvangen_bytes_totaal": "Ontvangen bytes per endpoint",
+    "monumenten_retries_totaal": "Opnieuw geprobeerde aanvragen per endpoint",
+    "monumenten_wachttijd_seconden": "Wachttijd op een vrije plek bij het endpoint per prioriteit",
+    "monumenten_wachtrij_lengte": "Wachtende aanvragen per endpoint en prioriteit bij aansluiten",
+    "monumenten_hedges_totaal": "Extra aanvragen door hedging per endpoint",
+    "monumenten_hedges_gewonnen_totaal": "Hedges die eerder klaar waren dan de oorspronkelijke aanvraag",
+    "monumenten_batch_grootte": "Aantal verblijfsobject ID's per batch",
+    "monumenten_cache_totaal": "Cache hits en misses per cache",
+    "monumenten_stap_duur_seconden": "Duur van de verwerkingsstappen",
+}
+
+
+@dataclass(frozen=True)
+class Meting:
+    """Eén meting, zoals doorgegeven aan de sinks.
+
+    Args:
+        naam (str): Naam van de metric, bijvoorbeeld "monumenten_request_duur_seconden"
+        soort (Literal["histogram", "counter"]): Soort metric
+        waarde (float): De gemeten waarde
+        labels (Mapping[str, str]): Labels van de meting, bijvoorbeeld {"endpoint": "kkg"}
+    """
+
+    naam: str
+    soort: Literal["histogram", "counter"]
+    waarde: float
+    labels: Mapping[str, str] = field(default_factory=dict)
+
+
+MetricsSink = Callable[[Meting], None]
+"""Een sink is een callable die elke Meting ontvangt."""
+
+
+_LabelSleutel = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class _Histogram:
+    grenzen: Tuple[float, ...]
+    aantallen: List[int]
+    aantal: int = 0
+    som: float = 0.0
+
+    def observeer(self, waarde: float) -> None:
+        self.aantallen[bisect.bisect_left(self.grenzen, waarde)] += 1
+        self.aantal += 1
+        self.som += waarde
+
+
+class Metrics:
+    """Verzameling van metingen, met export naar het Prometheus tekstformaat.
+
+    Args:
+        sinks (Sequence[MetricsSink]): Sinks die elke meting ook ontvangen. Standaard geen.
+    """
+
+    def __init__(self, sinks: Sequence[MetricsSink] = ()) -> None:
+        self.sinks: List[MetricsSink] = list(sinks)
+        self._lock = threading.Lock()
+        self._histogrammen: Dict[str, Dict[_LabelSleutel, _Histogram]] = {}
+        self._counters: Dict[str, Dict[_LabelSleutel, float]] = {}
+
+    def observeer(self, naam: str, waarde: float, **labels: str) -> None:
+        """Leg een waarde vast in een histogram.
+
+        Args:
+            naam (str): Naam van de histogram
+            waarde (float): De gemeten waarde
+            **labels (str): Labels van de meting
+        """
+        sleutel = tuple(sorted(labels.items()))
+        with self._lock:
+            per_label = self._histogrammen.setdefault(naam, {})
+            histogram = per_label.get(sleutel)
+            if histogram is None:
+                grenzen = _BUCKETS.get(naam, _SECONDEN_BUCKETS)
+                histogram = per_label[sleutel] = _Histogram(
+                    grenzen, [0] * (len(grenzen) + 1)
+                )
+            histogram.observeer(waarde)
+        self._naar_sinks(Meting(naam, "histogram", waarde, labels))
+
+    def verhoog(self, naam: str, waarde: float = 1, **labels: str) -> None:
+        """Verhoog een counter.
+
+        Args:
+            naam (str): Naam van de counter
+            waarde (float): Hoeveel de counter verhoogd wordt. Standaard is 1.
+            **labels (str): Labels van de meting
+        """
+        sleutel = tuple(sorted(labels.items()))
+        with self._lock:
+            per_label = self._counters.setdefault(naam, {})
+            per_label[sleutel] = per_label.get(sleutel, 0) + waarde
+        self._naar_sinks(Meting(naam, "counter", waarde, labels))
+
+    def _naar_sinks(self, meting: Meting) -> None:
+        for sink in self.sinks:
+            sink(meting)
+
+    def counter(self, naam: str, **labels: str) -> float:
+        """Geef de huidige waarde van een counter.
+
+        Args:
+            naam (str): Naam van de counter
+            **labels (str): Labels van de counter
+
+        Returns:
+            float: De waarde, 0 als de counter nog niet bestaat
+        """
+        with self._lock:
+            return self._counters.get(naam, {}).get(tuple(sorted(labels.items())), 0)
+
+    def histogram(self, naam: str, **labels: str) -> Dict[str, float]:
+        """Geef een samenvatting van een histogram.
+
+        Args:
+            naam (str): Naam van de histogram
+            **labels (str): Labels van de histogram
+
+        Returns:
+            Dict[str, float]: Aantal metingen ("aantal"), som ("som") en gemiddelde ("gemiddelde")
+        """
+        with self._lock:
+            histogram = self._histogrammen.get(naam, {}).get(
+                tuple(sorted(labels.items()))
+            )
+            if histogram is None:
+                return {"aantal": 0, "som": 0.0, "gemiddelde": 0.0}
+            return {
+                "aantal": histogram.aantal,
+                "som": histogram.som,
+                "gemiddelde": histogram.som / histogram.aantal,
+            }
+
+    def reset(self) -> None:
+        """Verwijder alle metingen."""
+        with self._lock:
+            self._histogrammen.clear()
+            self._counters.clear()
+
+    def to_prometheus(self) -> str:
+        """Exporteer alle metingen in het Prometheus tekstformaat (versie 0.0.4).
+
+        Returns:
+            str: De metingen, klaar om te serveren op een /metrics endpoint
+        """
+        regels: List[str] = []
+        with self._lock:
+            for naam, per_label in sorted(self._counters.items()):
+                regels.append(f"# HELP {naam} {_BESCHRIJVINGEN.get(naam, naam)}")
+                regels.append(f"# TYPE {naam} counter")
+                for sleutel, waarde in sorted(per_label.items()):
+                    regels.append(f"{naam}{_labels_tekst(sleutel)} {_getal(waarde)}")
+            for naam, per_label_h in sorted(self._histogrammen.items()):
+                regels.append(f"# HELP {naam} {_BESCHRIJVINGEN.get(naam, naam)}")
+                regels.append(f"# TYPE {naam} histogram")
+                for sleutel, histogram in sorted(per_label_h.items()):
+                    cumulatief = 0
+                    for grens, aantal in zip(
+                        (*histogram.grenzen, float("inf")), histogram.aantallen
+                    ):
+                        cumulatief += aantal
+                        le = "+Inf" if grens == float("inf") else _getal(grens)
+                        regels.append(
+                            f"{naam}_bucket{_labels_tekst((*sleutel, ('le', le)))} {cumulatief}"
+                        )
+                    regels.append(
+                        f"{naam}_sum{_labels_tekst(sleutel)} {_getal(histogram.som)}"
+                    )
+                    regels.append(
+                        f"{naam}_count{_labels_tekst(sleutel)} {histogram.aantal}"
+                    )
+        return "\n".join(regels) + "\n"
+
+
+def _getal(waarde: float) -> str:
+    return repr(float(waarde)) if waarde != int(waarde) else str(int(waarde))
+
+
+def _labels_tekst(sleutel: _LabelSleutel) -> str:
+    if not sleutel:
+        return ""
+    paren = ",".join(
+        '{}="{}"'.format(
+            k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for k, v in sleutel
+    )
+    return "{" + paren + "}"
+
+
+class OpenTelemetrySink:
+    """Sink die de metingen doorgeeft aan OpenTelemetry (vereist opentelemetry-api).
+
+    Args:
+        meter (Optional[Any]): Optionele OpenTelemetry Meter. Standaard wordt de meter
+            "monumenten" van de globale MeterProvider gebruikt.
+
+    Raises:
+        ImportError: Als opentelemetry-api niet geïnstalleerd is
+    """
+
+    def __init__(self, meter: Optional[Any] = None) -> None:
+        if meter is None:
+            try:
+                from opentelemetry import metrics as otel_metrics
+            except ImportError as e:
+                raise ImportError(
+                    "OpenTelemetrySink vereist opentelemetry-api: pip install monumenten[opentelemetry]"
+                ) from e
+            meter = otel_metrics.get_meter("monumenten")
+        self._meter = meter
+        self._instrumenten: Dict[str, Any] = {}
+
+    def __call__(self, meting: Meting) -> None:
+        instrument = self._instrumenten.get(meting.naam)
+        if instrument is None:
+            beschrijving = _BESCHRIJVINGEN.get(meting.naam, "")
+            if meting.soort == "histogram":
+                instrument = self._meter.create_histogram(
+                    meting.naam, description=beschrijving
+                )
+            else:
+                instrument = self._meter.create_counter(
+                    meting.naam, description=beschrijving
+                )
+            self._instrumenten[meting.naam] = instrument
+
+        if meting.soort == "histogram":
+            instrument.record(meting.waarde, attributes=dict(meting.labels))
+        else:
+            instrument.add(meting.waarde, attributes=dict(meting.labels))
+
+
+# De metrics van de client die de huidige aanroep doet. Via een ContextVar hoeven de
+# interne functies de metrics niet als argument door te geven; taken die binnen een
+# aanroep aangemaakt worden erven de context.
+_actieve_metrics: contextvars.ContextVar[Optional[Metrics]] = contextvars.ContextVar(
+    "monumenten_metrics", default=None
+)
+
+
+def _observeer(naam: str, waarde: float, **labels: str) -> None:
+    metrics = _actieve_metrics.get()
+    if metrics is not None:
+        metrics.observeer(naam, waarde, **labels)
+
+
+def _verhoog(naam: str, waarde: float = 1, **labels: str) -> None:
+    metrics = _actieve_metrics.get()
+    if metrics is not None:
+        metrics.verhoog(naam, waarde, **labels)
+
+
+@contextmanager
+def _meet_stap(stap: str) -> Iterator[None]:
+    """Meet de duur van een verwerkingsstap in monumenten_stap_duur_seconden."""
+    start = time.perf_counter()
+    try:
+        with _span(stap, "stap"):
+            yield
+    finally:
+        _observeer(
+            "monumenten_stap_duur_seconden", time.perf_counter() - start, stap=stap
+        )
+
+
+@contextmanager
+def _gebruik_metrics(metrics: Metrics) -> Iterator[None]:
+    """Maak `metrics` de actieve metrics binnen dit blok."""
+    token = _actieve_metrics.set(metrics)
+    try:
+        yield
+    finally:
+        _actieve_metrics.reset(token)
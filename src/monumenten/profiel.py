@@ -0,0 +1,297 @@
+"""Profiel van één run van de client, om te zien waar de tijd heen gaat.
+
+Een profiel legt twee dingen vast:
+
+- spans: de wandklokduur van elke batch, elke HTTP-aanvraag, het wachten op een vrije plek bij
+  een endpoint en de stappen uit ``monumenten_stap_duur_seconden`` (json_parse, wkt_parse,
+  sjoin, merge, ...). Elke asyncio taak krijgt een eigen baan, zodat overlappende batches en
+  aanvragen naast elkaar staan.
+- samples: een achtergrondthread neemt elke `sample_interval` seconden de stack van de thread
+  met de event loop. Samples waarin de event loop in ``select`` wacht tellen als wachten op het
+  netwerk; de overige samples zijn rekenwerk.
+
+`Profiel.schrijf` schrijft een Chrome trace (``.trace.json``, te openen in
+https://ui.perfetto.dev of chrome://tracing) met de spans en een baan met het aandeel rekenwerk
+van de event loop, en de samples als folded stacks (``.folded``, voor flamegraph.pl of
+https://www.speedscope.app).
+
+Voorbeeld::
+
+    async with MonumentenClient(profiel="profielen") as client:
+        await client.process_from_df(df, "bag_verblijfsobject_id")
+    # profielen/monumenten-<tijdstip>-<pid>.trace.json en .folded
+
+Zonder argument wordt de map uit de omgevingsvariabele ``MONUMENTEN_PROFIEL`` gebruikt. Worker
+processen (``workers=``) worden niet geprofileerd.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# bij een sample dat in een van deze functies eindigt wacht de event loop op het netwerk
+_WACHTFUNCTIES = frozenset({"select", "poll", "epoll", "kqueue", "control"})
+
+# breedte van de vensters voor de baan met het aandeel rekenwerk, in seconden
+_CPU_VENSTER = 0.01
+
+
+@dataclass
+class _Span:
+    naam: str
+    categorie: str
+    start: float
+    duur: float
+    baan: int
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+class Profiel:
+    """Verzamelt spans en samples van één run.
+
+    Args:
+        sample_interval (float): Seconden tussen twee samples van de stack. Standaard is 0.005,
+            gelijk aan het interval waarop Python tussen threads wisselt.
+    """
+
+    def __init__(self, sample_interval: float = 0.005) -> None:
+        if sample_interval <= 0:
+            raise ValueError("sample_interval moet positief zijn")
+        self.sample_interval = sample_interval
+        self._begin = time.perf_counter()
+        self._spans: List[_Span] = []
+        # (tijdstip, folded stack, wacht de event loop)
+        self._samples: List[Tuple[float, str, bool]] = []
+        # baan per taak; zwakke verwijzingen, zodat een nieuwe taak met hetzelfde id() als een
+        # afgeronde taak niet in diens baan terechtkomt
+        self._taak_banen: weakref.WeakKeyDictionary[asyncio.Task[Any], int] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._thread_banen: Dict[int, int] = {}
+        self._baan_namen: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Begin met samplen van de thread die deze methode aanroept."""
+        if self._sampler is not None:
+            return
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(),),
+            name="monumenten-profiel",
+            daemon=True,
+        )
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop met samplen."""
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+
+    def _sample(self, thread_id: int) -> None:
+        while not self._stop.wait(self.sample_interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                return
+            stack, wacht = _folded_stack(frame)
+            self._samples.append((time.perf_counter(), stack, wacht))
+
+    def _baan(self) -> int:
+        """Geef het nummer van de baan van de huidige asyncio taak, of van de thread erbuiten."""
+        try:
+            taak = asyncio.current_task()
+        except RuntimeError:
+            taak = None
+        with self._lock:
+            if taak is not None:
+                baan = self._taak_banen.get(taak)
+            else:
+                baan = self._thread_banen.get(threading.get_ident())
+            if baan is None:
+                baan = len(self._baan_namen) + 1
+                if taak is not None:
+                    self._taak_banen[taak] = baan
+                    self._baan_namen[baan] = taak.get_name()
+                else:
+                    self._thread_banen[threading.get_ident()] = baan
+                    self._baan_namen[baan] = threading.current_thread().name
+        return baan
+
+    @contextmanager
+    def span(self, naam: str, categorie: str, **args: Any) -> Iterator[Dict[str, Any]]:
+        """Leg de wandklokduur van het blok vast als span.
+
+        Args:
+            naam (str): Naam van de span, bijvoorbeeld "batch" of "http kkg"
+            categorie (str): Soort span: "batch", "http", "wachten" of "stap"
+            **args (Any): Extra gegevens die bij de span getoond worden
+
+        Yields:
+            Dict[str, Any]: De extra gegevens, aan te vullen binnen het blok
+        """
+        baan = self._baan()
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self._spans.append(
+                _Span(naam, categorie, start, time.perf_counter() - start, baan, args)
+            )
+
+    def naar_chrome_trace(self) -> Dict[str, Any]:
+        """Geef het profiel in het Trace Event Format van Chrome.
+
+        Returns:
+            Dict[str, Any]: De trace, met een baan per asyncio taak en een counter "event loop"
+                met het aandeel samples waarin de event loop rekende
+        """
+        pid = os.getpid()
+        spans = sorted(self._spans, key=lambda s: (s.baan, s.start, -s.duur))
+        # een baan heet naar de taak en de buitenste span erin, bijvoorbeeld "Task-12: batch"
+        eerste_span: Dict[int, str] = {}
+        for span in spans:
+            eerste_span.setdefault(span.baan, span.naam)
+        gebeurtenissen: List[Dict[str, Any]] = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": baan,
+                "args": {"name": f"{naam}: {eerste_span.get(baan, '-')}"},
+            }
+            for baan, naam in self._baan_namen.items()
+        ]
+        for span in spans:
+            gebeurtenissen.append(
+                {
+                    "name": span.naam,
+                    "cat": span.categorie,
+                    "ph": "X",
+                    "ts": self._microseconden(span.start),
+                    "dur": span.duur * 1e6,
+                    "pid": pid,
+                    "tid": span.baan,
+                    "args": span.args,
+                }
+            )
+        vensters: Dict[int, List[int]] = {}
+        for tijdstip, _, wacht in self._samples:
+            telling = vensters.setdefault(
+                int((tijdstip - self._begin) / _CPU_VENSTER), [0, 0]
+            )
+            telling[0] += not wacht
+            telling[1] += 1
+        for venster, (rekenend, totaal) in sorted(vensters.items()):
+            gebeurtenissen.append(
+                {
+                    "name": "event loop",
+                    "ph": "C",
+                    "ts": venster * _CPU_VENSTER * 1e6,
+                    "pid": pid,
+                    "args": {"rekenwerk": rekenend / totaal},
+                }
+            )
+        return {"traceEvents": gebeurtenissen, "displayTimeUnit": "ms"}
+
+    def naar_folded(self) -> str:
+        """Geef de samples als folded stacks, één regel per unieke stack met het aantal samples.
+
+        Returns:
+            str: De folded stacks
+        """
+        aantallen = Counter(stack for _, stack, _ in self._samples)
+        return "".join(
+            f"{stack} {aantal}\n" for stack, aantal in sorted(aantallen.items())
+        )
+
+    def schrijf(self, map: Union[str, os.PathLike[str]]) -> Tuple[Path, Path]:
+        """Schrijf de Chrome trace en de folded stacks naar `map`.
+
+        Args:
+            map (Union[str, os.PathLike[str]]): Map voor de bestanden; wordt aangemaakt als die
+                nog niet bestaat
+
+        Returns:
+            Tuple[Path, Path]: Het pad van de trace en van de folded stacks
+        """
+        doel = Path(map)
+        doel.mkdir(parents=True, exist_ok=True)
+        basis = f"monumenten-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        trace = doel / f"{basis}.trace.json"
+        folded = doel / f"{basis}.folded"
+        trace.write_text(json.dumps(self.naar_chrome_trace()), encoding="utf-8")
+        folded.write_text(self.naar_folded(), encoding="utf-8")
+        return trace, folded
+
+    def _microseconden(self, tijdstip: float) -> float:
+        return (tijdstip - self._begin) * 1e6
+
+
+def _folded_stack(frame: FrameType) -> Tuple[str, bool]:
+    """Geef de stack van `frame` als folded stack, en of de event loop op het netwerk wacht.
+
+    Args:
+        frame (FrameType): Het binnenste frame
+
+    Returns:
+        Tuple[str, bool]: De frames van buiten naar binnen, gescheiden door ";", en of het
+            binnenste frame een van de `_WACHTFUNCTIES` in selectors.py is
+    """
+    wacht = (
+        frame.f_code.co_name in _WACHTFUNCTIES
+        and os.path.basename(frame.f_code.co_filename) == "selectors.py"
+    )
+    frames: List[str] = []
+    huidig: Optional[FrameType] = frame
+    while huidig is not None:
+        code = huidig.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        huidig = huidig.f_back
+    return ";".join(reversed(frames)), wacht
+
+
+# Het profiel van de client die de huidige aanroep doet, net als `_actieve_metrics`.
+_actief_profiel: contextvars.ContextVar[Optional[Profiel]] = contextvars.ContextVar(
+    "monumenten_profiel", default=None
+)
+
+
+@contextmanager
+def _span(naam: str, categorie: str, **args: Any) -> Iterator[Dict[str, Any]]:
+    """Leg het blok vast als span in het actieve profiel, als er een is."""
+    profiel = _actief_profiel.get()
+    if profiel is None:
+        yield args
+        return
+    with profiel.span(naam, categorie, **args) as span_args:
+        yield span_args
+
+
+@contextmanager
+def _gebruik_profiel(profiel: Optional[Profiel]) -> Iterator[None]:
+    """Maak `profiel` het actieve profiel binnen dit blok."""
+    token = _actief_profiel.set(profiel)
+    try:
+        yield
+    finally:
+        _actief_profiel.reset(token)
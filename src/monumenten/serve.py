@@ -0,0 +1,187 @@
+"""Lokale HTTP-service voor het opvragen van monumentstatussen.
+
+Starten met::
+
+    python -m monumenten.serve --port 8080 --batch-wachttijd 20
+
+Gelijktijdige aanvragen worden gebundeld tot gedeelde batches van maximaal 500 ID's,
+zodat ook veel kleine aanvragen van één of enkele ID's efficiënt verwerkt worden.
+
+Endpoints:
+
+- ``GET /monumenten/{verblijfsobject_id}``: status van één verblijfsobject, of 404 als het niet
+  in de BAG staat
+- ``POST /monumenten`` met body ``{"verblijfsobject_ids": [...]}``: status van meerdere
+  verblijfsobjecten, met ``null`` voor ID's die niet in de BAG staan
+- ``GET /health``: controle of de service draait
+
+Met de query parameter ``vera=true`` wordt het resultaat in VERA-referentiedataformaat teruggegeven.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import pandas as pd
+from aiohttp import web
+
+from monumenten._processing import _GeenVerblijfsobjectenError
+from monumenten.client import MonumentenClient, _ongeldige_verblijfsobject_ids
+
+_CLIENT_KEY = web.AppKey("client", MonumentenClient)
+_MAX_IDS_KEY = web.AppKey("max_ids", int)
+
+
+def _is_vera(request: web.Request) -> bool:
+    return request.query.get("vera", "false").lower() in ("1", "true", "ja")
+
+
+async def _zoek_op(request: web.Request, verblijfsobject_ids: List[str]) -> Any:
+    """Valideer de ID's en zoek de statussen op via de gedeelde client.
+
+    Args:
+        request (web.Request): De HTTP-aanvraag
+        verblijfsobject_ids (List[str]): De gevraagde verblijfsobject ID's
+
+    Returns:
+        Any: Het resultaat van MonumentenClient.process_from_list, met None voor ID's die niet
+            in de BAG staan
+
+    Raises:
+        web.HTTPBadRequest: Bij ongeldige of te veel ID's
+    """
+    if not verblijfsobject_ids:
+        raise web.HTTPBadRequest(text="Geen verblijfsobject ID's opgegeven")
+    if len(verblijfsobject_ids) > request.app[_MAX_IDS_KEY]:
+        raise web.HTTPBadRequest(
+            text=f"Maximaal {request.app[_MAX_IDS_KEY]} verblijfsobject ID's per aanvraag"
+        )
+
+    ids = pd.Series(verblijfsobject_ids, dtype="string")
+    ongeldig = _ongeldige_verblijfsobject_ids(ids)
+    if ongeldig.any():
+        raise web.HTTPBadRequest(
+            text=f"Onjuiste verblijfsobject ID's: {ids[ongeldig].drop_duplicates().tolist()}"
+        )
+
+    client = request.app[_CLIENT_KEY]
+    try:
+        resultaat = await client.process_from_df(
+            pd.DataFrame(
+                {"bag_verblijfsobject_id": verblijfsobject_ids}
+            ).drop_duplicates(),
+            "bag_verblijfsobject_id",
+        )
+    except _GeenVerblijfsobjectenError:
+        return dict.fromkeys(verblijfsobject_ids)
+    statussen: Dict[str, Any] = client._naar_dict(resultaat, _is_vera(request))
+    for identificatie in resultaat.attrs["niet_gevonden"]:
+        statussen[identificatie] = None
+    return statussen
+
+
+async def _monument(request: web.Request) -> web.Response:
+    verblijfsobject_id = request.match_info["verblijfsobject_id"]
+    resultaat = await _zoek_op(request, [verblijfsobject_id])
+    if resultaat[verblijfsobject_id] is None:
+        raise web.HTTPNotFound(
+            text=f"Verblijfsobject {verblijfsobject_id} niet gevonden in de BAG"
+        )
+    return web.json_response(resultaat[verblijfsobject_id])
+
+
+async def _monumenten(request: web.Request) -> web.Response:
+    try:
+        body = await request.json()
+    except ValueError as e:
+        raise web.HTTPBadRequest(text="Body is geen geldige JSON") from e
+
+    verblijfsobject_ids = (
+        body.get("verblijfsobject_ids") if isinstance(body, dict) else None
+    )
+    if not isinstance(verblijfsobject_ids, list) or not all(
+        isinstance(verblijfsobject_id, str)
+        for verblijfsobject_id in verblijfsobject_ids
+    ):
+        raise web.HTTPBadRequest(
+            text='Verwacht een body als {"verblijfsobject_ids": ["0599010000360091", ...]}'
+        )
+    return web.json_response(await _zoek_op(request, verblijfsobject_ids))
+
+
+async def _health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+def maak_app(
+    batch_wachttijd: float = 0.02,
+    max_ids: int = 10_000,
+    client: Optional[MonumentenClient] = None,
+) -> web.Application:
+    """Maak de aiohttp applicatie van de service aan.
+
+    Args:
+        batch_wachttijd (float): Maximale tijd in seconden dat een onvolle batch wacht op ID's van
+            andere aanvragen. Standaard is 0.02 (20 ms).
+        max_ids (int): Maximaal aantal ID's per aanvraag. Standaard is 10.000.
+        client (Optional[MonumentenClient]): Optionele eigen client. Indien niet opgegeven wordt een
+            client met `batch_wachttijd` aangemaakt, die bij het starten een warm-up uitvoert.
+
+    Returns:
+        web.Application: De applicatie, klaar voor `web.run_app`
+    """
+    app = web.Application()
+    app[_MAX_IDS_KEY] = max_ids
+
+    async def _client_context(app: web.Application) -> AsyncIterator[None]:
+        async with client or MonumentenClient(
+            batch_wachttijd=batch_wachttijd, warmup=True
+        ) as actieve_client:
+            app[_CLIENT_KEY] = actieve_client
+            yield
+
+    app.cleanup_ctx.append(_client_context)
+    app.router.add_get("/monumenten/{verblijfsobject_id}", _monument)
+    app.router.add_post("/monumenten", _monumenten)
+    app.router.add_get("/health", _health)
+    return app
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Start de service vanaf de command line.
+
+    Args:
+        argv (Optional[Sequence[str]]): Command line argumenten. Standaard worden die van sys.argv gebruikt.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m monumenten.serve",
+        description="Lokale HTTP-service voor het opvragen van monumentstatussen.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Standaard 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080, help="Standaard 8080")
+    parser.add_argument(
+        "--batch-wachttijd",
+        type=float,
+        default=20,
+        help="Maximale wachttijd in milliseconden voor het vullen van een batch. Standaard 20.",
+    )
+    parser.add_argument(
+        "--max-ids",
+        type=int,
+        default=10_000,
+        help="Maximaal aantal ID's per aanvraag. Standaard 10000.",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(
+        maak_app(batch_wachttijd=args.batch_wachttijd / 1000, max_ids=args.max_ids),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Instellingen voor de aiohttp.ClientSession die de client zelf aanmaakt.
+
+Zonder instellingen gebruikt de client een pool van verbindingen per host die past bij het
+maximale aantal gelijktijdige aanvragen, een DNS-cache, keep-alive en vraagt hij om
+gecomprimeerde responses. SPARQL JSON met WKT-polygonen wordt met gzip ongeveer tien keer
+kleiner. Brotli ("br") wordt alleen aangeboden als aiohttp het kan decoderen, dus als
+`brotli` of `brotlicffi` geïnstalleerd is (`pip install monumenten[brotli]`).
+
+Voorbeeld:
+    >>> from monumenten import MonumentenClient
+    >>> from monumenten.sessie import SessieInstellingen
+    >>> client = MonumentenClient(sessie=SessieInstellingen(lees_timeout=300))
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Mapping, Optional
+
+import aiohttp
+
+from monumenten._api import _cultureel_erfgoed, _kadaster
+
+
+def _accept_encoding() -> str:
+    """Geef de compressies die aiohttp kan decoderen, voor de Accept-Encoding header."""
+    if any(importlib.util.find_spec(naam) for naam in ("brotlicffi", "brotli")):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+
+@dataclass(frozen=True)
+class SessieInstellingen:
+    """Instellingen van de aiohttp.ClientSession die de client aanmaakt.
+
+    Worden genegeerd als de client een eigen sessie meekrijgt.
+
+    Args:
+        limiet_per_host (Optional[int]): Maximaal aantal open verbindingen per host. Standaard
+            (None) twee keer het maximale aantal gelijktijdige aanvragen per endpoint, zodat
+            dubbele aanvragen van hedging niet op een vrije verbinding hoeven te wachten.
+        limiet (int): Maximaal aantal open verbindingen in totaal. Standaard is 100.
+        dns_cache_ttl (Optional[int]): Seconden dat DNS-antwoorden gecachet worden; None cachet
+            voor altijd. Standaard is 300.
+        keepalive_timeout (float): Seconden dat een ongebruikte verbinding open blijft. Standaard
+            is 30, ruim langer dan de tijd tussen batches.
+        totale_timeout (Optional[float]): Maximale duur van één aanvraag in seconden, inclusief
+            wachten op een verbinding; None voor geen limiet. Standaard is 300.
+        verbind_timeout (Optional[float]): Maximale duur van het opzetten van een verbinding in
+            seconden. Standaard is 10.
+        lees_timeout (Optional[float]): Maximale tijd in seconden tussen twee stukken van een
+            response. Standaard is 120, want een endpoint kan lang over een query doen voordat
+            het eerste byte komt.
+        compressie (bool): Vraag om gecomprimeerde responses. Standaard is True.
+        headers (Mapping[str, str]): Extra headers voor elke aanvraag
+    """
+
+    limiet_per_host: Optional[int] = None
+    limiet: int = 100
+    dns_cache_ttl: Optional[int] = 300
+    keepalive_timeout: float = 30.0
+    totale_timeout: Optional[float] = 300.0
+    verbind_timeout: Optional[float] = 10.0
+    lees_timeout: Optional[float] = 120.0
+    compressie: bool = True
+    headers: Mapping[str, str] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.limiet_per_host is not None and self.limiet_per_host < 1:
+            raise ValueError("limiet_per_host moet minimaal 1 zijn")
+        if self.limiet < 0:
+            raise ValueError("limiet mag niet negatief zijn (0 is geen limiet)")
+
+    def _maak_sessie(self) -> aiohttp.ClientSession:
+        """Maak een ClientSession met deze instellingen.
+
+        Moet binnen een draaiende event loop worden aangeroepen. De standaard limiet per host
+        wordt hier bepaald, zodat een worker proces zijn eigen aandeel in het aantal
+        gelijktijdige aanvragen gebruikt.
+
+        Returns:
+            aiohttp.ClientSession: De nieuwe sessie; de aanroeper sluit hem
+        """
+        limiet_per_host = self.limiet_per_host or 2 * max(
+            _kadaster._MAX_GELIJKTIJDIGE_AANVRAGEN,
+            _cultureel_erfgoed._MAX_GELIJKTIJDIGE_AANVRAGEN,
+        )
+        connector = aiohttp.TCPConnector(
+            limit=self.limiet,
+            limit_per_host=limiet_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        headers = dict(self.headers)
+        if self.compressie:
+            headers.setdefault("Accept-Encoding", _accept_encoding())
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=self.totale_timeout,
+                sock_connect=self.verbind_timeout,
+                sock_read=self.lees_timeout,
+            ),
+            headers=headers,
+            # zonder compressie ook de Accept-Encoding die aiohttp zelf toevoegt weglaten
+            skip_auto_headers=() if self.compressie else ("Accept-Encoding",),
+        )
@@ -0,0 +1,128 @@
+"""Minimale stand-in voor een Redis-server, voor het offline testen van `RedisCache`.
+
+Spreekt RESP2 en kent alleen de commando's die `RedisCache` gebruikt: PING, AUTH, SELECT,
+GET, MGET, SET (met NX en PX), DEL en SCAN.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fnmatch
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+class RedisStandin:
+    """Redis stand-in op een willekeurige vrije poort van localhost.
+
+    Args:
+        wachtwoord (Optional[str]): Indien opgegeven moet een client eerst AUTH sturen
+        vertraging (float): Seconden tussen het ontvangen van een commando en het antwoord
+    """
+
+    def __init__(
+        self, wachtwoord: Optional[str] = None, vertraging: float = 0.0
+    ) -> None:
+        self.wachtwoord = wachtwoord
+        self.vertraging = vertraging
+        self.data: Dict[bytes, Tuple[float, bytes]] = {}
+        self.commandos: List[str] = []
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        poort = self._server.sockets[0].getsockname()[1]
+        auth = f":{self.wachtwoord}@" if self.wachtwoord else ""
+        return f"redis://{auth}127.0.0.1:{poort}/1"
+
+    async def __aenter__(self) -> "RedisStandin":
+        self._server = await asyncio.start_server(self._verbinding, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        assert self._server is not None
+        self._server.close()
+        for writer in self._writers:
+            writer.close()
+        await self._server.wait_closed()
+
+    def _haal_op(self, sleutel: bytes) -> Optional[bytes]:
+        item = self.data.get(sleutel)
+        if item is None or item[0] < time.monotonic():
+            self.data.pop(sleutel, None)
+            return None
+        return item[1]
+
+    @staticmethod
+    def _codeer(waarde: Any) -> bytes:
+        if waarde is None:
+            return b"$-1\r\n"
+        if isinstance(waarde, int):
+            return b":%d\r\n" % waarde
+        if isinstance(waarde, str):
+            return f"+{waarde}\r\n".encode()
+        if isinstance(waarde, bytes):
+            return b"$%d\r\n%s\r\n" % (len(waarde), waarde)
+        return b"*%d\r\n" % len(waarde) + b"".join(
+            RedisStandin._codeer(w) for w in waarde
+        )
+
+    def _voer_uit(self, argumenten: List[bytes], ingelogd: bool) -> Any:
+        commando = argumenten[0].decode().upper()
+        self.commandos.append(commando)
+        if commando == "AUTH":
+            return "OK" if argumenten[1].decode() == self.wachtwoord else None
+        if not ingelogd:
+            raise PermissionError("NOAUTH Authentication required.")
+        if commando in ("PING", "SELECT"):
+            return "OK"
+        if commando == "GET":
+            return self._haal_op(argumenten[1])
+        if commando == "MGET":
+            return [self._haal_op(sleutel) for sleutel in argumenten[1:]]
+        if commando == "DEL":
+            return sum(self.data.pop(s, None) is not None for s in argumenten[1:])
+        if commando == "SET":
+            opties = [a.decode().upper() for a in argumenten[3:]]
+            if "NX" in opties and self._haal_op(argumenten[1]) is not None:
+                return None
+            verloopt = float("inf")
+            if "PX" in opties:
+                verloopt = time.monotonic() + int(opties[opties.index("PX") + 1]) / 1000
+            self.data[argumenten[1]] = (verloopt, argumenten[2])
+            return "OK"
+        if commando == "SCAN":
+            patroon = argumenten[argumenten.index(b"MATCH") + 1].decode()
+            sleutels = [s for s in self.data if fnmatch.fnmatch(s.decode(), patroon)]
+            return [b"0", sleutels]
+        raise ValueError(f"ERR unknown command '{commando}'")
+
+    async def _verbinding(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        ingelogd = self.wachtwoord is None
+        self._writers.add(writer)
+        try:
+            while True:
+                regel = await reader.readuntil(b"\r\n")
+                argumenten = []
+                for _ in range(int(regel[1:-2])):
+                    lengte = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    argumenten.append((await reader.readexactly(lengte + 2))[:-2])
+                if self.vertraging > 0:
+                    await asyncio.sleep(self.vertraging)
+                try:
+                    antwoord = self._voer_uit(argumenten, ingelogd)
+                    if argumenten[0].upper() == b"AUTH" and antwoord == "OK":
+                        ingelogd = True
+                    writer.write(self._codeer(antwoord))
+                except (PermissionError, ValueError) as e:
+                    writer.write(f"-{e}\r\n".encode())
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
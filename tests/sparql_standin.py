@@ -0,0 +1,487 @@
+"""Lokale stand-in voor de SPARQL endpoints van het Kadaster (BAG LV en KKG) en de RCE.
+
+De stand-in beantwoordt de queries van de package met opgenomen of synthetische data,
+met instelbare latentie, jitter, foutpercentage en responsegrootte. Hiermee kunnen tests
+en benchmarks (zie `benchmarks/`) reproduceerbaar en zonder netwerk draaien.
+
+Gebruik in een test::
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                ...
+
+Of als losse server::
+
+    python tests/sparql_standin.py --port 8765 --latentie 0.05 --jitter 0.02
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import quote
+
+from aiohttp import web
+
+import monumenten._api._cultureel_erfgoed as _cultureel_erfgoed
+import monumenten._api._kadaster as _kadaster
+import monumenten._processing as _processing
+import monumenten.cache as cache
+
+_NUMMERAANDUIDING_PREFIX = (
+    "https://bag.basisregistraties.overheid.nl/bag/id/nummeraanduiding/"
+)
+_WKT_DATATYPE = "http://www.opengis.net/ont/geosparql#wktLiteral"
+
+_VALUES_PATROON = r"VALUES \?{variabele} \{{(.*?)\}}"
+
+
+def _values(query: str, variabele: str) -> List[str]:
+    """Haal de waarden uit het `VALUES ?variabele { ... }` blok van een query."""
+    match = re.search(_VALUES_PATROON.format(variabele=variabele), query, re.S)
+    if match is None:
+        return []
+    return [
+        literal or uri
+        for literal, uri in re.findall(r'"([^"]*)"|<([^>]*)>', match.group(1))
+    ]
+
+
+def synthetische_ids(aantal: int, gemeentecode: str = "0599") -> List[str]:
+    """Maak `aantal` geldige, unieke verblijfsobject ID's.
+
+    Args:
+        aantal (int): Aantal ID's
+        gemeentecode (str): Gemeentecode waarmee de ID's beginnen
+
+    Returns:
+        List[str]: De ID's
+    """
+    return [f"{gemeentecode}01{i:010d}" for i in range(aantal)]
+
+
+@dataclass
+class StandinData:
+    """De data waarmee de stand-in antwoordt.
+
+    Bij synthetische data worden de verblijfsobjecten deterministisch afgeleid van het ID, zodat
+    ook miljoenen ID's geen geheugen kosten. Opgenomen data staat in `verblijfsobjecten` en
+    `rijksmonumenten` en gaat voor op de synthetische data.
+
+    Args:
+        verblijfsobjecten (Dict[str, Dict[str, Any]]): Per ID de velden verblijfsobjectWKT,
+            grondslagcode en grondslag_gemeentelijk_monument, of verblijfsobjectWKT en beperkingen:
+            een lijst van [grondslagcode, grondslag] paren voor een adres met meerdere beperkingen
+        rijksmonumenten (Dict[str, str]): Per ID het rijksmonumentnummer
+        beschermde_gezichten (List[Dict[str, str]]): Gezichten met beschermd_gezicht_naam en gezichtWKT
+        synthetisch_aanvullen (bool): Of onbekende ID's synthetisch aangevuld worden
+    """
+
+    verblijfsobjecten: Dict[str, Dict[str, Any]]
+    rijksmonumenten: Dict[str, str]
+    beschermde_gezichten: List[Dict[str, str]]
+    synthetisch_aanvullen: bool = False
+
+    @classmethod
+    def synthetisch(cls) -> "StandinData":
+        """Synthetische data: 2% onbekende ID's, ~10% rijksmonumenten, ~5% gemeentelijke monumenten.
+
+        Returns:
+            StandinData: De synthetische data
+        """
+        return cls(
+            verblijfsobjecten={},
+            rijksmonumenten={},
+            beschermde_gezichten=[
+                {
+                    "beschermd_gezicht_naam": f"Gezicht {i}",
+                    "gezichtWKT": f"POLYGON (({x} {y}, {x + 2000} {y}, {x + 2000} {y + 2000}, {x} {y + 2000}, {x} {y}))",
+                }
+                for i, (x, y) in enumerate(
+                    [(90000, 435000), (95000, 440000), (91000, 436000)]
+                )
+            ],
+            synthetisch_aanvullen=True,
+        )
+
+    @classmethod
+    def laad(cls, pad: str) -> "StandinData":
+        """Laad opgenomen data uit een JSON-bestand, zoals geschreven door `neem_op`.
+
+        Args:
+            pad (str): Pad naar het JSON-bestand
+
+        Returns:
+            StandinData: De opgenomen data
+        """
+        with open(pad, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            verblijfsobjecten=data["verblijfsobjecten"],
+            rijksmonumenten=data["rijksmonumenten"],
+            beschermde_gezichten=data["beschermde_gezichten"],
+        )
+
+    def verblijfsobject(self, identificatie: str) -> Optional[Dict[str, Any]]:
+        if identificatie in self.verblijfsobjecten:
+            return self.verblijfsobjecten[identificatie]
+        if not self.synthetisch_aanvullen:
+            return None
+        h = zlib.crc32(identificatie.encode())
+        if h % 50 == 0:
+            return None  # niet in de BAG
+        grondslagcode = {1: "EWE", 2: "GG", 3: "GWA"}.get(h % 20)
+        return {
+            "verblijfsobjectWKT": f"POINT ({90000 + h % 10000} {435000 + (h // 10000) % 10000})",
+            "grondslagcode": grondslagcode,
+            "grondslag_gemeentelijk_monument": "Gemeentewet"
+            if grondslagcode in ("GG", "GWA")
+            else None,
+        }
+
+    def rijksmonument(self, identificatie: str) -> Optional[str]:
+        if identificatie in self.rijksmonumenten:
+            return self.rijksmonumenten[identificatie]
+        if not self.synthetisch_aanvullen:
+            return None
+        h = zlib.crc32(identificatie.encode())
+        return str(100000 + h % 900000) if h % 50 and h % 20 in (1, 4) else None
+
+
+async def neem_op(identificaties: List[str], pad: str) -> None:
+    """Neem de antwoorden van de echte endpoints op voor `identificaties` en schrijf ze naar `pad`.
+
+    Args:
+        identificaties (List[str]): Verblijfsobject ID's om op te nemen
+        pad (str): Pad van het JSON-bestand
+    """
+    import aiohttp
+
+    async with aiohttp.ClientSession() as session:
+        verblijfsobjecten = await _kadaster._query_verblijfsobjecten(
+            session, identificaties
+        )
+        rijksmonumenten = await _cultureel_erfgoed._query_rijksmonumenten(
+            session, identificaties
+        )
+        gezichten = await _cultureel_erfgoed._query_beschermde_gezichten(session)
+
+    # een adres met meerdere beperkingen geeft meerdere rijen
+    opgenomen: Dict[str, Dict[str, Any]] = {}
+    for rij in verblijfsobjecten:
+        verblijfsobject = opgenomen.setdefault(
+            rij["identificatie"],
+            {"verblijfsobjectWKT": rij["verblijfsobjectWKT"], "beperkingen": []},
+        )
+        if rij["grondslagcode"] is not None:
+            verblijfsobject["beperkingen"].append(
+                [rij["grondslagcode"], rij["grondslag_gemeentelijk_monument"]]
+            )
+
+    data = {
+        "verblijfsobjecten": opgenomen,
+        "rijksmonumenten": {
+            rij["identificatie"]: rij["rijksmonument_nummer"] for rij in rijksmonumenten
+        },
+        "beschermde_gezichten": [
+            {
+                "beschermd_gezicht_naam": g["beschermd_gezicht_naam"],
+                "gezichtWKT": g["gezichtWKT"],
+            }
+            for g in gezichten
+        ],
+    }
+    with open(pad, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _beperkingen(verblijfsobject: Dict[str, Any]) -> str:
+    """Voeg de beperkingen van een verblijfsobject samen zoals de KKG-query dat doet."""
+    if "beperkingen" in verblijfsobject:
+        paren = verblijfsobject["beperkingen"]
+    elif verblijfsobject.get("grondslagcode") is not None:
+        paren = [
+            [
+                verblijfsobject["grondslagcode"],
+                verblijfsobject.get("grondslag_gemeentelijk_monument"),
+            ]
+        ]
+    else:
+        paren = []
+    samengevoegd: Dict[str, None] = {}
+    for code, grondslag in paren:
+        # net als ENCODE_FOR_URI; alleen de grondslag van een gemeentelijk monument
+        gecodeerd = quote(grondslag or "", safe="") if code in ("GG", "GWA") else ""
+        samengevoegd[f"{code}={gecodeerd}"] = None
+    return " ".join(samengevoegd)
+
+
+def _binding(
+    waarde: Optional[str], soort: str = "literal", datatype: Optional[str] = None
+) -> Dict[str, str]:
+    binding = {"type": soort, "value": waarde or ""}
+    if datatype is not None:
+        binding["datatype"] = datatype
+    return binding
+
+
+class SparqlStandin:
+    """aiohttp server die de drie SPARQL endpoints nabootst.
+
+    Args:
+        data (StandinData): De data waarmee geantwoord wordt
+        latentie (float): Gemiddelde extra vertraging per aanvraag in seconden
+        jitter (float): Maximale afwijking van de latentie in seconden (uniform verdeeld)
+        foutpercentage (float): Kans (0-1) dat een aanvraag met HTTP 503 beantwoord wordt
+        opvulling (int): Extra bytes (witruimte) per resultaatrij, om grotere responses na te bootsen
+        seed (int): Seed voor de willekeurige latentie en fouten
+    """
+
+    def __init__(
+        self,
+        data: StandinData,
+        latentie: float = 0.0,
+        jitter: float = 0.0,
+        foutpercentage: float = 0.0,
+        opvulling: int = 0,
+        seed: int = 0,
+    ) -> None:
+        self.data = data
+        self.latentie = latentie
+        self.jitter = jitter
+        self.foutpercentage = foutpercentage
+        self.opvulling = opvulling
+        self._random = random.Random(seed)
+        self.aanvragen: Dict[str, int] = {"bag_lv": 0, "kkg": 0, "rce": 0}
+        self.fouten = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    def maak_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024**2)
+        app.router.add_post("/bag_lv/sparql", self._bag_lv)
+        app.router.add_post("/kkg/sparql", self._kkg)
+        app.router.add_post("/rce/sparql", self._rce)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.maak_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        poort = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{poort}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "SparqlStandin":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+
+    @contextmanager
+    def actief(self) -> Iterator[None]:
+        """Laat de package binnen dit blok de stand-in gebruiken in plaats van de echte endpoints."""
+        with richt_endpoints_op(self.url):
+            yield
+
+    async def _vertraag_of_faal(self, endpoint: str) -> Optional[web.Response]:
+        self.aanvragen[endpoint] += 1
+        vertraging = self.latentie + self._random.uniform(-self.jitter, self.jitter)
+        if vertraging > 0:
+            await asyncio.sleep(vertraging)
+        if self._random.random() < self.foutpercentage:
+            self.fouten += 1
+            return web.Response(status=503, text="Service Unavailable (stand-in)")
+        return None
+
+    def _json(self, resultaat: Any, aantal_rijen: int) -> web.Response:
+        body = json.dumps(resultaat) + " " * (self.opvulling * aantal_rijen)
+        response = web.Response(
+            body=body.encode(), content_type="application/sparql-results+json"
+        )
+        # net als de echte endpoints comprimeren als de client erom vraagt
+        response.enable_compression()
+        return response
+
+    async def _bag_lv(self, request: web.Request) -> web.Response:
+        query = (await request.post())["query"]
+        fout = await self._vertraag_of_faal("bag_lv")
+        if fout is not None:
+            return fout
+        bindings = [
+            {
+                "voId": _binding(vo_id),
+                "nummeraanduiding": _binding(_NUMMERAANDUIDING_PREFIX + vo_id, "uri"),
+            }
+            for vo_id in _values(str(query), "voId")
+            if self.data.verblijfsobject(vo_id) is not None
+        ]
+        return self._json(
+            {
+                "head": {"vars": ["voId", "nummeraanduiding"]},
+                "results": {"bindings": bindings},
+            },
+            len(bindings),
+        )
+
+    async def _kkg(self, request: web.Request) -> web.Response:
+        query = str((await request.post())["query"])
+        fout = await self._vertraag_of_faal("kkg")
+        if fout is not None:
+            return fout
+        met_geometrie = "geo:hasGeometry" in query
+        bindings = []
+        for uri in _values(query, "nummeraanduiding"):
+            verblijfsobject = self.data.verblijfsobject(
+                uri.removeprefix(_NUMMERAANDUIDING_PREFIX)
+            )
+            if verblijfsobject is None:
+                continue
+            binding = {"nummeraanduiding": _binding(uri, "uri")}
+            if met_geometrie:
+                binding["verblijfsobjectWKT"] = _binding(
+                    verblijfsobject["verblijfsobjectWKT"], datatype=_WKT_DATATYPE
+                )
+            # net als de KKG-query geaggregeerd tot één rij per adres
+            binding["beperkingen"] = _binding(_beperkingen(verblijfsobject))
+            bindings.append(binding)
+        return self._json(
+            {
+                "head": {
+                    "vars": [
+                        "nummeraanduiding",
+                        "verblijfsobjectWKT",
+                        "beperkingen",
+                    ]
+                },
+                "results": {"bindings": bindings},
+            },
+            len(bindings),
+        )
+
+    async def _rce(self, request: web.Request) -> web.Response:
+        query = str((await request.post())["query"])
+        fout = await self._vertraag_of_faal("rce")
+        if fout is not None:
+            return fout
+        # De RCE (TriplyDB) antwoordt met een platte lijst in plaats van SPARQL JSON
+        if "ceo:heeftGezichtsstatus" in query:
+            resultaat: List[Dict[str, str]] = [
+                {"gezicht": f"https://example.org/gezicht/{i}", **gezicht}
+                for i, gezicht in enumerate(self.data.beschermde_gezichten)
+            ]
+        elif "VALUES ?rijksmonument_nummer" in query:
+            # omgekeerd zoeken kan alleen in de opgenomen rijksmonumenten
+            nummers = set(_values(query, "rijksmonument_nummer"))
+            resultaat = [
+                {"rijksmonument_nummer": nummer, "identificatie": identificatie}
+                for identificatie, nummer in self.data.rijksmonumenten.items()
+                if nummer in nummers
+            ]
+        else:
+            resultaat = []
+            for identificatie in _values(query, "identificatie"):
+                nummer = self.data.rijksmonument(identificatie)
+                if nummer is not None:
+                    resultaat.append(
+                        {"identificatie": identificatie, "rijksmonument_nummer": nummer}
+                    )
+        return self._json(resultaat, len(resultaat))
+
+
+@contextmanager
+def richt_endpoints_op(basis_url: str) -> Iterator[None]:
+    """Vervang de SPARQL endpoints van de package tijdelijk door die van een stand-in.
+
+    De gecachte beschermde gezichten worden bij binnenkomst en vertrek geleegd, omdat ze
+    van andere endpoints komen.
+
+    Args:
+        basis_url (str): Basis-URL van de stand-in, bijvoorbeeld "http://127.0.0.1:8765"
+
+    Yields:
+        None: Binnen het blok gebruikt de package de stand-in
+    """
+    oud = (
+        _kadaster._BAG_LV_ENDPOINT,
+        _kadaster._KKG_ENDPOINT,
+        _cultureel_erfgoed._CULTUREEL_ERFGOED_SPARQL_ENDPOINT,
+    )
+    _kadaster._BAG_LV_ENDPOINT = f"{basis_url}/bag_lv/sparql"
+    _kadaster._KKG_ENDPOINT = f"{basis_url}/kkg/sparql"
+    _cultureel_erfgoed._CULTUREEL_ERFGOED_SPARQL_ENDPOINT = f"{basis_url}/rce/sparql"
+    _leeg_gezichten_cache()
+    try:
+        yield
+    finally:
+        _leeg_gezichten_cache()
+        (
+            _kadaster._BAG_LV_ENDPOINT,
+            _kadaster._KKG_ENDPOINT,
+            _cultureel_erfgoed._CULTUREEL_ERFGOED_SPARQL_ENDPOINT,
+        ) = oud
+
+
+def _leeg_gezichten_cache() -> None:
+    # synchroon legen, zodat dit ook buiten een event loop kan
+    _processing._gezichten_indexen.clear()
+    cache._standaard_cache._waarden.clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Stand-in voor de SPARQL endpoints van Kadaster en RCE."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="Standaard een vrije poort")
+    parser.add_argument(
+        "--data", help="JSON-bestand met opgenomen data. Standaard synthetisch."
+    )
+    parser.add_argument(
+        "--latentie", type=float, default=0.0, help="Seconden per aanvraag"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconden")
+    parser.add_argument(
+        "--foutpercentage", type=float, default=0.0, help="Kans 0-1 op HTTP 503"
+    )
+    parser.add_argument(
+        "--opvulling", type=int, default=0, help="Extra bytes per resultaatrij"
+    )
+    args = parser.parse_args()
+
+    standin = SparqlStandin(
+        StandinData.laad(args.data) if args.data else StandinData.synthetisch(),
+        latentie=args.latentie,
+        jitter=args.jitter,
+        foutpercentage=args.foutpercentage,
+        opvulling=args.opvulling,
+    )
+
+    async def _draai() -> None:
+        url = await standin.start(args.host, args.port)
+        print(url, flush=True)  # de benchmarks lezen de URL van stdout
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(_draai())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from redis_standin import RedisStandin
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+from monumenten import MonumentenClient
+from monumenten.cache import (
+    DiskCache,
+    MemoryCache,
+    RedisCache,
+    _codeer,
+    _decodeer,
+    _haal_op_of_bereken,
+    _haal_op_per_id,
+    _zet_per_id,
+)
+
+
+@pytest.fixture(params=["memory", "disk", "redis"])
+async def maak_cache(request, tmp_path):
+    """Geeft een functie die een nieuwe verbinding met dezelfde cache maakt."""
+    if request.param == "memory":
+        cache = MemoryCache()
+        yield lambda: cache
+    elif request.param == "disk":
+        yield lambda: DiskCache(tmp_path / "cache")
+    else:
+        async with RedisStandin(wachtwoord="geheim") as server:
+            yield lambda: RedisCache(server.url)
+
+
+@pytest.mark.asyncio
+async def test_ophalen_en_opslaan(maak_cache):
+    cache = maak_cache()
+
+    assert await cache.haal_op("a") is None
+    await cache.zet("a", b"1", ttl=None)
+    await cache.zet_meerdere({"b": b"2", "c": b"3"}, ttl=60)
+    await cache.zet("kort", b"4", ttl=0.01)
+    await asyncio.sleep(0.05)
+
+    assert await maak_cache().haal_op("a") == b"1"
+    assert await cache.haal_op_meerdere(["a", "x", "c", "kort"]) == [
+        b"1",
+        None,
+        b"3",
+        None,
+    ]
+
+    await cache.leeg()
+    assert await cache.haal_op("a") is None
+
+
+@pytest.mark.asyncio
+async def test_slot(maak_cache):
+    eerste, tweede = maak_cache(), maak_cache()
+
+    assert await eerste.vergrendel("slot", "een", ttl=60)
+    assert not await tweede.vergrendel("slot", "twee", ttl=60)
+    await tweede.ontgrendel("slot", "twee")  # niet van hem, dus geen effect
+    assert not await tweede.vergrendel("slot", "twee", ttl=60)
+    await eerste.ontgrendel("slot", "een")
+    assert await tweede.vergrendel("slot", "twee", ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert await eerste.vergrendel("slot", "een", ttl=60)  # verlopen
+
+
+@pytest.mark.asyncio
+async def test_stampede_bescherming(maak_cache):
+    aanroepen = 0
+
+    async def bereken():
+        nonlocal aanroepen
+        aanroepen += 1
+        await asyncio.sleep(0.05)
+        return {"gezichten": ["Binnenstad"]}
+
+    resultaten = await asyncio.gather(
+        *(_haal_op_of_bereken(maak_cache(), "sleutel", bereken, 60) for _ in range(5))
+    )
+
+    assert aanroepen == 1
+    assert resultaten == [{"gezichten": ["Binnenstad"]}] * 5
+
+
+@pytest.mark.asyncio
+async def test_afgebroken_commando_laat_geen_antwoord_achter():
+    async with RedisStandin() as server:
+        cache = RedisCache(server.url)
+        await cache.zet_meerdere({"a": b"AAA", "b": b"BBB"}, ttl=None)
+
+        server.vertraging = 0.2
+        taak = asyncio.create_task(cache.haal_op_meerdere(["a", "b"]))
+        await asyncio.sleep(0.05)
+        taak.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await taak
+        server.vertraging = 0
+
+        # het antwoord op de afgebroken MGET mag niet bij deze commando's terechtkomen
+        assert await cache.haal_op("b") == b"BBB"
+        assert await cache.haal_op("a") == b"AAA"
+        await cache.sluit()
+
+
+@pytest.mark.asyncio
+async def test_onleesbare_waarden_gelden_als_ontbrekend(tmp_path):
+    cache = DiskCache(tmp_path / "cache")
+    await _zet_per_id(cache, "kkg", {"a": [], "b": [["GG", "Gemeentewet"]]}, ttl=60)
+    await cache.zet("kkg:a", b"\x00oud formaat", ttl=60)
+    with open(cache._pad("kkg:c"), "wb") as f:
+        f.write(b"kort")  # korter dan de verlooptijd
+
+    assert await _haal_op_per_id(cache, "kkg", ["a", "b", "c"]) == {
+        "b": [["GG", "Gemeentewet"]]
+    }
+
+    async def bereken():
+        return ["nieuw"]
+
+    await cache.zet("gezichten", b"\x00oud formaat", ttl=60)
+    assert await _haal_op_of_bereken(cache, "gezichten", bereken, 60) == ["nieuw"]
+    # de onleesbare waarde is vervangen
+    assert _decodeer(await cache.haal_op("gezichten")) == ["nieuw"]
+
+
+def test_codering_is_compact():
+    waarde = [{"beschermd_gezicht_naam": "Binnenstad", "gezichtWKT": "POLYGON " * 100}]
+
+    data = _codeer(waarde)
+
+    assert _decodeer(data) == waarde
+    assert len(data) < 100
+    with pytest.raises(ValueError, match="formaat"):
+        _decodeer(b"\x00")
+
+
+def test_alleen_redis_urls():
+    with pytest.raises(ValueError, match="redis://"):
+        RedisCache("http://localhost:6379")
+
+
+@pytest.mark.asyncio
+async def test_clients_delen_een_redis_cache():
+    ids = synthetische_ids(600)
+
+    async with (
+        RedisStandin() as server,
+        SparqlStandin(StandinData.synthetisch()) as standin,
+    ):
+        with standin.actief():
+            async with MonumentenClient(cache=RedisCache(server.url)) as client:
+                verwacht = await client.process_from_list(ids)
+            eerste = dict(standin.aanvragen)
+            standin.aanvragen = dict.fromkeys(standin.aanvragen, 0)
+
+            # een andere client, met een eigen verbinding naar dezelfde cache; na de warmup is
+            # de versie van de gezichten bekend, zodat ook de geometrie niet nodig is
+            async with MonumentenClient(
+                cache=RedisCache(server.url), warmup=True
+            ) as client:
+                result = await client.process_from_list(ids)
+
+    assert result == verwacht
+    assert eerste == {"bag_lv": 2, "kkg": 2, "rce": 3}
+    # gezichten, BAG-koppelingen, lidmaatschap en resultaten per ID komen uit de cache
+    assert standin.aanvragen == {"bag_lv": 0, "kkg": 0, "rce": 0}
+    assert (
+        client.metrics.counter("monumenten_cache_totaal", cache="kkg", resultaat="hit")
+        > 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_client_zonder_bereikbare_redis():
+    ids = synthetische_ids(100)
+
+    async with RedisStandin() as server:
+        cache = RedisCache(server.url)
+    # de server is gestopt: de cache faalt, de resultaten komen van de endpoints
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                verwacht = await client.process_from_list(ids)
+            async with MonumentenClient(cache=cache) as client:
+                result = await client.process_from_df(
+                    pd.DataFrame({"id": ids}), "id", on_error="isolate"
+                )
+
+    assert not result.attrs["rapport"].mislukt
+    assert {rij["id"]: rij["is_rijksmonument"] for _, rij in result.iterrows()} == {
+        i: verwacht[i]["is_rijksmonument"] for i in ids if i in verwacht
+    }
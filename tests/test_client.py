@@ -1,8 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 import pytest
 import pytest_asyncio
 
-from monumenten import MonumentenClient
+from monumenten import MonumentenClient, MonumentenSyncClient
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -490,3 +492,44 @@ async def test_process_from_df_multiple_beschermd_gezichten(client: MonumentenCl
     # Controleer gemeentelijk monument details
     assert not pd.isna(row["grondslag_gemeentelijk_monument"])
     assert "Gemeentewet" in row["grondslag_gemeentelijk_monument"]
+
+
+def test_sync_client_process_from_list():
+    bag_verblijfsobject_ids = [
+        "0599010000360091",  # rijksmonument
+        "0599010000281115",  # beschermd gezicht
+        "0599010000076715",  # gemeentelijk monument
+    ]
+
+    with MonumentenSyncClient() as client:
+        # meerdere threads delen dezelfde event loop en sessie
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(
+                executor.map(
+                    lambda ids: client.process_from_list(ids),
+                    [
+                        [verblijfsobject_id]
+                        for verblijfsobject_id in bag_verblijfsobject_ids
+                    ],
+                )
+            )
+        vera = client.process_from_list(bag_verblijfsobject_ids, to_vera=True)
+
+    assert results[0]["0599010000360091"]["is_rijksmonument"] is True
+    assert results[1]["0599010000281115"]["is_beschermd_gezicht"] is True
+    assert results[2]["0599010000076715"]["is_gemeentelijk_monument"] is True
+    assert vera["0599010000360091"][0]["code"] == "RIJ"
+
+
+def test_sync_client_invalid_ids_and_close():
+    client = MonumentenSyncClient()
+
+    with pytest.warns(Warning, match="onjuiste verblijfsobject"):
+        with pytest.raises(ValueError, match="Geen enkel geldig"):
+            client.process_from_list(["123"])
+
+    client.close()
+    client.close()  # meerdere keren sluiten is toegestaan
+
+    with pytest.raises(RuntimeError, match="gesloten"):
+        client.process_from_list(["0599010000360091"])
@@ -0,0 +1,121 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from monumenten._coalescing import _BatchCoalescer
+
+
+class _Teller:
+    """Nep-batchverwerking die bijhoudt welke batches verwerkt zijn."""
+
+    def __init__(self, vertraging: float = 0.01, fout_bij: str = ""):
+        self.batches = []
+        self.vertraging = vertraging
+        self.fout_bij = fout_bij
+
+    async def __call__(self, batch):
+        self.batches.append(list(batch))
+        await asyncio.sleep(self.vertraging)
+        if self.fout_bij in batch:
+            raise RuntimeError("batch mislukt")
+        return pd.DataFrame(
+            {"identificatie": batch, "waarde": [f"w{i}" for i in batch]}
+        )
+
+
+@pytest.mark.asyncio
+async def test_gelijktijdige_aanvragen_delen_een_batch():
+    teller = _Teller()
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=500, max_wachttijd=0.01)
+
+    resultaten = await asyncio.gather(
+        coalescer.verwerk(["1"]),
+        coalescer.verwerk(["2", "3"]),
+        coalescer.verwerk(["3", "4"]),
+    )
+
+    assert teller.batches == [["1", "2", "3", "4"]]
+    assert resultaten[0]["identificatie"].tolist() == ["1"]
+    assert resultaten[1]["identificatie"].tolist() == ["2", "3"]
+    assert resultaten[2]["waarde"].tolist() == ["w3", "w4"]
+    assert coalescer.aantal_in_behandeling == 0
+
+
+@pytest.mark.asyncio
+async def test_volle_batch_wordt_direct_verstuurd():
+    teller = _Teller()
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=2, max_wachttijd=10)
+
+    resultaat = await asyncio.wait_for(coalescer.verwerk(["1", "2", "3", "4"]), 1)
+
+    assert teller.batches == [["1", "2"], ["3", "4"]]
+    assert len(resultaat) == 4
+
+
+@pytest.mark.asyncio
+async def test_lopende_batch_wordt_hergebruikt():
+    teller = _Teller(vertraging=0.05)
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=500, max_wachttijd=0)
+
+    eerste = asyncio.ensure_future(coalescer.verwerk(["1", "2"]))
+    await asyncio.sleep(0.01)  # de eerste batch loopt nu
+    tweede = await coalescer.verwerk(["2", "3"])
+    await eerste
+
+    assert teller.batches == [["1", "2"], ["3"]]
+    assert tweede["identificatie"].tolist() == ["2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_fout_gaat_naar_alle_aanvragers_van_de_batch():
+    teller = _Teller(fout_bij="2")
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=500, max_wachttijd=0.01)
+
+    resultaten = await asyncio.gather(
+        coalescer.verwerk(["1"]), coalescer.verwerk(["2"]), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in resultaten)
+    assert coalescer.aantal_in_behandeling == 0
+
+
+@pytest.mark.asyncio
+async def test_annuleren_van_aanvrager_annuleert_batch_niet():
+    teller = _Teller(vertraging=0.05)
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=500, max_wachttijd=0)
+
+    geannuleerd = asyncio.ensure_future(coalescer.verwerk(["1"]))
+    blijft = asyncio.ensure_future(coalescer.verwerk(["1"]))
+    await asyncio.sleep(0.01)
+    geannuleerd.cancel()
+
+    resultaat = await blijft
+    assert resultaat["identificatie"].tolist() == ["1"]
+    assert teller.batches == [["1"]]
+
+
+@pytest.mark.asyncio
+async def test_voortgang_per_afgeronde_batch():
+    teller = _Teller()
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=2, max_wachttijd=0)
+    voortgang = []
+
+    await coalescer.verwerk(["1", "2", "3", "3"], voortgang.append)
+
+    assert sorted(voortgang) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_batch_zonder_aanvragers_wordt_afgebroken():
+    teller = _Teller(vertraging=10)
+    coalescer = _BatchCoalescer(teller, max_batch_grootte=2, max_wachttijd=10)
+
+    # ["1", "2"] loopt direct, ["3"] wacht nog in de open batch
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(coalescer.verwerk(["1", "2", "3"]), 0.05)
+    await asyncio.sleep(0)
+
+    assert teller.batches == [["1", "2"]]
+    assert coalescer.aantal_in_behandeling == 0
+    assert not coalescer._taken
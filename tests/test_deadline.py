@@ -0,0 +1,104 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+from monumenten import MonumentenClient
+from monumenten._processing import _TaakGroep
+
+
+@pytest.mark.asyncio
+async def test_taakgroep_annuleert_de_andere_taken_bij_een_fout():
+    afgebroken = asyncio.Event()
+
+    async def _lang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            afgebroken.set()
+            raise
+
+    async def _fout():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("batch mislukt")
+
+    with pytest.raises(RuntimeError, match="batch mislukt"):
+        async with _TaakGroep() as groep:
+            lang = groep.start(_lang())
+            await groep.start(_fout())
+
+    assert afgebroken.is_set()
+    assert lang.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_deadline_geeft_gedeeltelijk_resultaat_bij_isolate():
+    ids = synthetische_ids(6000)
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.1) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.warns(UserWarning, match="Verwerking van"):
+                    result = await client.process_from_df(
+                        pd.DataFrame({"id": ids}),
+                        "id",
+                        on_error="isolate",
+                        deadline=1.5,
+                    )
+                wachtrijen = client.wachtrijen()
+
+    rapport = result.attrs["rapport"]
+    assert 0 < len(rapport.mislukt) < len(ids)
+    assert set(rapport.mislukt.values()) == {"Deadline verstreken"}
+    assert len(result) + len(rapport.mislukt) == len(ids)
+    # afgebroken batches houden geen plek bij de endpoints bezet
+    assert all(
+        aantal == 0 for klassen in wachtrijen.values() for aantal in klassen.values()
+    )
+
+
+@pytest.mark.asyncio
+async def test_deadline_zonder_isolate():
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.5) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.raises(asyncio.TimeoutError):
+                    await client.process_from_list(synthetische_ids(3), deadline=0.1)
+                with pytest.raises(ValueError, match="deadline"):
+                    await client.process_from_list(synthetische_ids(3), deadline=0)
+
+
+@pytest.mark.asyncio
+async def test_deadline_voor_de_eerste_batch_bij_isolate():
+    ids = synthetische_ids(3)
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.5) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.warns(UserWarning, match="Verwerking van"):
+                    result = await client.process_from_df(
+                        pd.DataFrame({"id": ids}),
+                        "id",
+                        on_error="isolate",
+                        deadline=0.1,
+                    )
+
+    assert result.empty
+    assert sorted(result.attrs["rapport"].mislukt) == sorted(ids)
+
+
+@pytest.mark.asyncio
+async def test_deadline_beeindigt_lopende_workers():
+    ids = synthetische_ids(4000)
+    async with SparqlStandin(StandinData.synthetisch(), latentie=1.0) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.raises(asyncio.TimeoutError):
+                    await client.process_from_df(
+                        pd.DataFrame({"id": ids}), "id", workers=2, deadline=4.0
+                    )
+                bij_deadline = sum(standin.aanvragen.values())
+                await asyncio.sleep(2.5)
+
+    # de workers waren bezig, maar versturen na de deadline niets meer
+    assert bij_deadline > 0
+    assert sum(standin.aanvragen.values()) == bij_deadline
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from monumenten._api._sparql import _Hedger
+from monumenten.metrics import Metrics, _gebruik_metrics
+
+
+async def _leer(hedger, aantal, duur=0.001):
+    async def aanvraag():
+        await asyncio.sleep(duur)
+        return "snel"
+
+    for _ in range(aantal):
+        await hedger.voer_uit(aanvraag)
+
+
+@pytest.mark.asyncio
+async def test_geen_hedge_zonder_genoeg_metingen():
+    hedger = _Hedger("kkg", min_metingen=20)
+    await _leer(hedger, 19)
+
+    assert hedger.drempel() is None
+    assert hedger.aantal_hedges == 0
+
+
+@pytest.mark.asyncio
+async def test_trage_aanvraag_wordt_gehedged():
+    hedger = _Hedger("kkg", budget=0.05)
+    await _leer(hedger, 40)
+    pogingen = []
+
+    async def aanvraag():
+        pogingen.append(len(pogingen))
+        # alleen de eerste poging hangt
+        await asyncio.sleep(10 if len(pogingen) == 1 else 0.001)
+        return len(pogingen)
+
+    metrics = Metrics()
+    with _gebruik_metrics(metrics):
+        resultaat = await asyncio.wait_for(hedger.voer_uit(aanvraag), timeout=1)
+
+    assert resultaat == 2
+    assert hedger.aantal_hedges == 1
+    assert metrics.counter("monumenten_hedges_totaal", endpoint="kkg") == 1
+    assert metrics.counter("monumenten_hedges_gewonnen_totaal", endpoint="kkg") == 1
+
+
+@pytest.mark.asyncio
+async def test_budget_begrenst_extra_aanvragen():
+    # met percentiel 0 is de snelste aanvraag de drempel
+    hedger = _Hedger("rce", percentiel=0.0, budget=0.05, min_metingen=1)
+    await _leer(hedger, 1)
+
+    # elke volgende aanvraag is trager dan de drempel, maar maximaal 5% krijgt een hedge
+    await _leer(hedger, 99, duur=0.01)
+
+    assert hedger.aantal_aanvragen == 100
+    assert 0 < hedger.aantal_hedges <= 5
+
+
+@pytest.mark.asyncio
+async def test_fout_van_de_hedge_wint_niet():
+    hedger = _Hedger("bag_lv", min_metingen=1, budget=1.0)
+    await _leer(hedger, 2)
+    pogingen = []
+
+    async def aanvraag():
+        pogingen.append(None)
+        if len(pogingen) == 2:
+            raise RuntimeError("hedge mislukt")
+        await asyncio.sleep(0.05)
+        return "origineel"
+
+    assert await hedger.voer_uit(aanvraag) == "origineel"
+
+    async def altijd_fout():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("mislukt")
+
+    with pytest.raises(RuntimeError, match="mislukt"):
+        await hedger.voer_uit(altijd_fout)
@@ -0,0 +1,53 @@
+"""Regressiebenchmark voor de importtijd van de package met `python -X importtime`."""
+
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# zware dependencies die pas bij het eerste gebruik geladen mogen worden
+ZWARE_MODULES = ["geopandas", "shapely", "tqdm"]
+
+# ruime bovengrens (in microseconden) voor een kale `import monumenten`
+MAX_IMPORTTIJD_PACKAGE_US = 250_000
+
+
+def _importtijden(code: str) -> Dict[str, int]:
+    """Draai `code` in een nieuwe interpreter en geef de cumulatieve importtijd per module terug."""
+    proces = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    tijden = {}
+    for regel in proces.stderr.splitlines():
+        if not regel.startswith("import time:") or "cumulative" in regel:
+            continue
+        _, cumulatief, module = regel.removeprefix("import time:").split("|")
+        tijden[module.strip()] = int(cumulatief)
+    return tijden
+
+
+def test_import_package_laadt_geen_dependencies():
+    tijden = _importtijden("import monumenten")
+
+    for module in ["pandas", "numpy", "aiohttp", *ZWARE_MODULES]:
+        assert module not in tijden, f"{module} wordt geladen bij `import monumenten`"
+    assert tijden["monumenten"] < MAX_IMPORTTIJD_PACKAGE_US
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "from monumenten import MonumentenClient",
+        "from monumenten import MonumentenSyncClient",
+    ],
+)
+def test_import_client_laadt_geen_zware_dependencies(code: str):
+    tijden = _importtijden(code)
+
+    assert "monumenten.client" in tijden
+    for module in ZWARE_MODULES:
+        assert module not in tijden, f"{module} wordt geladen bij `{code}`"
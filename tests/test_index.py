@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+from monumenten import MonumentenClient
+from monumenten.index import MonumentenIndex, bouw_index, main
+
+
+@pytest.fixture
+def data():
+    return StandinData(
+        verblijfsobjecten={
+            "0599010000360091": {
+                "verblijfsobjectWKT": "POINT (5 5)",
+                "grondslagcode": "EWE",
+                "grondslag_gemeentelijk_monument": "Erfgoedwet",
+            },
+            "0599010000486642": {
+                "verblijfsobjectWKT": "POINT (50 50)",
+                "grondslagcode": None,
+                "grondslag_gemeentelijk_monument": None,
+            },
+            "0599010000076715": {
+                "verblijfsobjectWKT": "POINT (6 6)",
+                "grondslagcode": "GG",
+                "grondslag_gemeentelijk_monument": "Gemeentewet",
+            },
+        },
+        rijksmonumenten={"0599010000360091": "524327", "0599010000486642": "1"},
+        beschermde_gezichten=[
+            {
+                "beschermd_gezicht_naam": "Kralingen - Midden",
+                "gezichtWKT": "POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))",
+            }
+        ],
+    )
+
+
+IDS = [
+    "0599010000360091",
+    "0599010000486642",
+    "0599010000076715",
+    "0599010000999999",  # niet bij het Kadaster bekend
+]
+
+
+@pytest.mark.asyncio
+async def test_client_beantwoordt_uit_de_index(data, tmp_path):
+    df = pd.DataFrame({"id": IDS[:3] + ["0599010000000001"]})
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            index = await bouw_index(tmp_path / "index", IDS)
+            async with MonumentenClient() as client:
+                verwacht = await client.process_from_df(df, "id", on_error="isolate")
+            standin.aanvragen = dict.fromkeys(standin.aanvragen, 0)
+
+            async with MonumentenClient(index=tmp_path / "index") as client:
+                result = await client.process_from_df(df, "id", on_error="isolate")
+                uit_index = await client.process_from_list(IDS, to_vera=True)
+
+    index.verifieer()
+    assert len(index) == 4
+    assert set(index.bronnen) == {"bag_lv", "kkg", "rce"}
+    pd.testing.assert_frame_equal(
+        result.sort_values("id").reset_index(drop=True),
+        verwacht.sort_values("id").reset_index(drop=True),
+    )
+    # alleen het ID dat niet in de index staat is opgevraagd
+    assert standin.aanvragen == {"bag_lv": 1, "kkg": 0, "rce": 1}
+    assert result.attrs["rapport"].niet_gevonden == ["0599010000000001"]
+    assert [s["code"] for s in uit_index["0599010000360091"]] == ["RIJ", "SGR"]
+    assert uit_index["0599010000999999"] == []
+    assert (
+        client.metrics.counter(
+            "monumenten_cache_totaal", cache="index", resultaat="hit"
+        )
+        == 3 + 4
+    )
+
+
+@pytest.mark.asyncio
+async def test_zoeken_is_gevectoriseerd(data, tmp_path):
+    ids = synthetische_ids(2000)
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            index = await bouw_index(tmp_path / "index", ids)
+            async with MonumentenClient() as client:
+                verwacht = await client._query(ids)
+
+    resultaat, niet_gevonden, ontbrekend = index._zoek(ids[::-1])
+
+    assert ontbrekend == []
+    assert len(niet_gevonden) + resultaat["identificatie"].nunique() == len(ids)
+    kolommen = resultaat.columns.tolist()
+    pd.testing.assert_frame_equal(
+        resultaat.sort_values(kolommen).reset_index(drop=True),
+        verwacht[kolommen]
+        .astype(resultaat.dtypes.to_dict())
+        .sort_values(kolommen)
+        .reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+@pytest.mark.asyncio
+async def test_verify_en_load(data, tmp_path, capsys):
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            await bouw_index(tmp_path / "index", IDS)
+
+    assert main(["verify", str(tmp_path / "index")]) == 0
+    assert main(["load", str(tmp_path / "index"), IDS[0], "0599010000000001"]) == 0
+    uitvoer = capsys.readouterr().out
+    assert "524327" in uitvoer
+    assert "0599010000000001: niet in de index" in uitvoer
+
+    kolom = np.load(tmp_path / "index" / "vlaggen.npy")
+    kolom[0] ^= 1
+    np.save(tmp_path / "index" / "vlaggen.npy", kolom)
+    assert main(["verify", str(tmp_path / "index")]) == 1
+    assert "Controlegetal van kolom vlaggen" in capsys.readouterr().err
+
+    with pytest.raises(ValueError, match="Geen monumentenindex"):
+        MonumentenIndex.open(tmp_path)
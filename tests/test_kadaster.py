@@ -0,0 +1,96 @@
+import aiohttp
+import pytest
+from sparql_standin import SparqlStandin, StandinData
+
+from monumenten._api._kadaster import (
+    _KKG_GEOMETRIE_PATROON,
+    _KKG_VERBLIJFSOBJECTEN_QUERY_TEMPLATE,
+    _query_verblijfsobjecten,
+    _rijen_per_beperking,
+)
+
+_WKT = "POINT (1 1)"
+
+
+def test_kkg_query_geeft_een_rij_per_adres():
+    query = _KKG_VERBLIJFSOBJECTEN_QUERY_TEMPLATE.format(
+        nummeraanduiding_values="<https://example.org/na/1>",
+        geometrie_patroon=_KKG_GEOMETRIE_PATROON,
+    )
+
+    assert "GROUP BY ?nummeraanduiding" in query
+    assert "SAMPLE(?adresWKT) AS ?verblijfsobjectWKT" in query
+    assert "ENCODE_FOR_URI(?grondslag)" in query
+
+
+def test_gebouw_op_meerdere_percelen():
+    rijen = _rijen_per_beperking(
+        {
+            "verblijfsobjectWKT": _WKT,
+            "beperkingen": "GWA=Gemeentewet%3A%20Aanwijzing EWE= GG=Gemeentewet",
+        }
+    )
+
+    assert rijen == [
+        {
+            "verblijfsobjectWKT": _WKT,
+            "grondslagcode": "GWA",
+            "grondslag_gemeentelijk_monument": "Gemeentewet: Aanwijzing",
+        },
+        {
+            "verblijfsobjectWKT": _WKT,
+            "grondslagcode": "EWE",
+            "grondslag_gemeentelijk_monument": None,
+        },
+        {
+            "verblijfsobjectWKT": _WKT,
+            "grondslagcode": "GG",
+            "grondslag_gemeentelijk_monument": "Gemeentewet",
+        },
+    ]
+
+
+def test_adres_zonder_beperkingen_of_geometrie():
+    assert _rijen_per_beperking(
+        {
+            "verblijfsobjectWKT": "",
+            "beperkingen": "",
+        }
+    ) == [
+        {
+            "verblijfsobjectWKT": None,
+            "grondslagcode": None,
+            "grondslag_gemeentelijk_monument": None,
+        }
+    ]
+
+
+@pytest.mark.asyncio
+async def test_meerdere_codes_en_grondslagen_voor_een_adres():
+    data = StandinData(
+        verblijfsobjecten={
+            "0599010000076715": {
+                "verblijfsobjectWKT": _WKT,
+                "beperkingen": [
+                    ["EWE", "Erfgoedwet"],
+                    ["GG", "Besluit monument\nGemeentewet"],
+                    ["GWA", "Gemeentewet: Aanwijzing = voorbescherming"],
+                ],
+            }
+        },
+        rijksmonumenten={},
+        beschermde_gezichten=[],
+    )
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with aiohttp.ClientSession() as session:
+                rijen = await _query_verblijfsobjecten(session, ["0599010000076715"])
+
+    assert sorted(
+        (rij["grondslagcode"], rij["grondslag_gemeentelijk_monument"]) for rij in rijen
+    ) == [
+        ("EWE", None),
+        ("GG", "Besluit monument\nGemeentewet"),
+        ("GWA", "Gemeentewet: Aanwijzing = voorbescherming"),
+    ]
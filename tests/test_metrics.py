@@ -0,0 +1,124 @@
+import pytest
+
+import monumenten._processing
+from monumenten import MonumentenClient
+from monumenten.metrics import Meting, Metrics, _gebruik_metrics, _meet_stap
+
+
+async def _nep_rijksmonumenten(session, identificaties):
+    return [{"identificatie": identificaties[0], "rijksmonument_nummer": "524327"}]
+
+
+async def _nep_verblijfsobjecten(
+    session, identificaties, met_geometrie=True, geometrie_voor=None
+):
+    return [
+        {
+            "identificatie": identificatie,
+            "verblijfsobjectWKT": f"POINT ({i} {i})" if met_geometrie else None,
+            "grondslagcode": None,
+            "grondslag_gemeentelijk_monument": None,
+        }
+        for i, identificatie in enumerate(identificaties)
+    ]
+
+
+async def _nep_beschermde_gezichten(session):
+    return [
+        {
+            "beschermd_gezicht_naam": "Binnenstad",
+            "gezichtWKT": "POLYGON ((0.5 0.5, 5 0.5, 5 5, 0.5 5, 0.5 0.5))",
+        }
+    ]
+
+
+def test_prometheus_export():
+    metrics = Metrics()
+    metrics.verhoog("monumenten_retries_totaal", endpoint="kkg")
+    metrics.verhoog("monumenten_retries_totaal", 2, endpoint="kkg")
+    metrics.observeer("monumenten_batch_grootte", 3)
+    metrics.observeer("monumenten_batch_grootte", 500)
+
+    tekst = metrics.to_prometheus()
+
+    assert "# TYPE monumenten_retries_totaal counter" in tekst
+    assert 'monumenten_retries_totaal{endpoint="kkg"} 3' in tekst
+    assert "# TYPE monumenten_batch_grootte histogram" in tekst
+    assert 'monumenten_batch_grootte_bucket{le="1"} 0' in tekst
+    assert 'monumenten_batch_grootte_bucket{le="10"} 1' in tekst
+    assert 'monumenten_batch_grootte_bucket{le="500"} 2' in tekst
+    assert 'monumenten_batch_grootte_bucket{le="+Inf"} 2' in tekst
+    assert "monumenten_batch_grootte_sum 503" in tekst
+    assert "monumenten_batch_grootte_count 2" in tekst
+    assert metrics.histogram("monumenten_batch_grootte")["gemiddelde"] == 251.5
+
+
+def test_labels_worden_ge_escaped():
+    metrics = Metrics()
+    metrics.verhoog("teller", stap='a"b\\c')
+    assert 'teller{stap="a\\"b\\\\c"} 1' in metrics.to_prometheus()
+
+
+def test_sinks_en_actieve_metrics():
+    ontvangen = []
+    metrics = Metrics(sinks=[ontvangen.append])
+
+    with _meet_stap("buiten"):  # zonder actieve metrics wordt niets gemeten
+        pass
+    with _gebruik_metrics(metrics):
+        with _meet_stap("merge"):
+            pass
+
+    assert len(ontvangen) == 1
+    assert isinstance(ontvangen[0], Meting)
+    assert ontvangen[0].naam == "monumenten_stap_duur_seconden"
+    assert ontvangen[0].soort == "histogram"
+    assert ontvangen[0].labels == {"stap": "merge"}
+    assert metrics.histogram("monumenten_stap_duur_seconden", stap="buiten") == {
+        "aantal": 0,
+        "som": 0.0,
+        "gemiddelde": 0.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_client_meet_stappen_en_caches(monkeypatch):
+    monkeypatch.setattr(
+        monumenten._processing, "_query_rijksmonumenten", _nep_rijksmonumenten
+    )
+    monkeypatch.setattr(
+        monumenten._processing, "_query_verblijfsobjecten", _nep_verblijfsobjecten
+    )
+    monkeypatch.setattr(
+        monumenten._processing,
+        "_query_beschermde_gezichten",
+        _nep_beschermde_gezichten,
+    )
+    ids = ["0599010000360091", "0599010000486642"]
+
+    async with MonumentenClient() as client:
+        await client.process_from_list(ids)
+        await client.process_from_list(ids)
+
+    metrics = client.metrics
+    for stap in ("wkt_parse", "sjoin", "merge"):
+        assert metrics.histogram("monumenten_stap_duur_seconden", stap=stap)["aantal"]
+    assert metrics.histogram("monumenten_batch_grootte")["som"] == 4
+    assert (
+        metrics.counter(
+            "monumenten_cache_totaal", cache="beschermde_gezichten", resultaat="miss"
+        )
+        == 1
+    )
+    assert (
+        metrics.counter(
+            "monumenten_cache_totaal", cache="beschermde_gezichten", resultaat="hit"
+        )
+        == 1
+    )
+    assert (
+        metrics.counter(
+            "monumenten_cache_totaal", cache="gezicht_lidmaatschap", resultaat="hit"
+        )
+        == 2
+    )
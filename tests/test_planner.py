@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+from monumenten import MonumentenClient
+from monumenten._api._planner import _Planner
+from monumenten.metrics import Metrics, _gebruik_metrics
+
+
+async def _bezet(planner, klasse, volgorde, vrijgeven):
+    async with planner.slot(klasse):
+        volgorde.append(klasse)
+        await vrijgeven.wait()
+
+
+@pytest.mark.asyncio
+async def test_interactief_gaat_voor_wachtende_bulk():
+    planner = _Planner("test", capaciteit=1)
+    volgorde = []
+
+    async def _aanvraag(klasse):
+        async with planner.slot(klasse):
+            volgorde.append(klasse)
+            await asyncio.sleep(0)
+
+    bezet = asyncio.Event()
+    houder = asyncio.create_task(_bezet(planner, "bulk", [], bezet))
+    await asyncio.sleep(0)
+    taken = [asyncio.create_task(_aanvraag("bulk")) for _ in range(10)]
+    await asyncio.sleep(0)
+    taken.append(asyncio.create_task(_aanvraag("interactief")))
+    await asyncio.sleep(0)
+    assert planner.wachtrij_lengtes() == {"interactief": 1, "bulk": 10}
+
+    bezet.set()
+    await asyncio.gather(houder, *taken)
+
+    # de interactieve aanvraag sluit als laatste aan, maar krijgt de eerste vrije plek
+    assert volgorde.index("interactief") == 0
+    assert planner.wachtrij_lengtes() == {"interactief": 0, "bulk": 0}
+
+
+@pytest.mark.asyncio
+async def test_bulk_blijft_doorlopen_naast_interactief():
+    planner = _Planner("test", capaciteit=1, gewichten={"interactief": 2, "bulk": 1})
+    volgorde = []
+
+    async def _aanvraag(klasse):
+        async with planner.slot(klasse):
+            volgorde.append(klasse)
+            await asyncio.sleep(0)
+
+    vrijgeven = asyncio.Event()
+    houder = asyncio.create_task(_bezet(planner, "bulk", [], vrijgeven))
+    await asyncio.sleep(0)
+    taken = [
+        asyncio.create_task(_aanvraag(klasse))
+        for klasse in ["bulk"] * 3 + ["interactief"] * 6
+    ]
+    await asyncio.sleep(0)
+    vrijgeven.set()
+    await asyncio.gather(houder, *taken)
+
+    # gewicht 2 tegen 1: bulk krijgt elke derde plek, ook met interactieve aanvragen in de rij
+    assert volgorde[:6].count("bulk") == 2
+
+
+@pytest.mark.asyncio
+async def test_capaciteit_annulering_en_metingen():
+    planner = _Planner("test", capaciteit=2)
+    metrics = Metrics()
+    actief = 0
+    hoogste = 0
+
+    async def _aanvraag(klasse):
+        nonlocal actief, hoogste
+        async with planner.slot(klasse):
+            actief += 1
+            hoogste = max(hoogste, actief)
+            await asyncio.sleep(0.01)
+            actief -= 1
+
+    with _gebruik_metrics(metrics):
+        vrijgeven = asyncio.Event()
+        houders = [
+            asyncio.create_task(_bezet(planner, "bulk", [], vrijgeven))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        geannuleerd = asyncio.create_task(_aanvraag("interactief"))
+        taken = [asyncio.create_task(_aanvraag("bulk")) for _ in range(5)]
+        await asyncio.sleep(0)
+        geannuleerd.cancel()
+        vrijgeven.set()
+        await asyncio.gather(*houders, *taken)
+
+    with pytest.raises(asyncio.CancelledError):
+        await geannuleerd
+    assert hoogste <= 2
+    # een geannuleerde aanvraag houdt geen plek bezet
+    assert planner._vrij == 2
+    wachttijd = metrics.histogram(
+        "monumenten_wachttijd_seconden", endpoint="test", prioriteit="bulk"
+    )
+    assert wachttijd["aantal"] == 7
+
+
+@pytest.mark.asyncio
+async def test_interactieve_aanroep_tijdens_bulkverwerking():
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.05) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                bulk = asyncio.create_task(
+                    client.process_from_list(synthetische_ids(6000))
+                )
+                while client.wachtrijen()["kadaster"]["bulk"] == 0:
+                    await asyncio.sleep(0.01)
+
+                resultaat = await client.process_from_list(synthetische_ids(1))
+                # de bulkverwerking had nog batches in de rij staan
+                assert not bulk.done()
+                await bulk
+
+    assert len(resultaat) == 1
+    wachttijd = client.metrics.histogram(
+        "monumenten_wachttijd_seconden", endpoint="kadaster", prioriteit="interactief"
+    )
+    assert wachttijd["aantal"] == 1
+    assert (
+        client.metrics.histogram(
+            "monumenten_wachtrij_lengte", endpoint="kadaster", prioriteit="bulk"
+        )["aantal"]
+        == 12
+    )
+
+
+@pytest.mark.asyncio
+async def test_onbekende_prioriteit():
+    async with MonumentenClient() as client:
+        with pytest.raises(ValueError, match="Onbekende prioriteit"):
+            await client.process_from_list(["0599010000360091"], prioriteit="snel")
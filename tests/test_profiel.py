@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+from monumenten import MonumentenClient
+from monumenten.profiel import Profiel
+
+
+@pytest.mark.asyncio
+async def test_profiel_van_een_run(tmp_path):
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.05) as standin:
+        with standin.actief():
+            async with MonumentenClient(profiel=tmp_path) as client:
+                await client.process_from_list(synthetische_ids(1200))
+
+    (trace_pad,) = tmp_path.glob("*.trace.json")
+    (folded_pad,) = tmp_path.glob("*.folded")
+    gebeurtenissen = json.loads(trace_pad.read_text())["traceEvents"]
+    spans = [g for g in gebeurtenissen if g["ph"] == "X"]
+
+    batches = [s for s in spans if s["cat"] == "batch"]
+    assert sorted(s["args"]["ids"] for s in batches) == [200, 500, 500]
+    # de batches lopen gelijktijdig, elk in een eigen baan
+    assert len({s["tid"] for s in batches}) == 3
+    assert max(s["ts"] for s in batches) < min(s["ts"] + s["dur"] for s in batches)
+    http = [s for s in spans if s["cat"] == "http"]
+    assert {s["name"] for s in http} >= {"http bag_lv", "http kkg", "http rce"}
+    assert all(s["args"]["status"] == 200 and s["args"]["bytes"] > 0 for s in http)
+    assert {"json_parse", "merge"} <= {s["name"] for s in spans if s["cat"] == "stap"}
+    assert any(s["cat"] == "wachten" for s in spans)
+    namen = [g["args"]["name"] for g in gebeurtenissen if g["ph"] == "M"]
+    assert any(naam.endswith(": batch") for naam in namen)
+
+    # de event loop wacht het grootste deel van de tijd op de stand-in
+    rekenwerk = [g["args"]["rekenwerk"] for g in gebeurtenissen if g["ph"] == "C"]
+    assert rekenwerk and min(rekenwerk) < 1
+    regels = folded_pad.read_text().splitlines()
+    assert regels and all(int(regel.rsplit(" ", 1)[1]) > 0 for regel in regels)
+    assert any("select (selectors.py)" in regel for regel in regels)
+
+
+@pytest.mark.asyncio
+async def test_geen_profiel_zonder_map(monkeypatch, tmp_path):
+    monkeypatch.delenv("MONUMENTEN_PROFIEL", raising=False)
+    async with MonumentenClient() as client:
+        assert client.profiel is None
+
+    monkeypatch.setenv("MONUMENTEN_PROFIEL", str(tmp_path))
+    async with MonumentenClient() as client:
+        assert client.profiel is not None
+    assert len(list(tmp_path.glob("*.trace.json"))) == 1
+
+
+def test_geneste_spans_in_een_baan():
+    profiel = Profiel(sample_interval=0.001)
+    profiel.start()
+    with profiel.span("buiten", "stap"):
+        with profiel.span("binnen", "stap") as args:
+            args["extra"] = 1
+            sum(i * i for i in range(200_000))
+    profiel.stop()
+
+    spans = [g for g in profiel.naar_chrome_trace()["traceEvents"] if g["ph"] == "X"]
+    assert [s["name"] for s in spans] == ["buiten", "binnen"]
+    assert spans[0]["tid"] == spans[1]["tid"]
+    assert spans[1]["args"] == {"extra": 1}
+    assert "test_geneste_spans_in_een_baan" in profiel.naar_folded()
+    with pytest.raises(ValueError):
+        Profiel(sample_interval=0)
+
+
+def test_afgeronde_taak_geeft_baan_niet_door():
+    profiel = Profiel()
+
+    async def _taak():
+        with profiel.span("taak", "batch"):
+            await asyncio.sleep(0)
+
+    async def _main():
+        for _ in range(3):
+            await asyncio.create_task(_taak())
+
+    asyncio.run(_main())
+    spans = [g for g in profiel.naar_chrome_trace()["traceEvents"] if g["ph"] == "X"]
+    assert len({s["tid"] for s in spans}) == 3
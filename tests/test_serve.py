@@ -0,0 +1,121 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from sparql_standin import SparqlStandin, StandinData
+
+import monumenten.client
+from monumenten.serve import maak_app
+
+AANTAL_AANROEPEN = []
+
+
+async def _nep_query(session, verblijfsobject_ids, **kwargs):
+    AANTAL_AANROEPEN.append(list(verblijfsobject_ids))
+    # elk gevonden verblijfsobject heeft een rij; alleen het eerste is een rijksmonument
+    aantal = len(verblijfsobject_ids)
+    return pd.DataFrame(
+        {
+            "identificatie": verblijfsobject_ids,
+            "rijksmonument_nummer": ["524327"] + [None] * (aantal - 1),
+            "rijksmonument_bron": ["RCE"] + [None] * (aantal - 1),
+            "beschermd_gezicht_naam": [None] * aantal,
+            "grondslag_gemeentelijk_monument": [None] * aantal,
+        }
+    )
+
+
+@pytest.fixture
+async def http_client(monkeypatch):
+    monkeypatch.setattr(monumenten.client, "_query", _nep_query)
+    AANTAL_AANROEPEN.clear()
+    async with TestClient(TestServer(maak_app(batch_wachttijd=0.05))) as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_gelijktijdige_aanvragen_worden_gebundeld(http_client):
+    responses = await asyncio.gather(
+        http_client.get("/monumenten/0599010000360091"),
+        http_client.post(
+            "/monumenten",
+            json={"verblijfsobject_ids": ["0599010000486642", "0599010000281115"]},
+        ),
+    )
+
+    assert [r.status for r in responses] == [200, 200]
+    assert len(AANTAL_AANROEPEN) == 1
+    assert sorted(AANTAL_AANROEPEN[0]) == [
+        "0599010000281115",
+        "0599010000360091",
+        "0599010000486642",
+    ]
+
+    enkel = await responses[0].json()
+    assert enkel["is_rijksmonument"] is True
+    assert enkel["rijksmonument_nummer"] == "524327"
+
+    meerdere = await responses[1].json()
+    assert set(meerdere) == {"0599010000486642", "0599010000281115"}
+    assert meerdere["0599010000486642"]["is_rijksmonument"] is False
+
+
+@pytest.mark.asyncio
+async def test_vera_en_ongeldige_invoer(http_client):
+    response = await http_client.get("/monumenten/0599010000360091?vera=true")
+    assert response.status == 200
+    assert (await response.json())[0]["code"] == "RIJ"
+
+    response = await http_client.get("/monumenten/123")
+    assert response.status == 400
+
+    response = await http_client.post("/monumenten", json={"ids": "x"})
+    assert response.status == 400
+
+    response = await http_client.get("/health")
+    assert (await response.json()) == {"status": "ok"}
+
+
+@pytest.mark.asyncio
+async def test_onbekende_verblijfsobjecten():
+    bekend, onbekend = "0599010000000001", "0599010000999999"
+    data = StandinData(
+        verblijfsobjecten={
+            bekend: {
+                "verblijfsobjectWKT": "POINT (1 1)",
+                "grondslagcode": None,
+                "grondslag_gemeentelijk_monument": None,
+            }
+        },
+        rijksmonumenten={},
+        beschermde_gezichten=StandinData.synthetisch().beschermde_gezichten,
+    )
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with TestClient(
+                TestServer(maak_app(batch_wachttijd=0.05))
+            ) as http_client:
+                alleen_onbekend = await http_client.get(f"/monumenten/{onbekend}")
+                # in één gedeelde batch mag het onbekende ID de andere aanvragen niet laten falen
+                responses = await asyncio.gather(
+                    http_client.get(f"/monumenten/{onbekend}"),
+                    http_client.get(f"/monumenten/{bekend}"),
+                    http_client.post(
+                        "/monumenten", json={"verblijfsobject_ids": [bekend, onbekend]}
+                    ),
+                    http_client.post(
+                        "/monumenten", json={"verblijfsobject_ids": [onbekend]}
+                    ),
+                )
+                enkel = await responses[1].json()
+                meerdere = await responses[2].json()
+                alleen_onbekende = await responses[3].json()
+
+    assert alleen_onbekend.status == 404
+    assert [r.status for r in responses] == [404, 200, 200, 200]
+    assert enkel["is_rijksmonument"] is False
+    assert meerdere[onbekend] is None
+    assert meerdere[bekend]["is_beschermd_gezicht"] is False
+    assert alleen_onbekende == {onbekend: None}
@@ -0,0 +1,72 @@
+import json
+
+import pytest
+from aiohttp import web
+
+from monumenten import MonumentenClient
+from monumenten import sessie as sessie_module
+from monumenten.sessie import SessieInstellingen
+
+
+@pytest.fixture
+async def server():
+    """Een server die grote JSON teruggeeft en de Accept-Encoding headers onthoudt."""
+    headers = []
+
+    async def _handler(request: web.Request) -> web.Response:
+        headers.append(request.headers.get("Accept-Encoding"))
+        response = web.json_response({"wkt": "POLYGON ((4.4 51.9, 4.5 51.9)) " * 1000})
+        response.enable_compression()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/", _handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield f"http://127.0.0.1:{runner.addresses[0][1]}/", headers
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_sessie_vraagt_om_compressie(server, monkeypatch):
+    url, headers = server
+    monkeypatch.setattr(sessie_module.importlib.util, "find_spec", lambda naam: None)
+
+    async with SessieInstellingen()._maak_sessie() as session:
+        async with session.get(url) as response:
+            data = json.loads(await response.read())
+            encoding = response.headers["Content-Encoding"]
+        assert session.connector.limit_per_host == 8
+        assert session.timeout.sock_read == 120
+
+    assert headers == ["gzip, deflate"]
+    assert encoding in ("gzip", "deflate")
+    assert data["wkt"].startswith("POLYGON")
+
+
+@pytest.mark.asyncio
+async def test_brotli_alleen_als_het_geinstalleerd_is(server, monkeypatch):
+    url, headers = server
+    monkeypatch.setattr(
+        sessie_module.importlib.util,
+        "find_spec",
+        lambda naam: object() if naam == "brotli" else None,
+    )
+
+    async with SessieInstellingen(headers={"X-Test": "1"})._maak_sessie() as session:
+        assert session.headers["Accept-Encoding"] == "gzip, deflate, br"
+        assert session.headers["X-Test"] == "1"
+
+    async with SessieInstellingen(compressie=False)._maak_sessie() as session:
+        await (await session.get(url)).read()
+
+    assert headers == [None]
+
+
+def test_sessie_niet_samen_met_eigen_session():
+    with pytest.raises(ValueError, match="session"):
+        MonumentenClient(session=object(), sessie=SessieInstellingen())  # type: ignore[arg-type]
+    with pytest.raises(ValueError, match="limiet_per_host"):
+        SessieInstellingen(limiet_per_host=0)
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+from monumenten import MonumentenClient
+from monumenten._sharding import _verdeel_aanvragen, _verdeel_ids
+
+
+def test_verdeel_ids_groepeert_op_gemeentecode():
+    ids = synthetische_ids(6, "0599") + synthetische_ids(4, "0363")
+
+    delen = _verdeel_ids(ids, 2)
+
+    assert [len(deel) for deel in delen] == [5, 5]
+    assert sorted(sum(delen, [])) == sorted(ids)
+    assert all(i.startswith("0363") for i in delen[0][:4])
+    assert all(i.startswith("0599") for i in delen[1])
+    assert _verdeel_ids(ids[:1], 4) == [ids[:1]]
+
+
+def test_verdeel_aanvragen_blijft_binnen_het_maximum():
+    assert _verdeel_aanvragen(4, 1) == [4]
+    assert _verdeel_aanvragen(4, 3) == [2, 1, 1]
+    assert _verdeel_aanvragen(4, 4) == [1, 1, 1, 1]
+    assert _verdeel_aanvragen(6, 4) == [2, 2, 1, 1]
+
+
+@pytest.mark.asyncio
+async def test_workers_geven_hetzelfde_resultaat():
+    ids = synthetische_ids(1200)
+    df = pd.DataFrame({"id": ids})
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                verwacht = await client.process_from_df(df, "id")
+            async with MonumentenClient() as client:
+                result = await client.process_from_df(df, "id", workers=2)
+
+                with pytest.raises(ValueError, match="workers"):
+                    await client.process_from_df(df, "id", workers=0)
+
+    pd.testing.assert_frame_equal(
+        result.sort_values("id").reset_index(drop=True),
+        verwacht.sort_values("id").reset_index(drop=True),
+    )
+    # de metingen van de workers komen in de client terecht
+    assert client.metrics.histogram("monumenten_batch_grootte")["som"] == len(set(ids))
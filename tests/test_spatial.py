@@ -0,0 +1,217 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from monumenten._spatial import (
+    _GeoPandasGezichtenIndex,
+    _GezichtLidmaatschap,
+    _maak_gezichten_index,
+    _RasterGezichtenIndex,
+    _ShapelyGezichtenIndex,
+)
+
+GEZICHTEN = {
+    "Vierkant": "POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))",
+    # overlapt met Vierkant, zodat punten in meerdere gezichten kunnen liggen
+    "Overlap": "POLYGON ((5 5, 15 5, 15 15, 5 15, 5 5))",
+    "Met gat": "POLYGON ((20 0, 30 0, 30 10, 20 10, 20 0), (23 3, 27 3, 27 7, 23 7, 23 3))",
+    "Multi": "MULTIPOLYGON (((40 0, 42 0, 42 2, 40 2, 40 0)), ((44 0, 46 0, 46 2, 44 2, 44 0)))",
+}
+
+
+def _sjoin_referentie(identificaties, wkts):
+    """De oorspronkelijke implementatie met een geopandas sjoin."""
+    gpd = pytest.importorskip("geopandas")
+
+    gezichten_df = gpd.GeoDataFrame(
+        {"beschermd_gezicht_naam": list(GEZICHTEN)},
+        geometry=gpd.GeoSeries.from_wkt(list(GEZICHTEN.values())),
+    )
+    geo_df = gpd.GeoDataFrame(
+        {"identificatie": identificaties},
+        geometry=gpd.GeoSeries.from_wkt(wkts),
+    )
+    return gpd.sjoin(geo_df, gezichten_df, how="left", predicate="within")[
+        ["identificatie", "beschermd_gezicht_naam"]
+    ].reset_index(drop=True)
+
+
+def _punten():
+    rng = np.random.default_rng(42)
+    coordinaten = rng.uniform(-5, 50, size=(2000, 2))
+    wkts = [f"POINT ({x} {y})" for x, y in coordinaten]
+    # randgevallen: op de rand, op een hoekpunt, in het gat en op de rand van het gat
+    wkts += [
+        "POINT (0 5)",
+        "POINT (10 10)",
+        "POINT (25 5)",
+        "POINT (23 5)",
+        "POINT (41 1)",
+        "POINT (7 7)",
+    ]
+    identificaties = [f"{i:016d}" for i in range(len(wkts))]
+    return identificaties, wkts
+
+
+def _als_sets(df):
+    return (
+        df.groupby("identificatie")["beschermd_gezicht_naam"]
+        .apply(lambda x: tuple(x.dropna()))
+        .to_dict()
+    )
+
+
+@pytest.mark.parametrize(
+    "index_klasse",
+    [_ShapelyGezichtenIndex, _RasterGezichtenIndex, _GeoPandasGezichtenIndex],
+)
+def test_backend_gelijk_aan_sjoin(index_klasse):
+    identificaties, wkts = _punten()
+    verwacht = _sjoin_referentie(identificaties, wkts)
+
+    index = index_klasse(list(GEZICHTEN), list(GEZICHTEN.values()))
+    resultaat = index.zoek(identificaties, wkts)
+
+    assert len(resultaat) == len(verwacht)
+    assert _als_sets(resultaat) == _als_sets(verwacht)
+
+
+def test_randgevallen():
+    index = _maak_gezichten_index("shapely", list(GEZICHTEN), list(GEZICHTEN.values()))
+    resultaat = index.zoek(
+        ["op_rand", "in_gat", "in_twee", "buiten"],
+        ["POINT (0 5)", "POINT (25 5)", "POINT (7 7)", "POINT (100 100)"],
+    )
+
+    assert _als_sets(resultaat) == {
+        "op_rand": (),
+        "in_gat": (),
+        "in_twee": ("Vierkant", "Overlap"),
+        "buiten": (),
+    }
+    assert resultaat["beschermd_gezicht_naam"].isna().sum() == 3
+
+
+def test_exacte_within():
+    identificaties, wkts = _punten()
+    index = _ShapelyGezichtenIndex(list(GEZICHTEN), list(GEZICHTEN.values()))
+    resultaat = _als_sets(index.zoek(identificaties, wkts))
+
+    punten = shapely.from_wkt(wkts)
+    gezichten = shapely.from_wkt(list(GEZICHTEN.values()))
+    for identificatie, punt in zip(identificaties, punten):
+        verwacht = tuple(
+            naam
+            for naam, gezicht in zip(GEZICHTEN, gezichten)
+            if shapely.within(punt, gezicht)
+        )
+        assert resultaat[identificatie] == verwacht
+
+
+def test_onbekende_backend():
+    with pytest.raises(ValueError, match="Onbekende spatial backend"):
+        _maak_gezichten_index("rtree", [], [])
+
+
+def test_lege_invoer():
+    index = _ShapelyGezichtenIndex(list(GEZICHTEN), list(GEZICHTEN.values()))
+    resultaat = index.zoek([], [])
+
+    assert isinstance(resultaat, pd.DataFrame)
+    assert list(resultaat.columns) == ["identificatie", "beschermd_gezicht_naam"]
+    assert resultaat.empty
+
+
+def test_versie_onafhankelijk_van_volgorde():
+    index = _ShapelyGezichtenIndex(list(GEZICHTEN), list(GEZICHTEN.values()))
+    omgekeerd = _ShapelyGezichtenIndex(
+        list(reversed(GEZICHTEN)), list(reversed(GEZICHTEN.values()))
+    )
+    gewijzigd = _ShapelyGezichtenIndex(
+        ["Vierkant"], ["POLYGON ((0 0, 11 0, 11 11, 0 11, 0 0))"]
+    )
+
+    assert index.versie == omgekeerd.versie
+    assert index.versie != gewijzigd.versie
+
+
+def test_lidmaatschap_gelijk_aan_zoek_en_invalidatie():
+    index = _ShapelyGezichtenIndex(list(GEZICHTEN), list(GEZICHTEN.values()))
+    identificaties = ["a", "b", "c"]
+    resultaat = index.zoek(
+        identificaties, ["POINT (7 7)", "POINT (1 1)", "POINT (100 100)"]
+    )
+
+    lidmaatschap = _GezichtLidmaatschap()
+    lidmaatschap.synchroniseer(index.versie)
+    lidmaatschap.bijwerken(resultaat)
+
+    assert all(identificatie in lidmaatschap for identificatie in identificaties)
+    assert _als_sets(lidmaatschap.opzoeken(identificaties)) == _als_sets(resultaat)
+
+    # zelfde versie: tabel blijft staan, andere versie: tabel wordt geleegd
+    lidmaatschap.synchroniseer(index.versie)
+    assert len(lidmaatschap) == 3
+    lidmaatschap.synchroniseer("andere versie")
+    assert len(lidmaatschap) == 0
+
+
+def _willekeurige_gezichten(rng, aantal):
+    """Gedetailleerde polygonen met gaten en meerdere delen, zoals echte gezichten."""
+    gezichten = []
+    for _ in range(aantal):
+        cx, cy = rng.uniform(0, 1000, size=2)
+        hoeken = np.sort(rng.uniform(0, 2 * np.pi, size=rng.integers(3, 400)))
+        stralen = rng.uniform(20, 200) * rng.uniform(0.5, 1.0, size=len(hoeken))
+        gezicht = shapely.Polygon(
+            np.c_[cx + stralen * np.cos(hoeken), cy + stralen * np.sin(hoeken)]
+        ).buffer(0)
+        if rng.random() < 0.5:
+            gat = shapely.Point(cx, cy).buffer(rng.uniform(1, 20), quad_segs=2)
+            gezicht = gezicht.difference(gat)
+        if rng.random() < 0.3:
+            gezicht = gezicht.union(shapely.box(cx + 250, cy, cx + 260, cy + 10))
+        gezichten.append(gezicht)
+    return gezichten
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_raster_gelijk_aan_exacte_test(seed):
+    rng = np.random.default_rng(seed)
+    gezichten = _willekeurige_gezichten(rng, 25)
+    wkts = [gezicht.wkt for gezicht in gezichten]
+    namen = [f"gezicht {i}" for i in range(len(gezichten))]
+
+    # willekeurige punten, plus punten precies op hoekpunten, randen en rastergrenzen
+    coordinaten = [rng.uniform(-200, 1200, size=(3000, 2))]
+    for gezicht in gezichten:
+        hoekpunten = shapely.get_coordinates(gezicht)
+        coordinaten.append(hoekpunten[rng.integers(0, len(hoekpunten), size=20)])
+        coordinaten.append((hoekpunten[:-1:7] + hoekpunten[1::7]) / 2)
+        x0, y0, x1, y1 = gezicht.bounds
+        grootte = max(x1 - x0, y1 - y0) / 32
+        coordinaten.append(
+            np.c_[x0 + grootte * rng.integers(0, 33, 20), rng.uniform(y0, y1, 20)]
+        )
+    punten = [f"POINT ({x!r} {y!r})" for x, y in np.concatenate(coordinaten).tolist()]
+    identificaties = [f"{i:016d}" for i in range(len(punten))]
+
+    verwacht = _ShapelyGezichtenIndex(namen, wkts).zoek(identificaties, punten)
+    resultaat = _RasterGezichtenIndex(namen, wkts).zoek(identificaties, punten)
+
+    pd.testing.assert_frame_equal(resultaat, verwacht)
+
+
+def test_raster_binnen_en_buitenvormen():
+    rng = np.random.default_rng(7)
+    gezichten = _willekeurige_gezichten(rng, 10)
+    index = _RasterGezichtenIndex(
+        [str(i) for i in range(len(gezichten))], [g.wkt for g in gezichten]
+    )
+
+    for gezicht, binnen, buiten in zip(
+        gezichten, index._binnenvormen, index._buitenvormen
+    ):
+        assert binnen.is_empty or shapely.contains_properly(gezicht, binnen)
+        assert shapely.contains_properly(buiten, gezicht)
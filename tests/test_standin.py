@@ -0,0 +1,457 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import pandas as pd
+import pytest
+from sparql_standin import SparqlStandin, StandinData, synthetische_ids
+
+import monumenten._processing as processing
+from monumenten import MonumentenClient, MonumentenSyncClient
+from monumenten.cache import MemoryCache
+from monumenten.index import bouw_index
+
+
+@pytest.mark.asyncio
+async def test_client_tegen_opgenomen_data():
+    data = StandinData(
+        verblijfsobjecten={
+            "0599010000360091": {
+                "verblijfsobjectWKT": "POINT (5 5)",
+                "grondslagcode": "EWE",
+                "grondslag_gemeentelijk_monument": "Erfgoedwet",
+            },
+            "0599010000486642": {
+                "verblijfsobjectWKT": "POINT (50 50)",
+                "grondslagcode": None,
+                "grondslag_gemeentelijk_monument": None,
+            },
+            "0599010000076715": {
+                "verblijfsobjectWKT": "POINT (6 6)",
+                "grondslagcode": "GG",
+                "grondslag_gemeentelijk_monument": "Gemeentewet",
+            },
+        },
+        rijksmonumenten={"0599010000360091": "524327"},
+        beschermde_gezichten=[
+            {
+                "beschermd_gezicht_naam": "Kralingen - Midden",
+                "gezichtWKT": "POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))",
+            }
+        ],
+    )
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                result = await client.process_from_list(
+                    ["0599010000360091", "0599010000486642", "0599010000076715"]
+                )
+
+    assert result["0599010000360091"]["rijksmonument_bron"] == ["RCE", "Kadaster"]
+    assert result["0599010000360091"]["rijksmonument_nummer"] == "524327"
+    assert result["0599010000360091"]["is_beschermd_gezicht"] is True
+    assert result["0599010000486642"]["is_rijksmonument"] is False
+    assert result["0599010000486642"]["is_beschermd_gezicht"] is False
+    assert result["0599010000076715"]["is_gemeentelijk_monument"] is True
+    assert result["0599010000076715"]["beschermd_gezicht_naam"] == "Kralingen - Midden"
+    assert standin.aanvragen == {"bag_lv": 1, "kkg": 1, "rce": 2}
+
+
+@pytest.mark.asyncio
+async def test_client_tegen_synthetische_data():
+    ids = synthetische_ids(1200)
+
+    async with SparqlStandin(StandinData.synthetisch(), opvulling=10) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                result = await client.process_from_df(pd.DataFrame({"id": ids}), "id")
+
+    assert len(result) == len(ids)
+    assert result["is_rijksmonument"].any()
+    assert result["is_gemeentelijk_monument"].any()
+    assert result["is_beschermd_gezicht"].any()
+    assert standin.aanvragen["bag_lv"] == 3  # batches van 500
+
+
+@pytest.mark.asyncio
+async def test_fouten_van_de_stand_in():
+    async with SparqlStandin(StandinData.synthetisch(), foutpercentage=1.0) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.raises(aiohttp.ClientResponseError):
+                    await client.process_from_list(synthetische_ids(3))
+
+    assert standin.fouten == standin.aanvragen["bag_lv"] + standin.aanvragen["rce"]
+
+
+@pytest.mark.asyncio
+async def test_mislukte_batch_wordt_geisoleerd():
+    ids = synthetische_ids(8)
+    kapot, onbekend = ids[3], ids[5]
+    data = StandinData(
+        verblijfsobjecten={
+            identificatie: {
+                "verblijfsobjectWKT": "POINT (kapot"
+                if identificatie == kapot
+                else "POINT (1 1)",
+                "grondslagcode": None,
+                "grondslag_gemeentelijk_monument": None,
+            }
+            for identificatie in ids
+            if identificatie != onbekend
+        },
+        rijksmonumenten={ids[0]: "1"},
+        beschermde_gezichten=StandinData.synthetisch().beschermde_gezichten,
+    )
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.raises(Exception, match="kapot"):
+                    await client.process_from_list(ids)
+
+                with pytest.warns(UserWarning, match="Verwerking van 1"):
+                    result = await client.process_from_df(
+                        pd.DataFrame({"id": ids}), "id", on_error="isolate"
+                    )
+
+    rapport = result.attrs["rapport"]
+    assert rapport.opnieuw_te_verwerken == [kapot]
+    assert not rapport.volledig
+    assert rapport.niet_gevonden == [onbekend]
+    assert sorted(result["id"]) == sorted(set(ids) - {kapot})
+    assert result.loc[result["id"] == ids[0], "is_rijksmonument"].item()
+
+
+@pytest.mark.asyncio
+async def test_alleen_gevraagde_statussen():
+    ids = synthetische_ids(600)
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                volledig = await client.process_from_df(pd.DataFrame({"id": ids}), "id")
+                standin.aanvragen = dict.fromkeys(standin.aanvragen, 0)
+
+                result = await client.process_from_df(
+                    pd.DataFrame({"id": ids}), "id", include=["gemeentelijk_monument"]
+                )
+                vera = await client.process_from_list(
+                    ids, to_vera=True, include=["gemeentelijk_monument"]
+                )
+
+                with pytest.raises(ValueError, match="Onbekende status"):
+                    await client.process_from_list(ids, include=["rijksmonumenten"])
+
+    assert standin.aanvragen == {"bag_lv": 4, "kkg": 4, "rce": 0}
+    assert (
+        client.metrics.histogram("monumenten_stap_duur_seconden", stap="sjoin")[
+            "aantal"
+        ]
+        == 2
+    )  # alleen de volledige aanroep, met twee batches
+    assert result.columns.tolist() == [
+        "id",
+        "is_gemeentelijk_monument",
+        "grondslag_gemeentelijk_monument",
+    ]
+    pd.testing.assert_frame_equal(result, volledig[result.columns])
+    assert {status["code"] for statussen in vera.values() for status in statussen} == {
+        "GEM"
+    }
+
+
+@pytest.mark.asyncio
+async def test_overlappende_aanroepen_delen_batches():
+    ids = synthetische_ids(500)
+
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.05) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                resultaten = await asyncio.gather(
+                    client.process_from_list(ids[0:300]),
+                    client.process_from_list(ids[100:400]),
+                    client.process_from_list(ids[200:500]),
+                )
+                # ID's uit een lopende batch worden niet opnieuw opgevraagd
+                eerste = asyncio.ensure_future(client.process_from_list(ids[:10]))
+                await asyncio.sleep(0.02)
+                tweede = await client.process_from_list(ids[5:15])
+                await eerste
+
+    assert [len(resultaat) for resultaat in resultaten] == [300, 300, 300]
+    assert len(tweede) == 10
+    # zonder bundelen zouden dit 3 + 2 batches zijn
+    assert standin.aanvragen["bag_lv"] == 3
+
+
+@pytest.mark.asyncio
+async def test_hedging_geeft_dezelfde_resultaten():
+    data = StandinData.synthetisch()
+    ids = [i for i in synthetische_ids(50) if data.verblijfsobject(i)]
+
+    async with SparqlStandin(data, latentie=0.001) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                verwacht = await client.process_from_list(ids)
+            async with MonumentenClient(hedging=True) as client:
+                for identificatie in ids:
+                    result = await client.process_from_list([identificatie])
+                    assert result[identificatie] == verwacht[identificatie]
+
+    assert set(client._hedgers) == {"bag_lv", "kkg", "rce"}
+    assert client._hedgers["kkg"].drempel() is not None
+    assert client._hedgers["kkg"].aantal_hedges <= 0.05 * len(ids)
+
+
+@pytest.mark.asyncio
+async def test_warmup():
+    ids = synthetische_ids(10)
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                duren = await client.warmup()
+                # de gezichten zijn opgehaald, verbindingen openen is geen SPARQL-aanvraag
+                assert standin.aanvragen == {"bag_lv": 0, "kkg": 0, "rce": 1}
+                await client.process_from_list(ids)
+
+            async with MonumentenClient(warmup=True) as client:
+                pass
+
+    assert set(duren) == {"bag_lv", "kkg", "rce", "beschermde_gezichten"}
+    assert standin.aanvragen == {"bag_lv": 1, "kkg": 1, "rce": 2}
+    assert (
+        client.metrics.histogram(
+            "monumenten_stap_duur_seconden", stap="warmup_beschermde_gezichten"
+        )["aantal"]
+        == 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_verblijfsobjecten_bij_rijksmonumentnummers():
+    ids = synthetische_ids(3)
+    data = StandinData.synthetisch()
+    data.rijksmonumenten = {ids[0]: "524327", ids[1]: "524327", ids[2]: "1"}
+    cache = MemoryCache()
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with MonumentenClient(cache=cache) as client:
+                with pytest.warns(UserWarning, match="onjuiste rijksmonumentnummers"):
+                    result = await client.process_from_rijksmonumentnummers(
+                        [1, "999", "524327", "abc"]
+                    )
+                verrijkt = await client.process_from_rijksmonumentnummers(
+                    ["524327"], verrijken=True, include=["rijksmonument"]
+                )
+
+    assert result["gevraagd_rijksmonument_nummer"].tolist() == [
+        "1",
+        "999",
+        "524327",
+        "524327",
+    ]
+    assert result["bag_verblijfsobject_id"].tolist() == [
+        ids[2],
+        pd.NA,
+        *sorted(ids[:2]),
+    ]
+    assert verrijkt["bag_verblijfsobject_id"].tolist() == sorted(ids[:2])
+    assert verrijkt["is_rijksmonument"].all()
+    assert verrijkt["rijksmonument_nummer"].tolist() == ["524327", "524327"]
+    # het tweede nummer kwam uit de gedeelde cache
+    assert (
+        client.metrics.counter(
+            "monumenten_cache_totaal", cache="rce_monument", resultaat="hit"
+        )
+        == 1
+    )
+
+
+@pytest.mark.asyncio
+async def test_batches_op_locatie(monkeypatch):
+    ids = synthetische_ids(600, "0599") + synthetische_ids(600, "0363")
+    random.Random(0).shuffle(ids)
+    batches = []
+    process_batch = processing._process_batch
+
+    async def _opgenomen_process_batch(session, batch, *args):
+        batches.append({identificatie[:4] for identificatie in batch})
+        return await process_batch(session, batch, *args)
+
+    monkeypatch.setattr(processing, "_process_batch", _opgenomen_process_batch)
+
+    resultaten = {}
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            for volgorde in ("invoer", "locatie"):
+                async with MonumentenClient(batch_volgorde=volgorde) as client:
+                    resultaten[volgorde] = await client.process_from_df(
+                        pd.DataFrame({"id": ids}), "id"
+                    )
+
+    # in invoervolgorde bevat elke batch beide gemeenten, gesorteerd alleen de middelste
+    assert [len(gemeenten) for gemeenten in batches] == [2, 2, 2, 1, 2, 1]
+    assert resultaten["locatie"]["id"].tolist() == ids
+    pd.testing.assert_frame_equal(resultaten["locatie"], resultaten["invoer"])
+    with pytest.raises(ValueError, match="batch_volgorde"):
+        MonumentenClient(batch_volgorde="willekeurig")
+
+
+@pytest.mark.asyncio
+async def test_gezichten_laden_naast_de_batches(monkeypatch):
+    ids = synthetische_ids(1200)
+    query_beschermde_gezichten = processing._query_beschermde_gezichten
+    aanvragen_tijdens_laden = []
+
+    async def _trage_gezichten(session):
+        await asyncio.sleep(0.3)
+        aanvragen_tijdens_laden.append(dict(standin.aanvragen))
+        return await query_beschermde_gezichten(session)
+
+    monkeypatch.setattr(processing, "_query_beschermde_gezichten", _trage_gezichten)
+
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.02) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                koud = await client.process_from_df(pd.DataFrame({"id": ids}), "id")
+                # de index staat nu in het geheugen, de batches krijgen hem meteen
+                warm = await client.process_from_df(pd.DataFrame({"id": ids}), "id")
+
+    # de batches bevroegen het Kadaster terwijl de gezichten nog geladen werden
+    assert aanvragen_tijdens_laden[0]["kkg"] == 3
+    assert len(aanvragen_tijdens_laden) == 1
+    assert koud["is_beschermd_gezicht"].any()
+    pd.testing.assert_frame_equal(koud, warm)
+
+
+@pytest.mark.asyncio
+async def test_gezichten_laden_naast_de_batches_met_cache(monkeypatch):
+    ids = synthetische_ids(1200)
+    cache = MemoryCache()
+    query_beschermde_gezichten = processing._query_beschermde_gezichten
+    aanvragen_tijdens_laden = []
+
+    async def _trage_gezichten(session):
+        await asyncio.sleep(0.3)
+        aanvragen_tijdens_laden.append(dict(standin.aanvragen))
+        return await query_beschermde_gezichten(session)
+
+    monkeypatch.setattr(processing, "_query_beschermde_gezichten", _trage_gezichten)
+
+    async with SparqlStandin(StandinData.synthetisch(), latentie=0.02) as standin:
+        with standin.actief():
+            async with MonumentenClient(cache=cache) as client:
+                koud = await client.process_from_df(pd.DataFrame({"id": ids}), "id")
+            # als in een ander proces: de gezichten en het lidmaatschap komen uit de cache,
+            # maar de index moet nog gebouwd worden
+            processing._gezichten_indexen.pop(cache)
+            async with MonumentenClient(cache=cache) as client:
+                warm = await client.process_from_df(pd.DataFrame({"id": ids}), "id")
+
+    # ook met een gedeelde cache wachtten de batches niet op de gezichten
+    assert aanvragen_tijdens_laden[0]["kkg"] == 3
+    assert len(aanvragen_tijdens_laden) == 1
+    assert koud["is_beschermd_gezicht"].any()
+    pd.testing.assert_frame_equal(koud, warm)
+    # het lidmaatschap werd na het laden uit de cache gehaald, zonder ruimtelijke test
+    assert (
+        client.metrics.counter(
+            "monumenten_cache_totaal", cache="gezicht_lidmaatschap", resultaat="miss"
+        )
+        == 0
+    )
+    assert (
+        client.metrics.counter(
+            "monumenten_cache_totaal", cache="gezicht_lidmaatschap", resultaat="hit"
+        )
+        > 0
+    )
+
+
+@pytest.mark.asyncio
+async def test_mislukt_laden_van_gezichten_wordt_niet_geisoleerd(monkeypatch):
+    async def _geen_gezichten(session):
+        return []
+
+    monkeypatch.setattr(processing, "_query_beschermde_gezichten", _geen_gezichten)
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                with pytest.raises(ValueError, match="Geen beschermde gezichten"):
+                    await client.process_from_df(
+                        pd.DataFrame({"id": synthetische_ids(10)}),
+                        "id",
+                        on_error="isolate",
+                    )
+
+
+@pytest.mark.asyncio
+async def test_sync_client_met_index_en_batch_wachttijd(tmp_path):
+    ids = synthetische_ids(20)
+    aanroepen = [ids[:5] + ids[10:15], ids[5:10] + ids[15:]]
+
+    def verwerk():
+        # de sync client draait zijn eigen event loop, naast die van de stand-in
+        with MonumentenSyncClient(
+            index=tmp_path / "index", batch_wachttijd=0.05
+        ) as client:
+            with ThreadPoolExecutor(2) as pool:
+                return list(pool.map(client.process_from_list, aanroepen)), client
+
+    async with SparqlStandin(StandinData.synthetisch()) as standin:
+        with standin.actief():
+            await bouw_index(tmp_path / "index", ids[:10])
+            standin.aanvragen = dict.fromkeys(standin.aanvragen, 0)
+            resultaten, client = await asyncio.to_thread(verwerk)
+
+    for aanroep, result in zip(aanroepen, resultaten):
+        assert set(result) <= set(aanroep)
+        assert set(aanroep[:5]) <= set(result)
+    # de ID's uit de index zijn niet opgevraagd en de twee threads deelden één batch
+    assert standin.aanvragen["bag_lv"] == 1
+    assert (
+        client.metrics.counter(
+            "monumenten_cache_totaal", cache="index", resultaat="hit"
+        )
+        == 10
+    )
+
+
+@pytest.mark.asyncio
+async def test_sync_client_sluiten_tijdens_een_aanroep():
+    fouten = []
+
+    def aanroep(client):
+        try:
+            client.process_from_list(synthetische_ids(10))
+        except Exception as fout:
+            fouten.append(fout)
+
+    def verwerk():
+        client = MonumentenSyncClient()
+        # daemon, zodat een aanroep die blijft hangen de test niet laat hangen
+        thread = threading.Thread(target=aanroep, args=(client,), daemon=True)
+        thread.start()
+        while not standin.aanvragen["bag_lv"]:
+            time.sleep(0.01)
+        client.close()
+        thread.join(5)
+        assert not thread.is_alive()
+        with pytest.raises(RuntimeError, match="al gesloten"):
+            client.process_from_list(synthetische_ids(10))
+
+    async with SparqlStandin(StandinData.synthetisch(), latentie=2) as standin:
+        with standin.actief():
+            await asyncio.to_thread(verwerk)
+
+    (fout,) = fouten
+    assert isinstance(fout, RuntimeError)
+    assert "tijdens de aanroep gesloten" in str(fout)
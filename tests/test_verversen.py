@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from sparql_standin import SparqlStandin, StandinData
+
+from monumenten import MonumentenClient
+
+RIJKSMONUMENT = "0599010000360091"
+GEEN_MONUMENT = "0599010000486642"
+GEMEENTELIJK = "0599010000076715"
+
+
+def _data() -> StandinData:
+    return StandinData(
+        verblijfsobjecten={
+            RIJKSMONUMENT: {
+                "verblijfsobjectWKT": "POINT (5 5)",
+                "grondslagcode": "EWE",
+                "grondslag_gemeentelijk_monument": "Erfgoedwet",
+            },
+            GEEN_MONUMENT: {
+                "verblijfsobjectWKT": "POINT (50 50)",
+                "grondslagcode": None,
+                "grondslag_gemeentelijk_monument": None,
+            },
+            GEMEENTELIJK: {
+                "verblijfsobjectWKT": "POINT (6 6)",
+                "grondslagcode": "GG",
+                "grondslag_gemeentelijk_monument": "Gemeentewet",
+            },
+        },
+        rijksmonumenten={RIJKSMONUMENT: "524327"},
+        beschermde_gezichten=[
+            {
+                "beschermd_gezicht_naam": "Kralingen - Midden",
+                "gezichtWKT": "POLYGON ((0 0, 10 0, 10 10, 0 10, 0 0))",
+            }
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_alleen_verouderde_statussen_worden_ververst():
+    data = _data()
+    df = pd.DataFrame({"id": [RIJKSMONUMENT, GEEN_MONUMENT, GEMEENTELIJK]})
+    nu = datetime.now(timezone.utc)
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                vorig = await client.process_from_df(df, "id")
+                standin.aanvragen = dict.fromkeys(standin.aanvragen, 0)
+
+                # alles is nog vers: niets opvragen
+                vers, geen_wijzigingen = await client.refresh_from_df(
+                    vorig, "id", gecontroleerd_op=nu
+                )
+                assert standin.aanvragen == {"bag_lv": 0, "kkg": 0, "rce": 0}
+
+                data.rijksmonumenten[GEEN_MONUMENT] = "12345"
+                bijgewerkt, wijzigingen = await client.refresh_from_df(
+                    vers,
+                    "id",
+                    max_leeftijd={
+                        "rijksmonument": timedelta(0),
+                        "beschermd_gezicht": timedelta(days=30),
+                        "gemeentelijk_monument": timedelta(days=30),
+                    },
+                )
+
+    assert geen_wijzigingen.empty
+    pd.testing.assert_frame_equal(vers[vorig.columns], vorig)
+    assert (vers["rijksmonument_gecontroleerd_op"] == pd.Timestamp(nu)).all()
+    # alleen de rijksmonumenten bij de RCE, geen gezichten
+    assert standin.aanvragen["rce"] == 1
+    assert wijzigingen.to_dict("records") == [
+        {"id": GEEN_MONUMENT, "status": "rijksmonument", "wijziging": "toegevoegd"}
+    ]
+    assert bijgewerkt.columns.tolist() == vers.columns.tolist()
+    rij = bijgewerkt.set_index("id").loc[GEEN_MONUMENT]
+    assert rij["rijksmonument_nummer"] == "12345"
+    assert rij["rijksmonument_gecontroleerd_op"] > pd.Timestamp(nu)
+    assert rij["gemeentelijk_monument_gecontroleerd_op"] == pd.Timestamp(nu)
+
+
+@pytest.mark.asyncio
+async def test_nieuwe_versie_van_de_gezichten():
+    data = _data()
+    df = pd.DataFrame({"id": [RIJKSMONUMENT, GEEN_MONUMENT, GEMEENTELIJK]})
+
+    async with SparqlStandin(data) as standin:
+        with standin.actief():
+            async with MonumentenClient() as client:
+                vorig, _ = await client.refresh_from_df(
+                    await client.process_from_df(df, "id"), "id"
+                )
+
+        data.beschermde_gezichten[0]["gezichtWKT"] = (
+            "POLYGON ((0 0, 5.5 0, 5.5 5.5, 0 5.5, 0 0))"
+        )
+        standin.aanvragen = dict.fromkeys(standin.aanvragen, 0)
+        with standin.actief():  # leegt de gecachete gezichten
+            async with MonumentenClient() as client:
+                bijgewerkt, wijzigingen = await client.refresh_from_df(
+                    vorig, "id", max_leeftijd=timedelta(days=1)
+                )
+
+    # de gezichten zelf, en per ID alleen de kadasterdata met de geometrie
+    assert standin.aanvragen == {"bag_lv": 1, "kkg": 1, "rce": 1}
+    assert wijzigingen.to_dict("records") == [
+        {"id": GEMEENTELIJK, "status": "beschermd_gezicht", "wijziging": "verwijderd"}
+    ]
+    assert bijgewerkt["beschermd_gezichten_versie"].nunique() == 1
+    assert (
+        bijgewerkt["beschermd_gezichten_versie"].iloc[0]
+        != vorig["beschermd_gezichten_versie"].iloc[0]
+    )
+
+
+@pytest.mark.asyncio
+async def test_verversen_zonder_statuskolommen():
+    async with MonumentenClient() as client:
+        with pytest.raises(ValueError, match="statuskolommen"):
+            await client.refresh_from_df(pd.DataFrame({"id": ["1"]}), "id")
+        with pytest.raises(ValueError, match="Onbekende status"):
+            await client.refresh_from_df(
+                pd.DataFrame({"id": ["1"], "is_rijksmonument": [True]}),
+                "id",
+                max_leeftijd={"rijksmonumenten": timedelta(days=1)},
+            )